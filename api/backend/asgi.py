@@ -1,7 +1,8 @@
 """
 ASGI config for backend project.
 
-It exposes the ASGI callable as a module-level variable named ``application``.
+It exposes the ASGI callable as a module-level variable named ``application``. WebSocket connections are routed by
+path to the raw ASGI applications in ``websocket_routes``, everything else goes to Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
@@ -13,4 +14,24 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up, since it uses the settings and the app's views.
+from puzzles.sockets import solve_socket  # noqa: E402
+
+websocket_routes = {
+    '/solve/ws/': solve_socket,
+}
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        route = websocket_routes.get(scope['path'])
+        if route is None:
+            # Closing before the handshake is accepted rejects the connection.
+            await receive()
+            await send({'type': 'websocket.close', 'code': 1000})
+            return
+        await route(scope, receive, send)
+        return
+    await django_application(scope, receive, send)
@@ -136,3 +136,72 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Sudoku solver
+# "human" solves like a person would, with the Nishio method as a last resort.
+# "dlx" uses a Dancing Links exact cover search, which is fast on 9x9 puzzles. Larger puzzles always use "human".
+
+SUDOKU_SOLVER_ENGINE = 'human'
+
+# How many puzzles /solve/batch/ solves together before streaming their results.
+
+SUDOKU_BATCH_CHUNK_SIZE = 64
+
+# Solutions are cached by the grid and, for puzzles singles do not solve, by its canonical form. SUDOKU_CACHE_SIZE is
+# how many are kept in memory (0 turns that off) and SUDOKU_CACHE_PERSIST also keeps the canonical ones in the
+# SudokuPuzzle table.
+
+SUDOKU_CACHE_SIZE = 10000
+SUDOKU_CACHE_PERSIST = False
+
+# Solves run in a pool of SUDOKU_SOLVER_WORKERS processes (0 solves in the request thread). Each worker is
+# replaced after SUDOKU_SOLVER_TASKS_PER_CHILD solves (None keeps them for good, needs Python 3.11 otherwise).
+
+SUDOKU_SOLVER_WORKERS = int(os.environ.get('SUDOKU_SOLVER_WORKERS', 2))
+SUDOKU_SOLVER_TASKS_PER_CHILD = 1000
+
+# Limits on a single /solve/ request. SUDOKU_SOLVE_TIMEOUT is in seconds, SUDOKU_SOLVE_MAX_STEPS counts techniques,
+# branches, and search nodes, and SUDOKU_SOLVE_MAX_DEPTH is how deep the Nishio method may branch (None for no limit).
+# A solve that times out gets a 503 with Retry-After set to SUDOKU_SOLVE_RETRY_AFTER seconds.
+
+SUDOKU_SOLVE_TIMEOUT = 10
+SUDOKU_SOLVE_MAX_STEPS = None
+SUDOKU_SOLVE_MAX_DEPTH = None
+SUDOKU_SOLVE_RETRY_AFTER = 5
+
+# /solve/ admits solves through two lanes. Puzzles that single candidates leave with at most SUDOKU_ADMISSION_FAST_COST
+# cells unsolved take the fast lane, which runs SUDOKU_ADMISSION_FAST_SLOTS solves at once, and the rest take the slow
+# lane, which runs SUDOKU_ADMISSION_SLOW_SLOTS (at most one less than the solver workers, so a worker is always left
+# for the fast lane). Up to SUDOKU_ADMISSION_QUEUE_SIZE solves wait in every lane for at most
+# SUDOKU_ADMISSION_MAX_WAIT seconds, and one client may have SUDOKU_ADMISSION_PER_CLIENT solves at once. Puzzles
+# estimated past SUDOKU_ADMISSION_MAX_COST (None for no limit) and solves that are not admitted get a 429 with
+# Retry-After set to SUDOKU_ADMISSION_RETRY_AFTER seconds.
+
+SUDOKU_ADMISSION_FAST_SLOTS = 16
+SUDOKU_ADMISSION_SLOW_SLOTS = max(SUDOKU_SOLVER_WORKERS - 1, 1)
+SUDOKU_ADMISSION_QUEUE_SIZE = 8
+SUDOKU_ADMISSION_MAX_WAIT = 2.0
+SUDOKU_ADMISSION_PER_CLIENT = 4
+SUDOKU_ADMISSION_FAST_COST = 0
+SUDOKU_ADMISSION_MAX_COST = None
+SUDOKU_ADMISSION_RETRY_AFTER = 2
+
+# /solve/ws/ (served over ASGI) sends the progress of a solve at most every SUDOKU_WS_PROGRESS_INTERVAL seconds.
+
+SUDOKU_WS_PROGRESS_INTERVAL = 0.1
+
+# /generate/ hands out puzzles generated ahead of time. SUDOKU_GENERATED_POOL_SIZE puzzles are kept ready for every
+# tier and kept in SUDOKU_GENERATED_POOL_PATH across restarts (None keeps them in memory only), by default under the
+# var/ directory, which is not checked in. Every process has its own pool, so processes need their own paths. A tier
+# that runs out gets a 503 with Retry-After set to SUDOKU_GENERATED_RETRY_AFTER seconds. Puzzles are generated in
+# SUDOKU_GENERATED_WORKERS low priority processes of their own (0 generates in a thread of the server), and a tier that
+# an attempt missed waits SUDOKU_GENERATED_BACKOFF seconds before the next one, doubled for every miss in a row up to
+# SUDOKU_GENERATED_MAX_BACKOFF.
+
+SUDOKU_GENERATED_POOL_SIZE = 20
+SUDOKU_GENERATED_POOL_PATH = os.environ.get('SUDOKU_GENERATED_POOL_PATH', str(BASE_DIR / 'var' / 'generated_puzzles.json'))
+SUDOKU_GENERATED_RETRY_AFTER = 5
+SUDOKU_GENERATED_WORKERS = 1
+SUDOKU_GENERATED_BACKOFF = 0.05
+SUDOKU_GENERATED_MAX_BACKOFF = 2.0
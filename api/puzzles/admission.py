@@ -0,0 +1,239 @@
+from collections import Counter
+from contextlib import contextmanager
+from threading import Condition, Lock
+from time import monotonic
+from django.conf import settings
+from .utils.sudoku.solver import find_hidden_clues, find_naked_clues
+
+# The lanes a solve can be admitted to, cheap solves take the fast one.
+LANES = ('fast', 'slow')
+
+
+class Overloaded(Exception):
+    """Raised when a solve is not admitted.
+
+    Attributes:
+        reason (str): Why, "client" if the client has too many solves running, "cost" if the puzzle is too expensive,
+            "queue" if the lane has no room to wait, or "timeout" if the wait for a slot ran out.
+        retry_after (int): The seconds the client should wait before trying again.
+    """
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason, retry_after)
+        self.reason = reason
+        self.retry_after = retry_after
+
+    def __str__(self):
+        return f'Solve not admitted ({self.reason}).'
+
+
+def estimate_cost(p, rounds=10):
+    """Estimates how expensive a puzzle is to solve with a quick pass of the cheapest techniques, naked and hidden
+    singles, over the units its clues changed. Puzzles with few clues stall early and are left with more cells.
+
+    Args:
+        p (Puzzle): The puzzle, which is changed by the pass.
+        rounds (int): The most passes over the changed units. Defaults to 10.
+
+    Raises:
+        Contradiction: Thrown if the pass finds that the puzzle has no solution.
+
+    Returns:
+        int: The number of cells left unsolved, 0 if singles solve the puzzle.
+    """
+
+    for _ in range(rounds):
+        dirty = p.dirty
+        if not dirty or not p.unsolved:
+            break
+        p.dirty = 0
+        units = [unum for unum in range(dirty.bit_length()) if dirty >> unum & 1]
+        find_naked_clues(p, 1, units)
+        find_hidden_clues(p, 1, units)
+    return p.unsolved
+
+
+class AdmissionControl:
+    """
+    Bounded admission in front of the solver. Every solve takes a slot in the fast lane (puzzles estimated to be cheap)
+    or the slow lane, waiting in a short queue if the lane is busy, so a burst of hard puzzles can not hold up the easy
+    ones. Solves that would wait too long, or clients with too many solves already running, are turned away at once
+    instead of timing out together.
+
+    ...
+
+    Attributes
+    ----------
+    slots : dict
+        how many solves of every lane run at once
+    queue_size : int
+        how many solves can wait for a slot in every lane
+    per_client : int
+        how many solves one client can have running or waiting at once
+    max_wait : float
+        the most seconds a solve waits for a slot
+    fast_cost : int
+        the highest estimate of a solve on the fast lane
+    max_cost : int
+        the highest estimate of a solve that is admitted at all (None for no limit)
+    retry_after : int
+        the seconds a client that is turned away is told to wait
+    """
+
+    def __init__(
+        self, fast_slots=16, slow_slots=1, queue_size=8, per_client=4, max_wait=2.0, fast_cost=0, max_cost=None,
+        retry_after=2,
+    ):
+        """Constructs the admission control with no solves running.
+
+        Args:
+            fast_slots (int): How many cheap solves run at once. Defaults to 16.
+            slow_slots (int): How many other solves run at once. Defaults to 1.
+            queue_size (int): How many solves can wait in every lane. Defaults to 8.
+            per_client (int): How many solves one client can have at once. Defaults to 4.
+            max_wait (float): The most seconds a solve waits for a slot. Defaults to 2.0.
+            fast_cost (int): The highest estimate of a solve on the fast lane. Defaults to 0.
+            max_cost (int): The highest estimate of a solve that is admitted at all. Defaults to None.
+            retry_after (int): The seconds a client that is turned away is told to wait. Defaults to 2.
+        """
+
+        self.slots = {'fast': fast_slots, 'slow': slow_slots}
+        self.queue_size = queue_size
+        self.per_client = per_client
+        self.max_wait = max_wait
+        self.fast_cost = fast_cost
+        self.max_cost = max_cost
+        self.retry_after = retry_after
+        self._running = dict.fromkeys(LANES, 0)
+        self._waiting = dict.fromkeys(LANES, 0)
+        self._clients = Counter()
+        self._changed = Condition()
+
+    def lane(self, cost):
+        """Returns the lane for a solve.
+
+        Args:
+            cost (int): The estimate of the solve, see estimate_cost().
+
+        Returns:
+            str: The lane, one of LANES.
+        """
+
+        return 'fast' if cost <= self.fast_cost else 'slow'
+
+    @contextmanager
+    def admit(self, client, cost):
+        """Holds a slot for a solve for the body of a with statement, waiting for one if the lane is busy.
+
+        Args:
+            client (str): Who asked for the solve.
+            cost (int): The estimate of the solve, see estimate_cost().
+
+        Raises:
+            Overloaded: Thrown if the solve is not admitted.
+
+        Yields:
+            str: The lane the solve was admitted to.
+        """
+
+        lane = self.lane(cost)
+        self._acquire(client, lane, cost)
+        try:
+            yield lane
+        finally:
+            with self._changed:
+                self._running[lane] -= 1
+                self._leave(client)
+                self._changed.notify_all()
+
+    def _acquire(self, client, lane, cost):
+        """Takes a slot in a lane for a client.
+
+        Args:
+            client (str): Who asked for the solve.
+            lane (str): The lane.
+            cost (int): The estimate of the solve.
+
+        Raises:
+            Overloaded: Thrown if the solve is not admitted.
+        """
+
+        if self.max_cost is not None and cost > self.max_cost:
+            raise Overloaded('cost', self.retry_after)
+        with self._changed:
+            if self._clients[client] >= self.per_client:
+                raise Overloaded('client', self.retry_after)
+            self._clients[client] += 1
+            # Solves that find the lane busy wait for a slot, and the ones that find the queue full are shed right away.
+            try:
+                if self._running[lane] >= self.slots[lane]:
+                    if self._waiting[lane] >= self.queue_size:
+                        raise Overloaded('queue', self.retry_after)
+                    deadline = monotonic() + self.max_wait
+                    self._waiting[lane] += 1
+                    try:
+                        while self._running[lane] >= self.slots[lane]:
+                            left = deadline - monotonic()
+                            if left <= 0 or not self._changed.wait(left):
+                                raise Overloaded('timeout', self.retry_after)
+                    finally:
+                        self._waiting[lane] -= 1
+            except Overloaded:
+                self._leave(client)
+                raise
+            self._running[lane] += 1
+
+    def _leave(self, client):
+        """Forgets a solve of a client, with the lock held.
+
+        Args:
+            client (str): Who asked for the solve.
+        """
+
+        self._clients[client] -= 1
+        if not self._clients[client]:
+            del self._clients[client]
+
+    def counts(self):
+        """Returns how many solves are running and waiting in every lane.
+
+        Returns:
+            dict: The running and waiting solves of every lane.
+        """
+
+        with self._changed:
+            return {lane: {'running': self._running[lane], 'waiting': self._waiting[lane]} for lane in LANES}
+
+
+_admission = None
+_admission_lock = Lock()
+
+
+def get_admission_control():
+    """Returns the admission control of this process, configured by the SUDOKU_ADMISSION_* settings. Both lanes solve in
+    the same solver workers, so the slow lane gets at most one less slot than there are workers and the fast lane
+    always has a worker that slow solves can not take.
+
+    Returns:
+        AdmissionControl: The admission control.
+    """
+
+    global _admission
+    # Requests that come in at once share the first admission control, so their solves are counted together.
+    with _admission_lock:
+        if _admission is None:
+            slow_slots = getattr(settings, 'SUDOKU_ADMISSION_SLOW_SLOTS', 1)
+            workers = getattr(settings, 'SUDOKU_SOLVER_WORKERS', 2)
+            if workers > 1:
+                slow_slots = min(slow_slots, workers - 1)
+            _admission = AdmissionControl(
+                fast_slots=getattr(settings, 'SUDOKU_ADMISSION_FAST_SLOTS', 16),
+                slow_slots=slow_slots,
+                queue_size=getattr(settings, 'SUDOKU_ADMISSION_QUEUE_SIZE', 8),
+                per_client=getattr(settings, 'SUDOKU_ADMISSION_PER_CLIENT', 4),
+                max_wait=getattr(settings, 'SUDOKU_ADMISSION_MAX_WAIT', 2.0),
+                fast_cost=getattr(settings, 'SUDOKU_ADMISSION_FAST_COST', 0),
+                max_cost=getattr(settings, 'SUDOKU_ADMISSION_MAX_COST', None),
+                retry_after=getattr(settings, 'SUDOKU_ADMISSION_RETRY_AFTER', 2),
+            )
+        return _admission
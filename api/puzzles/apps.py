@@ -0,0 +1,38 @@
+import os
+import sys
+from django.apps import AppConfig
+
+# The ways manage.py can be run, which is how every management command is started.
+_MANAGE = ('manage.py', 'django-admin', 'django-admin.py', '__main__.py')
+
+
+def _serves_requests(argv, environ):
+    """Tells whether the process is going to serve requests. Servers such as gunicorn or uvicorn do not go through
+    manage.py, and of the management commands only runserver serves requests. With its autoreloader, runserver serves
+    them from a child process with RUN_MAIN set while the parent only watches the files.
+
+    Args:
+        argv (list[str]): The command line of the process.
+        environ (dict): The environment of the process.
+
+    Returns:
+        bool: Whether the process serves requests.
+    """
+
+    if not argv or os.path.basename(argv[0]) not in _MANAGE:
+        return True
+    if len(argv) < 2 or argv[1] != 'runserver':
+        return False
+    return environ.get('RUN_MAIN') == 'true' or '--noreload' in argv
+
+
+class PuzzlesConfig(AppConfig):
+    name = 'puzzles'
+
+    def ready(self):
+        # Puzzles are generated ahead of time, so a server starts filling the pool right away instead of on the first
+        # /generate/ request. Management commands such as migrate or test leave it alone.
+        if _serves_requests(sys.argv, os.environ):
+            from .generated import get_generated_pool
+
+            get_generated_pool()
@@ -0,0 +1,159 @@
+from collections import OrderedDict
+from threading import Lock
+from django.conf import settings
+from django.db import DatabaseError
+from .models import SudokuPuzzle
+from .utils.sudoku.canonical import canonicalize
+
+
+class SolutionCache:
+    """
+    Solutions of solved puzzles keyed by their grid and by their canonical form, so a puzzle sent before is answered
+    with a dict lookup and one that only differs from an earlier one by a symmetry of Sudoku without running the solver.
+    Both keys are grids mapped to their own solution, so they share one LRU.
+
+    ...
+
+    Attributes
+    ----------
+    maxsize : int
+        the most solutions kept in memory, the least recently used ones are dropped first
+    persist : bool
+        whether solutions are also kept in the SudokuPuzzle table
+    """
+
+    def __init__(self, maxsize=10000, persist=False):
+        """Constructs an empty cache.
+
+        Args:
+            maxsize (int): The most solutions kept in memory. Defaults to 10000.
+            persist (bool): Whether solutions are also kept in the SudokuPuzzle table. Defaults to False.
+        """
+
+        self.maxsize = maxsize
+        self.persist = persist
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    @property
+    def enabled(self):
+        """Whether the cache keeps solutions anywhere."""
+
+        return self.maxsize > 0 or self.persist
+
+    def lookup(self, vals, symmetric=True):
+        """Looks up the solution of a puzzle, first by the grid itself and then by its canonical form.
+
+        Args:
+            vals (list[int]): The values of every cell in the puzzle (0 if empty).
+            symmetric (bool): Whether to look up the canonical form on a miss, which costs about as much as solving an
+                easy puzzle. Defaults to True.
+
+        Returns:
+            tuple: The solution as a list of 81 values (None on a miss) and the keys to pass to store().
+        """
+
+        raw = "".join(map(str, vals))
+        solved = self._get(raw)
+        if solved is not None:
+            return [int(val) for val in solved], (raw, None)
+        if not symmetric:
+            return None, (raw, None)
+
+        key, transform = canonicalize(vals)
+        solved = self._get(key)
+        if solved is None and self.persist:
+            try:
+                solved = SudokuPuzzle.objects.filter(grid=key).values_list('solved', flat=True).first()
+            except DatabaseError:
+                solved = None
+            if solved is not None:
+                self._remember(key, solved)
+        if solved is None:
+            return None, (raw, (key, transform))
+        solved = transform.invert([int(val) for val in solved])
+        self._remember(raw, "".join(map(str, solved)))
+        return solved, (raw, (key, transform))
+
+    def store(self, keys, vals):
+        """Stores the solution of a puzzle that lookup() missed, under the grid and, if it was looked up, under its
+        canonical form.
+
+        Args:
+            keys (tuple): The keys returned by lookup().
+            vals (list[int]): The values of every cell in the solution.
+        """
+
+        raw, canonical = keys
+        self._remember(raw, "".join(map(str, vals)))
+        if canonical is None:
+            return
+        key, transform = canonical
+        solved = "".join(map(str, transform.apply(list(vals))))
+        self._remember(key, solved)
+        if self.persist:
+            try:
+                if not SudokuPuzzle.objects.filter(grid=key).exists():
+                    SudokuPuzzle.objects.create(grid=key, solved=solved)
+            except DatabaseError:
+                pass
+
+    def clear(self):
+        """Drops every solution kept in memory."""
+
+        with self._lock:
+            self._entries.clear()
+
+    def _get(self, key):
+        """Returns a solution kept in memory, marking it as the most recently used one.
+
+        Args:
+            key (str): The grid of the puzzle.
+
+        Returns:
+            str: The solution, None if it is not kept.
+        """
+
+        with self._lock:
+            solved = self._entries.get(key)
+            if solved is not None:
+                self._entries.move_to_end(key)
+        return solved
+
+    def _remember(self, key, solved):
+        """Keeps a solution in memory, dropping the least recently used one if the cache is full.
+
+        Args:
+            key (str): The grid of the puzzle, as sent or in canonical form.
+            solved (str): The solution of that grid.
+        """
+
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = solved
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+_cache = None
+_cache_lock = Lock()
+
+
+def get_solution_cache():
+    """Returns the solution cache of this process, configured by the SUDOKU_CACHE_SIZE and SUDOKU_CACHE_PERSIST settings.
+
+    Returns:
+        SolutionCache: The solution cache.
+    """
+
+    global _cache
+    # Requests that come in at once share the first cache, so no solution is kept where others can not see it.
+    with _cache_lock:
+        if _cache is None:
+            _cache = SolutionCache(
+                maxsize=getattr(settings, 'SUDOKU_CACHE_SIZE', 10000),
+                persist=getattr(settings, 'SUDOKU_CACHE_PERSIST', False),
+            )
+        return _cache
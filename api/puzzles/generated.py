@@ -0,0 +1,216 @@
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from threading import Event, Lock, Thread
+from time import monotonic
+from django.conf import settings
+from .utils.sudoku.grader import TIERS
+from .utils.sudoku.worker import generate_grid, lower_priority
+
+
+class GeneratedPool:
+    """
+    Puzzles generated ahead of time for every difficulty tier, so a request takes one in constant time. A background
+    thread tops the pool back up whenever a puzzle is taken, in worker processes of its own that run at a low priority
+    so generating never holds up the solver workers, and keeps it in a local file so a restart does not empty it.
+
+    ...
+
+    Attributes
+    ----------
+    size : int
+        how many puzzles are kept ready for every tier
+    path : str
+        the file the pool is kept in (None to keep it in memory only)
+    workers : int
+        the number of worker processes that generate puzzles (0 generates in the thread that fills the pool)
+    backoff : float
+        the seconds a tier waits after an attempt that missed it, doubled for every miss in a row
+    max_backoff : float
+        the most seconds a tier waits between attempts
+    """
+
+    def __init__(self, size=20, path=None, workers=1, backoff=0.05, max_backoff=2.0):
+        """Constructs the pool and loads the puzzles kept in its file. Puzzles are generated once start() is called.
+
+        Args:
+            size (int): How many puzzles are kept ready for every tier. Defaults to 20.
+            path (str): The file the pool is kept in. Defaults to None.
+            workers (int): The number of worker processes that generate puzzles. Defaults to 1.
+            backoff (float): The seconds a tier waits after its first miss. Defaults to 0.05.
+            max_backoff (float): The most seconds a tier waits between attempts. Defaults to 2.0.
+        """
+
+        self.size = size
+        self.path = path
+        self.workers = workers
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._ready = {tier: deque() for tier in TIERS}
+        self._lock = Lock()
+        self._wake = Event()
+        self._thread = None
+        self._load()
+
+    def take(self, difficulty):
+        """Takes a puzzle out of the pool.
+
+        Args:
+            difficulty (str): The name of the tier, one of TIERS.
+
+        Returns:
+            tuple: The values of every cell in the puzzle (0 if empty) and in its solution, or None if the tier has
+            run out.
+        """
+
+        with self._lock:
+            ready = self._ready[difficulty]
+            puzzle = ready.popleft() if ready else None
+        self._wake.set()
+        return puzzle
+
+    def count(self, difficulty):
+        """Counts the puzzles of a tier that are ready.
+
+        Args:
+            difficulty (str): The name of the tier, one of TIERS.
+
+        Returns:
+            int: The number of puzzles.
+        """
+
+        return len(self._ready[difficulty])
+
+    def start(self):
+        """Starts the thread that fills the pool, if it is not running yet (or did not survive a fork of the process)."""
+
+        with self._lock:
+            if (self._thread is None or not self._thread.is_alive()) and self.size > 0:
+                self._thread = Thread(target=self._fill, name='sudoku-generated-pool', daemon=True)
+                self._thread.start()
+
+    def _fill(self):
+        """Makes one attempt at a puzzle for every tier that is short at a time (in parallel across the worker
+        processes), so a tier that is hard to reach does not hold up the others, and waits for a take() once every tier
+        is full. A tier that an attempt missed is not tried again until its backoff has passed."""
+
+        executor = None
+        if self.workers > 0:
+            executor = ProcessPoolExecutor(max_workers=self.workers, initializer=lower_priority)
+        delays = dict.fromkeys(TIERS, 0.0)
+        retry_at = dict.fromkeys(TIERS, 0.0)
+        while True:
+            self._wake.clear()
+            short = [tier for tier in TIERS if self.count(tier) < self.size]
+            if not short:
+                self._save()
+                self._wake.wait()
+                continue
+            now = monotonic()
+            due = [tier for tier in short if retry_at[tier] <= now]
+            if not due:
+                self._wake.wait(min(retry_at[tier] for tier in short) - now)
+                continue
+            try:
+                for tier, puzzle in self._attempt(executor, due):
+                    if puzzle is None:
+                        delays[tier] = min(max(delays[tier] * 2, self.backoff), self.max_backoff)
+                        retry_at[tier] = monotonic() + delays[tier]
+                        continue
+                    delays[tier] = 0.0
+                    with self._lock:
+                        self._ready[tier].append(puzzle)
+            except RuntimeError:
+                # The interpreter is exiting and has shut the worker processes down.
+                return
+            self._save()
+
+    @staticmethod
+    def _attempt(executor, tiers):
+        """Makes one attempt at a puzzle for every tier, all at once if there are worker processes.
+
+        Args:
+            executor (ProcessPoolExecutor): The worker processes, None to generate in this thread.
+            tiers (list[str]): The names of the tiers.
+
+        Yields:
+            tuple: The name of a tier and the puzzle generated for it (None if the attempt missed), as the attempts
+            finish.
+        """
+
+        if executor is None:
+            for tier in tiers:
+                try:
+                    yield tier, generate_grid(tier)
+                except Exception:
+                    yield tier, None
+            return
+        futures = {executor.submit(generate_grid, tier): tier for tier in tiers}
+        for future in as_completed(futures):
+            try:
+                puzzle = future.result()
+            except Exception:
+                puzzle = None
+            yield futures[future], puzzle
+
+    def _load(self):
+        """Loads the puzzles kept in the file of the pool, if there is one."""
+
+        if self.path is None:
+            return
+        try:
+            with open(self.path) as f:
+                kept = json.load(f)
+        except (OSError, ValueError):
+            return
+        for tier in TIERS:
+            for puzzle, solution in kept.get(tier, [])[: self.size]:
+                self._ready[tier].append(([int(val) for val in puzzle], [int(val) for val in solution]))
+
+    def _save(self):
+        """Writes the ready puzzles to the file of the pool. The file is replaced in one step so a crash never leaves
+        half of it behind."""
+
+        if self.path is None:
+            return
+        with self._lock:
+            kept = {
+                tier: [["".join(map(str, puzzle)), "".join(map(str, solution))] for puzzle, solution in ready]
+                for tier, ready in self._ready.items()
+            }
+        tmp = f'{self.path}.tmp'
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(tmp, 'w') as f:
+                json.dump(kept, f)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+
+_pool = None
+_pool_lock = Lock()
+
+
+def get_generated_pool():
+    """Returns the pool of generated puzzles of this process, configured by the SUDOKU_GENERATED_* settings, and starts
+    filling it. The app calls this when a server starts, so the pool fills before the first /generate/ request.
+
+    Returns:
+        GeneratedPool: The pool.
+    """
+
+    global _pool
+    # Requests that come in at once share the first pool, so only one thread fills it.
+    with _pool_lock:
+        if _pool is None:
+            _pool = GeneratedPool(
+                size=getattr(settings, 'SUDOKU_GENERATED_POOL_SIZE', 20),
+                path=getattr(settings, 'SUDOKU_GENERATED_POOL_PATH', None),
+                workers=getattr(settings, 'SUDOKU_GENERATED_WORKERS', 1),
+                backoff=getattr(settings, 'SUDOKU_GENERATED_BACKOFF', 0.05),
+                max_backoff=getattr(settings, 'SUDOKU_GENERATED_MAX_BACKOFF', 2.0),
+            )
+    _pool.start()
+    return _pool
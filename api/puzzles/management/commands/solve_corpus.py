@@ -0,0 +1,136 @@
+import json
+import mmap
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from ...utils.sudoku.worker import solve_lines, warm_up
+
+
+class Command(BaseCommand):
+    help = (
+        'Solves a corpus file with one 81 character grid per line on every core and writes a tab separated result line '
+        'per puzzle, in order: the puzzle, the status, the solution, and the milliseconds the solve took. Progress is '
+        'checkpointed after every chunk, so running the command again resumes an interrupted run.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='the corpus file')
+        parser.add_argument('output', help='the file the results are written to')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='the number of worker processes')
+        parser.add_argument('--chunk-bytes', type=int, default=1 << 18, help='about how many bytes of the corpus a worker solves at a time')
+        parser.add_argument('--engine', default=getattr(settings, 'SUDOKU_SOLVER_ENGINE', 'human'), help='the solver engine')
+        parser.add_argument('--timeout', type=float, default=None, help='the most seconds a single solve may take')
+        parser.add_argument('--checkpoint', help='the checkpoint file (the output file with .checkpoint appended by default)')
+        parser.add_argument('--restart', action='store_true', help='ignore the checkpoint and start from the first line')
+
+    def handle(self, *args, **options):
+        path, out_path = options['input'], options['output']
+        ckpt_path = options['checkpoint'] or f'{out_path}.checkpoint'
+        try:
+            size = os.path.getsize(path)
+        except OSError as exc:
+            raise CommandError(f'Can not read {path}: {exc}')
+
+        # Pick up where the last run stopped. The output is cut back to what the checkpoint covers, since lines written
+        # after it were not checkpointed.
+        state = {'input': os.path.abspath(path), 'size': size, 'offset': 0, 'output_offset': 0, 'puzzles': 0, 'solved': 0}
+        if not options['restart'] and os.path.exists(ckpt_path):
+            with open(ckpt_path) as f:
+                saved = json.load(f)
+            if saved.get('input') != state['input'] or saved.get('size') != size:
+                raise CommandError(f'{ckpt_path} is for another corpus, pass --restart to start over.')
+            state = saved
+            self.stdout.write(f"Resuming after {state['puzzles']} puzzles.")
+        out = open(out_path, 'r+b' if state['output_offset'] else 'wb')
+        out.truncate(state['output_offset'])
+        out.seek(state['output_offset'])
+
+        if size == 0:
+            out.close()
+            self._finish(ckpt_path, state)
+            return
+        with open(path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        workers = max(1, options['workers'])
+        job = (options['engine'], options['timeout'])
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=warm_up) as executor:
+                # Only a few chunks per worker are in flight, and they are written in the order they were read.
+                pending = deque()
+                for start, end in self._chunks(mm, state['offset'], options['chunk_bytes']):
+                    pending.append((end, executor.submit(solve_lines, state['input'], start, end, *job)))
+                    if len(pending) >= workers * 2:
+                        self._write(out, ckpt_path, state, *pending.popleft())
+                while pending:
+                    self._write(out, ckpt_path, state, *pending.popleft())
+        except KeyboardInterrupt:
+            raise CommandError(f"Stopped after {state['puzzles']} puzzles, run the command again to resume.")
+        finally:
+            out.close()
+            mm.close()
+
+        self._finish(ckpt_path, state)
+
+    def _finish(self, ckpt_path, state):
+        """Removes the checkpoint once the whole corpus is solved, so the next run starts over instead of resuming a
+        finished run, and reports how many puzzles were solved.
+
+        Args:
+            ckpt_path (str): The path of the checkpoint file.
+            state (dict): The progress of the run.
+        """
+
+        try:
+            os.remove(ckpt_path)
+        except FileNotFoundError:
+            pass
+        self.stdout.write(f"Solved {state['solved']} of {state['puzzles']} puzzles.")
+
+    @staticmethod
+    def _chunks(mm, offset, chunk_bytes):
+        """Splits the memory map into chunks of whole lines from offset on.
+
+        Args:
+            mm (mmap.mmap): The memory map of the corpus.
+            offset (int): The offset to start at.
+            chunk_bytes (int): About how many bytes go in a chunk.
+
+        Yields:
+            tuple[int]: The start and end offset of every chunk.
+        """
+
+        size = len(mm)
+        while offset < size:
+            end = mm.find(b'\n', min(offset + chunk_bytes, size) - 1)
+            end = size if end < 0 else end + 1
+            yield offset, end
+            offset = end
+
+    def _write(self, out, ckpt_path, state, end, future):
+        """Writes the results of a chunk and checkpoints past it. The results are on disk before the checkpoint is
+        replaced, so the checkpoint never covers lines that were lost.
+
+        Args:
+            out (file): The output file.
+            ckpt_path (str): The path of the checkpoint file.
+            state (dict): The progress of the run, updated in place.
+            end (int): The offset in the corpus just past the chunk.
+            future (concurrent.futures.Future): The future for the results of the chunk.
+        """
+
+        lines = future.result()
+        out.write(lines)
+        out.flush()
+        os.fsync(out.fileno())
+
+        state['offset'] = end
+        state['output_offset'] = out.tell()
+        state['puzzles'] += lines.count(b'\n')
+        state['solved'] += lines.count(b'\tsolved\t')
+        tmp = f'{ckpt_path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp, ckpt_path)
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('puzzles', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sudokupuzzle',
+            name='grid',
+            field=models.TextField(db_index=True),
+        ),
+    ]
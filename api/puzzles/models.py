@@ -1,3 +1,8 @@
 from django.db import models
 
-# No models needed - this app works stateless
+
+class SudokuPuzzle(models.Model):
+    """A solved puzzle in canonical form, the persistent tier of the solution cache."""
+
+    grid = models.TextField(db_index=True)
+    solved = models.TextField(blank=True, null=True)
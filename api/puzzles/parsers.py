@@ -0,0 +1,21 @@
+from rest_framework.parsers import BaseParser
+
+
+class GridStringParser(BaseParser):
+    """Reads a text/plain body holding one 81 character grid, which the view parses like a string "grid". The grid is
+    answered in the same format."""
+
+    media_type = 'text/plain'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return {'grid': stream.read().decode('ascii', 'replace'), 'format': 'string'}
+
+
+class PackedGridParser(BaseParser):
+    """Reads an application/octet-stream body holding one grid packed into 41 bytes, which the view unpacks. The grid
+    is answered in the same format."""
+
+    media_type = 'application/octet-stream'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return {'grid': stream.read(), 'format': 'packed'}
@@ -0,0 +1,310 @@
+import asyncio
+import multiprocessing
+import queue
+import sys
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from threading import Lock
+from django.conf import settings
+from .utils.sudoku import solve_batch
+from .utils.sudoku.worker import count_grid, profile_grid, rate_grid, solve_grid, stream_grid, warm_up
+
+
+class SolverService:
+    """
+    Runs solves in a pool of worker processes so a hard puzzle does not hold a request worker (or the GIL) while it is solved.
+
+    ...
+
+    Attributes
+    ----------
+    workers : int
+        the number of worker processes (0 solves inline in the calling thread)
+    tasks_per_child : int
+        how many solves a worker process runs before it is replaced (None to never replace them)
+    """
+
+    def __init__(self, workers=2, tasks_per_child=None):
+        """Constructs the service. The worker processes are started on first use.
+
+        Args:
+            workers (int): The number of worker processes (0 solves inline). Defaults to 2.
+            tasks_per_child (int): How many solves a worker runs before it is replaced. Defaults to None.
+        """
+
+        self.workers = workers
+        self.tasks_per_child = tasks_per_child
+        self._pool = None
+        self._manager = None
+        self._lock = Lock()
+
+    def _executor(self):
+        """Returns the process pool, starting it if it is not running yet. Every worker process warms up when it starts,
+        including the ones that replace a worker after tasks_per_child solves.
+
+        Returns:
+            ProcessPoolExecutor: The process pool.
+        """
+
+        with self._lock:
+            if self._pool is None:
+                kwargs = {'max_workers': self.workers, 'initializer': warm_up}
+                if self.tasks_per_child and sys.version_info >= (3, 11):
+                    kwargs['max_tasks_per_child'] = self.tasks_per_child
+                self._pool = ProcessPoolExecutor(**kwargs)
+            return self._pool
+
+    def submit(self, fn, *args):
+        """Runs fn(*args) in a worker process.
+
+        Args:
+            fn (Callable): A module level function that only takes and returns plain values.
+            args: The arguments for fn.
+
+        Returns:
+            concurrent.futures.Future: The future for the result of fn.
+        """
+
+        if self.workers <= 0:
+            future = Future()
+            try:
+                future.set_result(fn(*args))
+            except Exception as exc:
+                future.set_exception(exc)
+            return future
+        try:
+            return self._executor().submit(fn, *args)
+        except BrokenProcessPool:
+            # A worker died, so start a fresh pool for this and later solves. The manager is left running, since the
+            # streamed solves in flight still talk to it.
+            self._stop_pool(wait=False)
+            return self._executor().submit(fn, *args)
+
+    def run(self, fn, *args):
+        """Runs fn(*args) in a worker process and waits for the result.
+
+        Args:
+            fn (Callable): A module level function that only takes and returns plain values.
+            args: The arguments for fn.
+
+        Returns:
+            The result of fn.
+        """
+
+        return self.submit(fn, *args).result()
+
+    async def arun(self, fn, *args):
+        """Runs fn(*args) in a worker process and awaits the result without holding a thread.
+
+        Args:
+            fn (Callable): A module level function that only takes and returns plain values.
+            args: The arguments for fn.
+
+        Returns:
+            The result of fn.
+        """
+
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def solve(self, vals, engine='human', timeout=None, max_steps=None, max_depth=None):
+        """Solves a puzzle in a worker process.
+
+        Args:
+            vals (list[int]): The values of every cell in the puzzle (0 if empty).
+            engine (str): The solver engine to use. Defaults to "human".
+            timeout (float): The most seconds the solve may take. Defaults to None.
+            max_steps (int): The most steps the solve may take. Defaults to None.
+            max_depth (int): The deepest the Nishio method may branch. Defaults to None.
+
+        Raises:
+            SolveBudgetExceeded: Thrown if a limit is reached.
+
+        Returns:
+            list[int]: The values of every cell once solving stops.
+        """
+
+        return self.run(solve_grid, vals, engine, timeout, max_steps, max_depth)
+
+    def profile(self, vals, engine='human', timeout=None, max_steps=None, max_depth=None, stats=True, trace=False):
+        """Solves a puzzle in a worker process and records what every technique cost, every step taken, or both.
+
+        Args:
+            vals (list[int]): The values of every cell in the puzzle (0 if empty).
+            engine (str): The solver engine to use. Defaults to "human".
+            timeout (float): The most seconds the solve may take. Defaults to None.
+            max_steps (int): The most steps the solve may take. Defaults to None.
+            max_depth (int): The deepest the Nishio method may branch. Defaults to None.
+            stats (bool): Whether to record the stats of the solve. Defaults to True.
+            trace (bool): Whether to record the steps of the solve. Defaults to False.
+
+        Raises:
+            SolveBudgetExceeded: Thrown if a limit is reached.
+
+        Returns:
+            tuple: The values of every cell once solving stops, the stats of the solve as a dict, and the steps of the
+            solve as a list (None for what was not recorded).
+        """
+
+        return self.run(profile_grid, vals, engine, timeout, max_steps, max_depth, stats, trace)
+
+    async def asolve(self, vals, engine='human', timeout=None, max_steps=None, max_depth=None):
+        """Solves a puzzle in a worker process from an async view.
+
+        Args:
+            vals (list[int]): The values of every cell in the puzzle (0 if empty).
+            engine (str): The solver engine to use. Defaults to "human".
+            timeout (float): The most seconds the solve may take. Defaults to None.
+            max_steps (int): The most steps the solve may take. Defaults to None.
+            max_depth (int): The deepest the Nishio method may branch. Defaults to None.
+
+        Raises:
+            SolveBudgetExceeded: Thrown if a limit is reached.
+
+        Returns:
+            list[int]: The values of every cell once solving stops.
+        """
+
+        return await self.arun(solve_grid, vals, engine, timeout, max_steps, max_depth)
+
+    def channel(self):
+        """Returns an event to cancel a streamed solve with and a queue for its progress events. Plain ones do for inline
+        solves, and solves in a worker process get proxies from a manager process, which is started on first use.
+
+        Returns:
+            tuple: The event and the queue.
+        """
+
+        if self.workers <= 0:
+            return threading.Event(), queue.Queue()
+        with self._lock:
+            if self._manager is None:
+                self._manager = multiprocessing.Manager()
+            manager = self._manager
+        return manager.Event(), manager.Queue()
+
+    async def astream(self, vals, engine, timeout, max_steps, max_depth, cancel, events, interval=0.1):
+        """Solves a puzzle in a worker process from an async view while it reports its progress, see stream_grid().
+        Inline solves run in a thread instead, so the event loop keeps going while they solve.
+
+        Args:
+            vals (list[int]): The values of every cell in the puzzle (0 if empty).
+            engine (str): The solver engine to use.
+            timeout (float): The most seconds the solve may take.
+            max_steps (int): The most steps the solve may take.
+            max_depth (int): The deepest the Nishio method may branch.
+            cancel (threading.Event): The event from channel() that stops the solve once set.
+            events (queue.Queue): The queue from channel() the progress events are put on.
+            interval (float): The least seconds between two progress events. Defaults to 0.1.
+
+        Raises:
+            SolveBudgetExceeded: Thrown if a limit is reached or the solve is cancelled.
+
+        Returns:
+            list[int]: The values of every cell once solving stops.
+        """
+
+        args = (vals, engine, timeout, max_steps, max_depth, cancel, events, interval)
+        if self.workers <= 0:
+            return await asyncio.to_thread(stream_grid, *args)
+        return await self.arun(stream_grid, *args)
+
+    def count_solutions(self, vals, limit=2, timeout=None, max_steps=None):
+        """Counts the solutions of a puzzle in a worker process, stopping at limit.
+
+        Args:
+            vals (list[int]): The values of every cell in the puzzle (0 if empty).
+            limit (int): The count to stop at. Defaults to 2.
+            timeout (float): The most seconds the count may take. Defaults to None.
+            max_steps (int): The most search nodes the count may visit. Defaults to None.
+
+        Raises:
+            SolveBudgetExceeded: Thrown if a limit is reached.
+
+        Returns:
+            int: The number of solutions, or limit if there are at least that many.
+        """
+
+        return self.run(count_grid, vals, limit, timeout, max_steps)
+
+    def rate(self, vals, timeout=None, max_steps=None, max_depth=None):
+        """Rates how hard a puzzle is in a worker process.
+
+        Args:
+            vals (list[int]): The values of every cell in the puzzle (0 if empty).
+            timeout (float): The most seconds the solve may take. Defaults to None.
+            max_steps (int): The most steps the solve may take. Defaults to None.
+            max_depth (int): The deepest the Nishio method may branch. Defaults to None.
+
+        Raises:
+            SolveBudgetExceeded: Thrown if a limit is reached.
+
+        Returns:
+            dict: The rating, the tier, the hardest technique needed, and the Nishio branches and depth.
+        """
+
+        return self.run(rate_grid, vals, timeout, max_steps, max_depth)
+
+    def solve_batch(self, vals, engine='human', timeout=None, max_steps=None, max_depth=None):
+        """Solves a batch of puzzles in a worker process.
+
+        Args:
+            vals (list[list[int]]): The values of every cell in each puzzle (0 if empty).
+            engine (str): The engine used for puzzles that stall. Defaults to "human".
+            timeout (float): The most seconds the solve of one puzzle may take. Defaults to None.
+            max_steps (int): The most steps the solve of one puzzle may take. Defaults to None.
+            max_depth (int): The deepest the Nishio method may branch in one puzzle. Defaults to None.
+
+        Returns:
+            tuple[numpy.ndarray]: The solved grids, whether each puzzle was solved, and the reason the budget of each
+            puzzle ran out ("" if it did not).
+        """
+
+        return self.run(solve_batch, vals, engine, 4096, timeout, max_steps, max_depth)
+
+    def shutdown(self, wait=True):
+        """Stops the worker processes and the manager of streamed solves. They are started again on the next solve.
+
+        Args:
+            wait (bool): Whether to wait for running solves to finish. Defaults to True.
+        """
+
+        self._stop_pool(wait)
+        with self._lock:
+            manager, self._manager = self._manager, None
+        if manager is not None:
+            manager.shutdown()
+
+    def _stop_pool(self, wait):
+        """Stops the worker processes.
+
+        Args:
+            wait (bool): Whether to wait for running solves to finish.
+        """
+
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=not wait)
+
+
+_service = None
+_service_lock = Lock()
+
+
+def get_solver_service():
+    """Returns the solver service of this process, configured by the SUDOKU_SOLVER_WORKERS and SUDOKU_SOLVER_TASKS_PER_CHILD settings.
+
+    Returns:
+        SolverService: The solver service.
+    """
+
+    global _service
+    # Requests that come in at once share the first service, so only one process pool is ever started.
+    with _service_lock:
+        if _service is None:
+            _service = SolverService(
+                workers=getattr(settings, 'SUDOKU_SOLVER_WORKERS', 2),
+                tasks_per_child=getattr(settings, 'SUDOKU_SOLVER_TASKS_PER_CHILD', None),
+            )
+        return _service
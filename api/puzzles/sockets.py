@@ -0,0 +1,140 @@
+import asyncio
+import json
+import queue
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
+from .admission import Overloaded, estimate_cost, get_admission_control
+from .services import get_solver_service
+from .utils.sudoku import Contradiction, SolveBudgetExceeded
+from .utils.sudoku.pool import get_puzzle_pool
+from .views import _engine, _flatten_grid, _format_grid
+
+
+def _drain(events):
+    """Takes every progress event a solve has put on its queue so far, without waiting for more.
+
+    Args:
+        events (queue.Queue): The queue from SolverService.channel().
+
+    Returns:
+        list[dict]: The events.
+    """
+
+    drained = []
+    while True:
+        try:
+            drained.append(events.get_nowait())
+        except queue.Empty:
+            return drained
+
+
+async def _send(send, data):
+    await send({'type': 'websocket.send', 'text': json.dumps(data)})
+
+
+async def _close(send, data):
+    await _send(send, data)
+    await send({'type': 'websocket.close', 'code': 1000})
+
+
+async def solve_socket(scope, receive, send):
+    """Solves a puzzle over a WebSocket, as a raw ASGI application. The client sends one JSON message with a "grid" (in
+    any form /solve/ takes, and an optional "format"), then gets "progress" events while the puzzle is solved and one
+    "solved" or "error" event at the end, after which the socket is closed. The solve runs in a solver worker process
+    so the event loop keeps serving other connections, it has to be admitted like a /solve/ request, and it is
+    cancelled as soon as the client closes the socket.
+
+    Args:
+        scope (dict): The ASGI connection scope.
+        receive (Callable): The ASGI receive channel.
+        send (Callable): The ASGI send channel.
+    """
+
+    event = await receive()
+    if event['type'] != 'websocket.connect':
+        return
+    await send({'type': 'websocket.accept'})
+
+    event = await receive()
+    if event['type'] == 'websocket.disconnect':
+        return
+    pool = get_puzzle_pool()
+    try:
+        data = json.loads(event.get('text') or event.get('bytes') or '')
+        vals = _flatten_grid(data['grid'])
+        fmt = data.get('format')
+        p = pool.acquire(vals)
+    except:
+        await _close(send, {'type': 'error', 'error': 'Invalid puzzle'})
+        return
+    try:
+        size = p.size
+        cost = estimate_cost(p)
+    except Contradiction:
+        cost = None
+    finally:
+        pool.release(p)
+    if cost is None:
+        await _close(send, {'type': 'error', 'error': 'Puzzle can not be solved'})
+        return
+
+    # Waiting for a slot blocks, so it is done in a thread, which is handed back as soon as the solve is admitted.
+    slot = get_admission_control().admit((scope.get('client') or [None])[0], cost)
+    try:
+        await asyncio.to_thread(slot.__enter__)
+    except Overloaded as e:
+        await _close(send, {'type': 'error', 'error': 'Too many requests', 'reason': e.reason, 'retry_after': e.retry_after})
+        return
+
+    # The solve runs in a worker process, which puts its progress events on a queue that is drained every interval
+    # while waiting for the solve to finish or the client to leave. Leaving sets the cancel event, which the solve
+    # checks between its steps.
+    service = get_solver_service()
+    cancel, events = service.channel()
+    interval = getattr(settings, 'SUDOKU_WS_PROGRESS_INTERVAL', 0.1)
+    solve = asyncio.ensure_future(service.astream(
+        vals,
+        _engine(size),
+        getattr(settings, 'SUDOKU_SOLVE_TIMEOUT', None),
+        getattr(settings, 'SUDOKU_SOLVE_MAX_STEPS', None),
+        getattr(settings, 'SUDOKU_SOLVE_MAX_DEPTH', None),
+        cancel,
+        events,
+        interval,
+    ))
+    closed = asyncio.ensure_future(receive())
+    try:
+        while not solve.done():
+            await asyncio.wait({solve, closed}, timeout=interval, return_when=asyncio.FIRST_COMPLETED)
+            for event in _drain(events):
+                await _send(send, event)
+            if closed.done():
+                if closed.result()['type'] == 'websocket.disconnect':
+                    return
+                # Anything else the client sends is ignored.
+                closed = asyncio.ensure_future(receive())
+    finally:
+        if not solve.done():
+            cancel.set()
+            await asyncio.wait({solve})
+            # The cancelled solve ends with SolveBudgetExceeded, which is read so it is not reported as never retrieved.
+            solve.exception()
+        closed.cancel()
+        slot.__exit__(None, None, None)
+
+    for event in _drain(events):
+        await _send(send, event)
+    try:
+        solved = solve.result()
+    except SolveBudgetExceeded as e:
+        await _send(send, {'type': 'error', 'error': 'Solve budget exceeded', 'reason': e.reason, 'partial_grid': e.grid})
+    except BrokenProcessPool:
+        await _send(send, {'type': 'error', 'error': 'Solver unavailable'})
+    except:
+        await _send(send, {'type': 'error', 'error': 'Puzzle can not be solved'})
+    else:
+        if 0 in solved:
+            await _send(send, {'type': 'error', 'error': 'Puzzle can not be solved'})
+        else:
+            await _send(send, {'type': 'solved', 'solved': 1, 'solved_grid': _format_grid(solved, fmt)})
+    await send({'type': 'websocket.close', 'code': 1000})
@@ -1,3 +1,1041 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from threading import Barrier, Thread
+from django.core import signing
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from . import admission, cache, generated, services
+from .admission import AdmissionControl, Overloaded
+from .apps import _serves_requests
+from .cache import SolutionCache
+from .sockets import solve_socket
+from .generated import GeneratedPool
+from .services import SolverService
+from .utils.sudoku import Contradiction, Puzzle, SolveBudget, SolveBudgetExceeded, std_solve
+from .utils.sudoku.bits import _LazyTable
+from .utils.sudoku.canonical import canonicalize
+from .utils.sudoku.examples import easy, evil, expert, hard, impossible, medium
+from .utils.sudoku.generator import generate, grade
+from .utils.sudoku.grader import TIER_RATINGS, TIERS, rate, rate_many, tier_of
+from .utils.sudoku.worker import _map_corpus
+from .utils.sudoku.pool import PuzzlePool
+from .utils.sudoku.wire import PACKED_BYTES, format_string, pack, parse_string, unpack
 
-# Create your tests here.
+EXAMPLES = (easy, medium, hard, expert, evil, impossible)
+
+
+def _big_grid(size, holes, seed=0):
+    """Returns a size x size puzzle with holes empty cells, dug at random out of a shuffled pattern solution."""
+
+    rng = random.Random(seed)
+    box = {16: 4, 25: 5}[size]
+    digits = list(range(1, size + 1))
+    rng.shuffle(digits)
+    vals = [digits[(box * (r % box) + r // box + c) % size] for r in range(size) for c in range(size)]
+    for idx in rng.sample(range(size * size), holes):
+        vals[idx] = 0
+    return vals
+
+
+def _transform(vals):
+    """Transposes a grid, swaps its first two rows, and relabels every digit, which leaves it the same puzzle."""
+
+    vals = [vals[c * 9 + r] for r in range(9) for c in range(9)]
+    vals = vals[9:18] + vals[:9] + vals[18:]
+    return [val and val % 9 + 1 for val in vals]
+
+
+class InlineSolverMixin:
+    """Solves in the test thread instead of in worker processes, with an empty solution cache and no solves admitted."""
+
+    def setUp(self):
+        super().setUp()
+        services._service = SolverService(workers=0)
+        cache._cache = SolutionCache()
+        admission._admission = None
+
+    def tearDown(self):
+        services._service = None
+        cache._cache = None
+        admission._admission = None
+        super().tearDown()
+
+
+class SolutionMixin:
+    def assertSolution(self, vals, solved):
+        """Asserts that solved keeps every clue of vals and has every digit once in every row, column, and box."""
+
+        self.assertEqual(len(solved), 81)
+        self.assertTrue(all(val in (0, sol) for val, sol in zip(vals, solved)))
+        units = [[r * 9 + c for c in range(9)] for r in range(9)]
+        units += [[r * 9 + c for r in range(9)] for c in range(9)]
+        units += [[(b // 3 * 3 + i // 3) * 9 + b % 3 * 3 + i % 3 for i in range(9)] for b in range(9)]
+        for unit in units:
+            self.assertEqual(sorted(solved[idx] for idx in unit), list(range(1, 10)))
+
+
+class CandidateTests(SolutionMixin, SimpleTestCase):
+    def test_masks(self):
+        # Every empty cell has the digits none of its peers hold, and a solved cell only its own value.
+        vals = easy(0)
+        p = Puzzle(vals)
+        for idx, val in enumerate(vals):
+            if val:
+                self.assertEqual(p.masks[idx], 1 << val - 1)
+            else:
+                seen = {vals[peer] for peer in p.peers[idx]}
+                self.assertEqual(p.masks[idx], sum(1 << d - 1 for d in range(1, 10) if d not in seen))
+
+    def test_human_engine(self):
+        for example in EXAMPLES:
+            with self.subTest(example.__name__):
+                p = Puzzle(example(0))
+                p.solve(engine='human')
+                self.assertEqual(p.unsolved, 0)
+                self.assertSolution(example(0), p.vals.tolist())
+
+
+def _state(p):
+    """Returns everything undo() has to put back."""
+
+    return p.vals.tolist(), p.masks.tolist(), p.counts.tolist(), p.unsolved, p.empty
+
+
+class TrailTests(SimpleTestCase):
+    def test_undo_guess_and_propagation(self):
+        p = Puzzle(hard(0))
+        before = _state(p)
+        mark = p.mark()
+        idx = p.vals.tolist().index(0)
+        p.place(idx, p.masks[idx].bit_length())
+        try:
+            std_solve(p)
+        except Contradiction:
+            pass
+        self.assertNotEqual(_state(p), before)
+        p.undo(mark)
+        self.assertEqual(_state(p), before)
+        self.assertEqual(len(p.trail), mark)
+        self.assertEqual(p.validate_full(), (True, ''))
+
+    def test_undo_contradiction(self):
+        # A guess that empties a cell is rolled back with the count of empty cells.
+        p = Puzzle(hard(0))
+        before = _state(p)
+        mark = p.mark()
+        idx = p.vals.tolist().index(0)
+        with self.assertRaises(Contradiction):
+            p._set_mask(idx, 0)
+        self.assertEqual(p.empty, 1)
+        p.undo(mark)
+        self.assertEqual(_state(p), before)
+
+    def test_nested_marks(self):
+        p = Puzzle(evil(0))
+        empty = [idx for idx, val in enumerate(p.vals) if not val]
+        outer = p.mark()
+        p.place(empty[0], p.masks[empty[0]].bit_length())
+        middle, state = p.mark(), _state(p)
+        p.place(empty[-1], p.masks[empty[-1]].bit_length())
+        p.undo(middle)
+        self.assertEqual(_state(p), state)
+        p.undo(outer)
+        self.assertEqual(_state(p), _state(Puzzle(evil(0))))
+
+    def test_restore(self):
+        p = Puzzle(medium(0))
+        std_solve(p)
+        other = Puzzle(size=9)
+        other.restore(p.vals.tolist(), p.masks.tolist())
+        self.assertEqual(_state(other), _state(p))
+        self.assertEqual(other.trail, [])
+
+
+class DancingLinksTests(SolutionMixin, SimpleTestCase):
+    def test_dlx_engine(self):
+        for example in EXAMPLES:
+            with self.subTest(example.__name__):
+                p = Puzzle(example(0))
+                p.solve(engine='dlx')
+                self.assertSolution(example(0), p.vals.tolist())
+
+    def test_engines_agree(self):
+        # These examples have a single solution, so both engines have to find the same one. The impossible example has
+        # several, and the engines may pick different ones.
+        for example in (easy, medium, hard, expert, evil):
+            with self.subTest(example.__name__):
+                human, dlx = Puzzle(example(0)), Puzzle(example(0))
+                human.solve(engine='human')
+                dlx.solve(engine='dlx')
+                self.assertEqual(human.vals.tolist(), dlx.vals.tolist())
+
+    def test_no_solution(self):
+        # 2 is a candidate of the first cell but not its value in the only solution.
+        vals = hard(0)
+        vals[0] = 2
+        p = Puzzle(vals)
+        with self.assertRaises(Contradiction):
+            p.solve(engine='dlx')
+
+
+class CanonicalTests(SolutionMixin, SimpleTestCase):
+    def test_symmetric_puzzles_share_a_form(self):
+        for example in EXAMPLES:
+            with self.subTest(example.__name__):
+                key, transform = canonicalize(example(0))
+                self.assertEqual(canonicalize(_transform(example(0)))[0], key)
+                self.assertEqual(transform.invert(transform.apply(example(0))), example(0))
+
+    def test_cache_hit_under_symmetry(self):
+        solution_cache = SolutionCache()
+        vals = hard(0)
+        cached, keys = solution_cache.lookup(vals)
+        self.assertIsNone(cached)
+        p = Puzzle(vals)
+        p.solve()
+        solution_cache.store(keys, p.vals.tolist())
+
+        other = _transform(vals)
+        cached, _ = solution_cache.lookup(other)
+        self.assertEqual(cached, _transform(p.vals.tolist()))
+        self.assertSolution(other, cached)
+        # The symmetric grid is now kept under its own key too.
+        self.assertEqual(solution_cache.lookup(other, symmetric=False)[0], cached)
+
+    def test_exact_lookup_skips_canonical_form(self):
+        solution_cache = SolutionCache()
+        cached, keys = solution_cache.lookup(easy(0), symmetric=False)
+        self.assertEqual((cached, keys), (None, (format_string(easy(0)).replace('.', '0'), None)))
+        p = Puzzle(easy(0))
+        p.solve()
+        solution_cache.store(keys, p.vals.tolist())
+        self.assertEqual(solution_cache.lookup(easy(0), symmetric=False)[0], p.vals.tolist())
+        self.assertIsNone(solution_cache.lookup(_transform(easy(0)))[0])
+
+
+class BatchTests(InlineSolverMixin, SimpleTestCase):
+    def post_ndjson(self, lines):
+        response = self.client.post(
+            '/solve/batch/', data='\n'.join(lines).encode() + b'\n', content_type='application/x-ndjson'
+        )
+        self.assertEqual(response.status_code, 200)
+        return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    def test_bare_grid_lines(self):
+        # Lines that start with 1-9 are also valid JSON ints, lines with 0 for blanks start with 0 or a digit.
+        lines = [format_string(evil(0)).replace('.', '0'), format_string(easy(0)).replace('.', '0'), format_string(easy(0))]
+        results = self.post_ndjson(lines)
+        self.assertEqual([result['index'] for result in results], [0, 1, 2])
+        for result in results:
+            self.assertEqual(result.get('solved'), 1, result)
+            self.assertEqual(len(result['solved_grid']), 9)
+
+    def test_json_lines(self):
+        results = self.post_ndjson([
+            json.dumps(easy(0)),
+            json.dumps({'grid': format_string(evil(0))}),
+            '12345',
+            '{"grid": "not a grid"}',
+        ])
+        self.assertEqual(results[0]['solved'], 1)
+        self.assertEqual(results[1]['solved'], 1)
+        self.assertEqual(results[2]['error'], 'Invalid puzzle')
+        self.assertEqual(results[3]['error'], 'Invalid puzzle')
+
+    @override_settings(SUDOKU_SOLVE_MAX_STEPS=1)
+    def test_budget_per_line(self):
+        # Singles solve the easy grid in the batch, the other one needs the solver and runs out of steps.
+        results = self.post_ndjson([format_string(easy(0)), format_string(impossible(0))])
+        self.assertEqual(results[0]['solved'], 1)
+        self.assertEqual(results[1], {'index': 1, 'error': 'Solve budget exceeded', 'reason': 'steps'})
+
+
+class EngineTests(InlineSolverMixin, SimpleTestCase):
+    @override_settings(SUDOKU_SOLVER_ENGINE='dlx')
+    def test_dlx_only_for_9x9(self):
+        response = self.client.post('/solve/', {'grid': evil(0), 'stats': True}, content_type='application/json')
+        self.assertEqual(response.json()['stats']['engine'], 'dlx')
+        grid = _big_grid(16, 120)
+        response = self.client.post(
+            '/solve/', {'grid': [grid[r : r + 16] for r in range(0, 256, 16)], 'stats': True}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['stats']['engine'], 'human')
+
+
+class SolveCacheTests(InlineSolverMixin, SolutionMixin, SimpleTestCase):
+    def test_cache_hit_under_symmetry(self):
+        self.client.post('/solve/', {'grid': hard(0)}, content_type='application/json')
+        self.assertEqual(len(cache._cache._entries), 2)
+        # The symmetric puzzle is answered from the cache, so it is not turned away although no solve is admitted.
+        admission._admission = AdmissionControl(per_client=0)
+        other = _transform(hard(0))
+        response = self.client.post('/solve/', {'grid': other}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertSolution(other, sum(response.json()['solved_grid'], []))
+        self.assertEqual(len(cache._cache._entries), 3)
+
+    def test_singles_puzzle_is_only_kept_by_grid(self):
+        # Singles solve the easy example, so it is never canonicalized.
+        self.client.post('/solve/', {'grid': easy(0)}, content_type='application/json')
+        self.assertEqual(list(cache._cache._entries), [format_string(easy(0)).replace('.', '0')])
+        response = self.client.post('/solve/', {'grid': easy(0)}, content_type='application/json')
+        self.assertSolution(easy(0), sum(response.json()['solved_grid'], []))
+
+
+class SolverServiceTests(SolutionMixin, SimpleTestCase):
+    """Solves in a real worker process, where everything has to cross the process boundary."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.service = SolverService(workers=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.service.shutdown()
+        super().tearDownClass()
+
+    def test_solves_in_a_worker(self):
+        self.assertNotEqual(self.service.run(os.getpid), os.getpid())
+        self.assertSolution(hard(0), self.service.solve(hard(0)))
+        solved, stats, steps = self.service.profile(evil(0), trace=True)
+        self.assertSolution(evil(0), solved)
+        self.assertEqual(stats['engine'], 'human')
+        self.assertTrue(steps)
+        self.assertEqual(self.service.count_solutions(expert(0)), 1)
+        self.assertEqual(self.service.count_solutions(impossible(0)), 2)
+
+    def test_budget_crosses_the_boundary(self):
+        with self.assertRaises(SolveBudgetExceeded) as raised:
+            self.service.solve(impossible(0), 'human', None, 1)
+        self.assertEqual(raised.exception.reason, 'steps')
+        self.assertEqual(len(raised.exception.grid), 9)
+
+    def test_view(self):
+        services._service = self.service
+        try:
+            response = self.client.post('/solve/', {'grid': evil(0)}, content_type='application/json')
+        finally:
+            services._service = None
+        self.assertEqual(response.status_code, 200)
+        self.assertSolution(evil(0), sum(response.json()['solved_grid'], []))
+
+
+class SingletonTests(SimpleTestCase):
+    def test_one_instance_under_a_race(self):
+        for module, name, get in (
+            (services, '_service', services.get_solver_service),
+            (cache, '_cache', cache.get_solution_cache),
+            (admission, '_admission', admission.get_admission_control),
+        ):
+            with self.subTest(get.__name__):
+                setattr(module, name, None)
+                barrier, found = Barrier(8), []
+
+                def first():
+                    barrier.wait()
+                    found.append(get())
+
+                threads = [Thread(target=first) for _ in range(8)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                setattr(module, name, None)
+                self.assertEqual(len({id(instance) for instance in found}), 1)
+
+
+class BudgetTests(InlineSolverMixin, SimpleTestCase):
+    def test_budget(self):
+        budget = SolveBudget(max_steps=2)
+        budget.step()
+        budget.step()
+        with self.assertRaises(SolveBudgetExceeded) as raised:
+            budget.step()
+        self.assertEqual(raised.exception.reason, 'steps')
+
+    def test_cancel(self):
+        budget = SolveBudget()
+        budget.cancel()
+        with self.assertRaises(SolveBudgetExceeded) as raised:
+            Puzzle(impossible(0)).solve(budget=budget)
+        self.assertEqual(raised.exception.reason, 'cancelled')
+
+    def test_partial_grid(self):
+        # The guesses are rolled back, so the puzzle is left with what follows from the clues.
+        p = Puzzle(impossible(0))
+        with self.assertRaises(SolveBudgetExceeded) as raised:
+            p.solve(max_depth=0)
+        self.assertEqual(raised.exception.reason, 'depth')
+        self.assertEqual(sum(raised.exception.grid, []), p.vals.tolist())
+        self.assertEqual(p.validate_full(), (True, ''))
+
+    @override_settings(SUDOKU_SOLVE_TIMEOUT=0, SUDOKU_SOLVE_RETRY_AFTER=5)
+    def test_timeout_response(self):
+        response = self.client.post('/solve/', {'grid': impossible(0)}, content_type='application/json')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['reason'], 'timeout')
+        self.assertEqual(response['Retry-After'], '5')
+
+    @override_settings(SUDOKU_SOLVE_MAX_STEPS=1)
+    def test_steps_response(self):
+        response = self.client.post('/solve/', {'grid': impossible(0)}, content_type='application/json')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(response.json()['reason'], 'steps')
+        self.assertEqual(len(response.json()['partial_grid']), 9)
+        self.assertNotIn('Retry-After', response)
+
+
+class UniqueTests(InlineSolverMixin, SimpleTestCase):
+    def test_count(self):
+        self.assertEqual(Puzzle(expert(0)).count_solutions(), 1)
+        self.assertEqual(Puzzle(impossible(0)).count_solutions(), 2)
+        self.assertEqual(Puzzle(impossible(0)).count_solutions(limit=5), 5)
+        p = Puzzle(impossible(0))
+        solutions = list(p.iter_solutions(limit=3))
+        self.assertEqual(len({str(sol) for sol in solutions}), 3)
+        # The puzzle itself is not changed by the search.
+        self.assertEqual(p.vals.tolist(), impossible(0))
+
+    def test_unique_flag(self):
+        for example, unique in ((expert, True), (impossible, False)):
+            with self.subTest(example.__name__):
+                response = self.client.post(
+                    '/solve/', {'grid': example(0), 'unique': True}, content_type='application/json'
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertIs(response.json()['unique'], unique)
+
+    def test_count_budget(self):
+        with self.assertRaises(SolveBudgetExceeded):
+            Puzzle(impossible(0)).count_solutions(max_steps=1)
+
+
+class StatsTests(InlineSolverMixin, SimpleTestCase):
+    def test_counters(self):
+        vals = evil(0)
+        stats = Puzzle(vals).solve(stats=True).to_dict()
+        techniques = stats['techniques']
+        # Without guessing, every empty cell is placed by exactly one technique.
+        self.assertEqual(stats['nishio'], {'branches': 0, 'max_depth': 0})
+        self.assertEqual(sum(c['placements'] for c in techniques.values()), vals.count(0))
+        # The totals are the sums of the rounds.
+        for name, counters in techniques.items():
+            for key in ('calls', 'eliminations', 'placements'):
+                self.assertEqual(counters[key], sum(r[name][key] for r in stats['rounds'] if name in r))
+        self.assertGreater(techniques['naked_1']['calls'], 0)
+
+    def test_branches(self):
+        stats = Puzzle(impossible(0)).solve(stats=True)
+        self.assertGreater(stats.branches, 0)
+        self.assertGreater(stats.max_depth, 0)
+        self.assertGreater(stats.seconds, 0)
+
+    def test_off(self):
+        p = Puzzle(evil(0))
+        self.assertIsNone(p.solve())
+        self.assertIsNone(p.stats)
+
+    def test_response(self):
+        response = self.client.post('/solve/', {'grid': evil(0), 'stats': True}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['stats']['engine'], 'human')
+        self.assertIn('naked_1', response.json()['stats']['techniques'])
+
+
+class TraceTests(SolutionMixin, SimpleTestCase):
+    def replay(self, vals, steps):
+        """Applies the steps of a trace to the notes of a freshly loaded puzzle, checking that every step only removes
+        notes that are still there, and returns the values it ends with."""
+
+        p = Puzzle(vals)
+        notes = [set(p.geo.digits[mask]) for mask in p.masks]
+        vals = list(vals)
+        for step in steps:
+            for elim in step['eliminated']:
+                row, col = elim['cell']
+                self.assertTrue(set(elim['digits']) <= notes[row * 9 + col], step)
+                notes[row * 9 + col] -= set(elim['digits'])
+            for placed in step['placed']:
+                row, col = placed['cell']
+                self.assertIn(placed['value'], notes[row * 9 + col], step)
+                self.assertEqual(vals[row * 9 + col], 0, step)
+                vals[row * 9 + col] = placed['value']
+                notes[row * 9 + col] = {placed['value']}
+        return vals
+
+    def test_replay(self):
+        for example, engine in ((evil, 'human'), (impossible, 'human'), (hard, 'dlx')):
+            with self.subTest(example.__name__, engine=engine):
+                p = Puzzle(example(0))
+                p.solve(engine=engine, trace=True)
+                steps = p.trace.to_list()
+                self.assertEqual(self.replay(example(0), steps), p.vals.tolist())
+                self.assertSolution(example(0), p.vals.tolist())
+
+    def test_refuted_guesses_are_dropped(self):
+        # The replay above only works if guesses that were refuted left nothing behind. What they ruled out is one
+        # nishio step.
+        p = Puzzle(impossible(0))
+        p.solve(trace=True)
+        techniques = [step['technique'] for step in p.trace.to_list()]
+        self.assertIn('guess', techniques)
+        self.assertIn('nishio', techniques)
+
+    def test_off(self):
+        p = Puzzle(evil(0))
+        p.solve()
+        self.assertIsNone(p.trace)
+
+
+class GeneratorTests(SolutionMixin, SimpleTestCase):
+    def test_every_tier(self):
+        for num, difficulty in enumerate(TIERS):
+            with self.subTest(difficulty):
+                vals, solution = generate(difficulty, rng=random.Random(2))
+                self.assertEqual(grade(vals), (num, True))
+                self.assertSolution(vals, solution)
+
+    def test_parallel_attempts(self):
+        # Every tier gets its own attempt at once, and each comes back once, whichever finishes first.
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            attempts = list(GeneratedPool._attempt(executor, list(TIERS)))
+        self.assertEqual(sorted(tier for tier, _ in attempts), sorted(TIERS))
+        for tier, puzzle in attempts:
+            if puzzle is not None:
+                self.assertEqual(grade(puzzle[0]), (TIERS.index(tier), True))
+
+    def test_fill(self):
+        pool = GeneratedPool(size=1, workers=0, max_backoff=0.1)
+        pool.start()
+        deadline = time.monotonic() + 60
+        while any(pool.count(tier) < 1 for tier in TIERS) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual([pool.count(tier) for tier in TIERS], [1] * len(TIERS))
+        vals, solution = pool.take('evil')
+        self.assertEqual(grade(vals), (TIERS.index('evil'), True))
+        self.assertSolution(vals, solution)
+
+
+class GenerateViewTests(SimpleTestCase):
+    def tearDown(self):
+        generated._pool = None
+        super().tearDown()
+
+    def test_no_puzzle_ready(self):
+        generated._pool = GeneratedPool(size=0, workers=0)
+        response = self.client.get('/generate/', {'difficulty': 'hard'})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json(), {'error': 'No puzzle ready'})
+        self.assertIn('Retry-After', response)
+
+    def test_kept_puzzle(self):
+        vals, solution = generate('medium', rng=random.Random(2))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'generated.json')
+            with open(path, 'w') as f:
+                json.dump({'medium': [[''.join(map(str, vals)), ''.join(map(str, solution))]]}, f)
+            pool = GeneratedPool(size=1, path=path, workers=0)
+        # The refill after the take must not write to the removed directory.
+        pool.path = None
+        generated._pool = pool
+        response = self.client.get('/generate/', {'difficulty': 'medium'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sum(response.json()['grid'], []), vals)
+        self.assertEqual(sum(response.json()['solved_grid'], []), solution)
+
+    def test_unknown_difficulty(self):
+        response = self.client.get('/generate/', {'difficulty': 'trivial'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['difficulties'], list(TIERS))
+
+
+class AppTests(SimpleTestCase):
+    def test_serves_requests(self):
+        self.assertTrue(_serves_requests(['/venv/bin/gunicorn', 'backend.wsgi'], {}))
+        self.assertTrue(_serves_requests(['manage.py', 'runserver'], {'RUN_MAIN': 'true'}))
+        self.assertTrue(_serves_requests(['manage.py', 'runserver', '--noreload'], {}))
+        self.assertFalse(_serves_requests(['manage.py', 'runserver'], {}))
+        self.assertFalse(_serves_requests(['manage.py', 'migrate'], {}))
+        self.assertFalse(_serves_requests(['/venv/bin/django-admin', 'test'], {}))
+
+
+class GraderTests(InlineSolverMixin, SimpleTestCase):
+    def test_tier_bounds(self):
+        for num, low in enumerate(TIER_RATINGS):
+            self.assertEqual(tier_of(low), num)
+            if num:
+                self.assertEqual(tier_of(low - 0.01), num - 1)
+        self.assertEqual(tier_of(100.0), len(TIERS) - 1)
+
+    def test_examples(self):
+        self.assertEqual(rate(easy(0))['tier'], 'easy')
+        self.assertEqual(rate(easy(0))['hardest'], 'naked_1')
+        self.assertEqual(rate(medium(0))['hardest'], 'hidden_1')
+        rated = rate(impossible(0))
+        self.assertEqual((rated['tier'], rated['hardest']), ('impossible', 'nishio'))
+        self.assertGreater(rated['branches'], 0)
+        # More guessing rates higher.
+        self.assertGreater(rated['rating'], rate(expert(0))['rating'])
+
+    def test_rate_many(self):
+        grids = [example(0) for example in EXAMPLES]
+        self.assertEqual(list(rate_many(grids, workers=1, chunk_size=2)), [rate(grid) for grid in grids])
+
+    def test_view(self):
+        response = self.client.post('/rate/', {'grid': evil(0)}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), rate(evil(0)))
+
+
+class HintTests(SimpleTestCase):
+    def post_hint(self, grid, token=None):
+        data = {'grid': grid} if token is None else {'grid': grid, 'token': token}
+        return self.client.post('/hint/', data, content_type='application/json')
+
+    def test_token_round_trip(self):
+        vals = easy(0)
+        response = self.post_hint(vals)
+        self.assertEqual(response.status_code, 200)
+        hint = response.json()
+        for placed in hint['hint']['placed']:
+            row, col = placed['cell']
+            vals[row * 9 + col] = placed['value']
+
+        response = self.post_hint(vals, hint['token'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.json()['hint'])
+        self.assertNotEqual(response.json()['token'], hint['token'])
+
+    def test_tampered_token(self):
+        token = self.post_hint(easy(0)).json()['token']
+        value, signature = token.rsplit(':', 1)
+        tampered = ('B' if value[0] == 'A' else 'A') + value[1:]
+        for token in (f'{tampered}:{signature}', value, signing.Signer().sign(value)):
+            with self.subTest(token=token):
+                response = self.post_hint(easy(0), token)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'error': 'Invalid token'})
+
+
+class WireTests(SimpleTestCase):
+    def test_string_round_trip(self):
+        for example in EXAMPLES:
+            vals = example(0)
+            text = format_string(vals)
+            self.assertEqual(len(text), 81)
+            self.assertEqual(list(parse_string(text)), vals)
+            self.assertEqual(list(parse_string(text.replace('.', '0'))), vals)
+
+    def test_packed_round_trip(self):
+        for example in EXAMPLES:
+            data = pack(example(0))
+            self.assertEqual(len(data), PACKED_BYTES)
+            self.assertEqual(list(unpack(data)), example(0))
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            parse_string('1' * 80)
+        with self.assertRaises(ValueError):
+            parse_string('x' * 81)
+        with self.assertRaises(ValueError):
+            unpack(b'\0' * (PACKED_BYTES - 1))
+        with self.assertRaises(ValueError):
+            unpack(b'\xaa' * PACKED_BYTES)
+
+
+class WireViewTests(InlineSolverMixin, SolutionMixin, SimpleTestCase):
+    def test_packed_body(self):
+        response = self.client.post('/solve/', data=pack(evil(0)), content_type='application/octet-stream')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/octet-stream')
+        self.assertSolution(evil(0), list(unpack(response.content)))
+
+    def test_string_body(self):
+        response = self.client.post('/solve/', data=format_string(medium(0)), content_type='text/plain')
+        self.assertEqual(response.status_code, 200)
+        self.assertSolution(medium(0), list(parse_string(response.json()['solved_grid'])))
+
+
+class CorpusTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.input = os.path.join(self.dir.name, 'corpus.txt')
+        self.output = os.path.join(self.dir.name, 'solved.tsv')
+        self.ckpt = f'{self.output}.checkpoint'
+        self.lines = [format_string(example(0)) for example in EXAMPLES]
+        with open(self.input, 'w') as f:
+            f.write(''.join(f'{line}\n' for line in self.lines))
+
+    def solve_corpus(self):
+        out = io.StringIO()
+        call_command('solve_corpus', self.input, self.output, workers=1, chunk_bytes=1, stdout=out)
+        return out.getvalue()
+
+    def results(self):
+        with open(self.output) as f:
+            return [line.split('\t') for line in f.read().splitlines()]
+
+    def test_solve(self):
+        self.assertIn(f'Solved {len(self.lines)} of {len(self.lines)} puzzles.', self.solve_corpus())
+        results = self.results()
+        self.assertEqual([result[0] for result in results], self.lines)
+        self.assertEqual({result[1] for result in results}, {'solved'})
+        self.assertFalse(os.path.exists(self.ckpt))
+
+    def test_resume(self):
+        self.solve_corpus()
+        with open(self.output, 'rb') as f:
+            done = b''.join(f.readlines()[:2])
+        # A run that stopped after two checkpointed lines, with part of a third written after the checkpoint.
+        with open(self.output, 'wb') as f:
+            f.write(done + b'partial')
+        with open(self.ckpt, 'w') as f:
+            json.dump({
+                'input': os.path.abspath(self.input), 'size': os.path.getsize(self.input),
+                'offset': 82 * 2, 'output_offset': len(done), 'puzzles': 2, 'solved': 2,
+            }, f)
+
+        out = self.solve_corpus()
+        self.assertIn('Resuming after 2 puzzles.', out)
+        self.assertIn(f'Solved {len(self.lines)} of {len(self.lines)} puzzles.', out)
+        self.assertEqual([result[0] for result in self.results()], self.lines)
+        self.assertFalse(os.path.exists(self.ckpt))
+
+    def test_empty_corpus_clears_the_checkpoint(self):
+        open(self.input, 'w').close()
+        with open(self.ckpt, 'w') as f:
+            json.dump({
+                'input': os.path.abspath(self.input), 'size': 0,
+                'offset': 0, 'output_offset': 0, 'puzzles': 0, 'solved': 0,
+            }, f)
+        self.solve_corpus()
+        self.assertFalse(os.path.exists(self.ckpt))
+
+    def test_changed_corpus_is_mapped_again(self):
+        mm = _map_corpus(self.input)
+        self.assertIs(_map_corpus(self.input), mm)
+        with open(self.input, 'a') as f:
+            f.write(f'{self.lines[0]}\n')
+        other = _map_corpus(self.input)
+        self.assertIsNot(other, mm)
+        self.assertTrue(mm.closed)
+        self.assertEqual(len(other), 82 * (len(self.lines) + 1))
+
+
+class LargeBoardTests(InlineSolverMixin, SolutionMixin, SimpleTestCase):
+    def assertSolved(self, vals, solved):
+        size = int(len(vals) ** 0.5)
+        p = Puzzle(solved)
+        self.assertEqual(p.size, size)
+        self.assertEqual(p.unsolved, 0)
+        self.assertEqual(p.validate_full(), (True, ''))
+        self.assertTrue(all(val == new for val, new in zip(vals, solved) if val))
+
+    def test_16x16(self):
+        vals = _big_grid(16, 120)
+        p = Puzzle(vals)
+        p.solve()
+        self.assertSolved(vals, p.vals.tolist())
+
+    def test_25x25(self):
+        vals = _big_grid(25, 300, seed=1)
+        p = Puzzle(vals)
+        p.solve()
+        self.assertSolved(vals, p.vals.tolist())
+
+    def test_view(self):
+        vals = _big_grid(16, 120, seed=2)
+        response = self.client.post('/solve/', {'grid': vals}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertSolved(vals, sum(response.json()['solved_grid'], []))
+
+    def test_wide_tables_stay_bounded(self):
+        table = _LazyTable(int.bit_count, maxsize=64)
+        for mask in range(1000):
+            self.assertEqual(table[mask], mask.bit_count())
+            self.assertLessEqual(len(table), 64)
+        self.assertEqual(table[1], 1)
+
+
+class PoolTests(SimpleTestCase):
+    def test_reuse_leaves_nothing_behind(self):
+        pool = PuzzlePool()
+        p = pool.acquire(impossible(0))
+        with self.assertRaises(SolveBudgetExceeded):
+            p.solve(max_steps=50, stats=True, trace=True)
+        pool.release(p)
+
+        with pool.puzzle(hard(0)) as q:
+            self.assertIs(q, p)
+            fresh = Puzzle(hard(0))
+            self.assertEqual(_state(q), _state(fresh))
+            self.assertEqual(q.dirty, fresh.dirty)
+            self.assertEqual((q.trail, q.budget, q.stats, q.trace), ([], None, None, None))
+            counts = [
+                {name: (tech['calls'], tech['eliminations'], tech['placements']) for name, tech in techniques.items()}
+                for techniques in (puzzle.solve(stats=True).to_dict()['techniques'] for puzzle in (q, fresh))
+            ]
+            self.assertEqual(counts[0], counts[1])
+            self.assertEqual(q.vals, fresh.vals)
+
+    def test_sizes_are_kept_apart(self):
+        pool = PuzzlePool(maxsize=1)
+        with pool.puzzle(hard(0)) as p:
+            pass
+        with pool.puzzle(_big_grid(16, 40)) as q:
+            self.assertIsNot(q, p)
+            self.assertEqual(q.size, 16)
+        self.assertEqual((pool.count(9), pool.count(16)), (1, 1))
+
+    def test_invalid_grid_returns_the_puzzle(self):
+        pool = PuzzlePool()
+        with self.assertRaises(Contradiction):
+            pool.acquire([1, 1] + [0] * 79)
+        self.assertEqual(pool.count(), 1)
+
+
+class SocketMixin:
+    def converse(self, grid, leave=False):
+        """Runs a WebSocket solve of grid and returns the events sent back, closing the socket at the first progress
+        event if leave is set."""
+
+        messages = []
+
+        async def run():
+            incoming = asyncio.Queue()
+
+            async def send(message):
+                messages.append(message)
+                if leave and message['type'] == 'websocket.send' and json.loads(message['text'])['type'] == 'progress':
+                    incoming.put_nowait({'type': 'websocket.disconnect'})
+
+            incoming.put_nowait({'type': 'websocket.connect'})
+            incoming.put_nowait({'type': 'websocket.receive', 'text': json.dumps({'grid': grid})})
+            scope = {'type': 'websocket', 'client': ('127.0.0.1', 1234)}
+            await asyncio.wait_for(solve_socket(scope, incoming.get, send), 30)
+
+        asyncio.run(run())
+        self.assertEqual(messages[0], {'type': 'websocket.accept'})
+        return [json.loads(message['text']) for message in messages if message['type'] == 'websocket.send'], messages
+
+
+@override_settings(SUDOKU_WS_PROGRESS_INTERVAL=0)
+class SocketTests(InlineSolverMixin, SocketMixin, SolutionMixin, SimpleTestCase):
+    def test_solved(self):
+        events, messages = self.converse(expert(0))
+        self.assertEqual(messages[-1], {'type': 'websocket.close', 'code': 1000})
+        self.assertEqual({event['type'] for event in events[:-1]}, {'progress'})
+        self.assertTrue(any(event['depth'] for event in events[:-1]))
+        self.assertEqual(events[-1]['type'], 'solved')
+        self.assertSolution(expert(0), sum(events[-1]['solved_grid'], []))
+
+    def test_invalid(self):
+        events, messages = self.converse([1, 2, 3])
+        self.assertEqual(events, [{'type': 'error', 'error': 'Invalid puzzle'}])
+        self.assertEqual(messages[-1]['type'], 'websocket.close')
+        unsolvable = hard(0)
+        unsolvable[0] = 2
+        events, _ = self.converse(unsolvable)
+        self.assertEqual(events[-1], {'type': 'error', 'error': 'Puzzle can not be solved'})
+
+    def test_leaving_cancels_the_solve(self):
+        # Solving this grid takes seconds, far longer than the socket stays open.
+        start = time.perf_counter()
+        events, messages = self.converse(_big_grid(25, 360, seed=1), leave=True)
+        self.assertLess(time.perf_counter() - start, 3)
+        self.assertNotIn('websocket.close', [message['type'] for message in messages])
+        self.assertNotIn('solved', [event['type'] for event in events])
+        self.assertEqual(admission._admission.counts()['slow']['running'], 0)
+
+    @override_settings(SUDOKU_ADMISSION_MAX_COST=0)
+    def test_overloaded(self):
+        events, _ = self.converse(hard(0))
+        self.assertEqual(events, [{'type': 'error', 'error': 'Too many requests', 'reason': 'cost', 'retry_after': 2}])
+
+
+@override_settings(SUDOKU_WS_PROGRESS_INTERVAL=0)
+class SocketWorkerTests(SocketMixin, SolutionMixin, SimpleTestCase):
+    """Solves socket requests in a real worker process, which reports progress and is cancelled across the boundary."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.service = SolverService(workers=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.service.shutdown()
+        super().tearDownClass()
+
+    def setUp(self):
+        services._service = self.service
+        admission._admission = None
+
+    def tearDown(self):
+        services._service = None
+        admission._admission = None
+
+    def test_solved(self):
+        events, _ = self.converse(expert(0))
+        self.assertIn('progress', {event['type'] for event in events})
+        self.assertEqual(events[-1]['type'], 'solved')
+        self.assertSolution(expert(0), sum(events[-1]['solved_grid'], []))
+
+    def test_leaving_cancels_the_solve(self):
+        start = time.perf_counter()
+        events, _ = self.converse(_big_grid(25, 360, seed=1), leave=True)
+        self.assertLess(time.perf_counter() - start, 3)
+        self.assertNotIn('solved', [event['type'] for event in events])
+        # The worker is free again right away.
+        self.assertSolution(hard(0), self.service.solve(hard(0)))
+
+
+class AdmissionTests(SimpleTestCase):
+    def test_lanes(self):
+        control = AdmissionControl(fast_cost=4)
+        self.assertEqual(control.lane(0), 'fast')
+        self.assertEqual(control.lane(4), 'fast')
+        self.assertEqual(control.lane(5), 'slow')
+        with control.admit('a', 0) as lane:
+            self.assertEqual(lane, 'fast')
+            with control.admit('b', 50) as lane:
+                self.assertEqual(lane, 'slow')
+                self.assertEqual(control.counts(), {
+                    'fast': {'running': 1, 'waiting': 0}, 'slow': {'running': 1, 'waiting': 0}
+                })
+        self.assertEqual(control.counts()['slow'], {'running': 0, 'waiting': 0})
+
+    def test_full_queue(self):
+        # A busy slow lane with no room to wait sheds slow solves but still admits fast ones.
+        control = AdmissionControl(slow_slots=1, queue_size=0, retry_after=7)
+        with control.admit('a', 50):
+            with self.assertRaises(Overloaded) as raised:
+                with control.admit('b', 50):
+                    pass
+            self.assertEqual((raised.exception.reason, raised.exception.retry_after), ('queue', 7))
+            with control.admit('b', 0) as lane:
+                self.assertEqual(lane, 'fast')
+
+    def test_wait_timeout(self):
+        control = AdmissionControl(slow_slots=1, max_wait=0.01)
+        with control.admit('a', 50):
+            with self.assertRaises(Overloaded) as raised:
+                with control.admit('b', 50):
+                    pass
+        self.assertEqual(raised.exception.reason, 'timeout')
+        self.assertEqual(control.counts()['slow'], {'running': 0, 'waiting': 0})
+
+    def test_limits(self):
+        control = AdmissionControl(per_client=1, max_cost=60)
+        with self.assertRaises(Overloaded) as raised:
+            with control.admit('a', 61):
+                pass
+        self.assertEqual(raised.exception.reason, 'cost')
+        with control.admit('a', 0):
+            with self.assertRaises(Overloaded) as raised:
+                with control.admit('a', 0):
+                    pass
+            self.assertEqual(raised.exception.reason, 'client')
+            with control.admit('b', 0):
+                pass
+
+    @override_settings(SUDOKU_SOLVER_WORKERS=3, SUDOKU_ADMISSION_SLOW_SLOTS=8)
+    def test_slow_lane_leaves_a_worker(self):
+        admission._admission = None
+        try:
+            self.assertEqual(admission.get_admission_control().slots['slow'], 2)
+        finally:
+            admission._admission = None
+
+
+class OverloadTests(InlineSolverMixin, SimpleTestCase):
+    def test_too_many_requests(self):
+        admission._admission = AdmissionControl(max_cost=0, retry_after=3)
+        response = self.client.post('/solve/', {'grid': easy(0)}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post('/solve/', {'grid': evil(0)}, content_type='application/json')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.json(), {'error': 'Too many requests', 'reason': 'cost'})
+        self.assertEqual(response['Retry-After'], '3')
+
+    def test_rate(self):
+        admission._admission = AdmissionControl(max_cost=0, retry_after=3)
+        response = self.client.post('/rate/', {'grid': easy(0)}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post('/rate/', {'grid': evil(0)}, content_type='application/json')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.json(), {'error': 'Too many requests', 'reason': 'cost'})
+        self.assertEqual(response['Retry-After'], '3')
+
+    def test_batch(self):
+        # Every chunk of a batch takes the slow lane, even one that singles solve.
+        admission._admission = AdmissionControl(max_cost=0, retry_after=3)
+        response = self.client.post('/solve/batch/', {'grids': [easy(0)]}, content_type='application/json')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '3')
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), {'error': 'Too many requests', 'reason': 'cost'})
+
+    @override_settings(SUDOKU_BATCH_CHUNK_SIZE=1)
+    def test_batch_sheds_later_chunks(self):
+        admission._admission = _AdmitOnce(retry_after=3)
+        response = self.client.post('/solve/batch/', {'grids': [easy(0), evil(0)]}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        results = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(results[0]['solved'], 1)
+        self.assertEqual(results[1], {'index': 1, 'error': 'Too many requests', 'reason': 'queue', 'retry_after': 3})
+        self.assertEqual(admission._admission.counts()['slow'], {'running': 0, 'waiting': 0})
+
+
+class _AdmitOnce(AdmissionControl):
+    """Admits the first solve and finds the queue full for every later one."""
+
+    admitted = 0
+
+    def _acquire(self, client, lane, cost):
+        if self.admitted:
+            raise Overloaded('queue', self.retry_after)
+        self.admitted += 1
+        super()._acquire(client, lane, cost)
+
+
+class BookkeepingTests(InlineSolverMixin, SolutionMixin, SimpleTestCase):
+    def test_counts_follow_placements(self):
+        p = Puzzle(hard(0))
+        solution = Puzzle(hard(0))
+        solution.solve()
+        for idx in range(81):
+            if not p.vals[idx]:
+                p.place(idx, solution.vals[idx])
+                self.assertEqual(p.validate_full(), (True, ''))
+        self.assertEqual(p.unsolved, 0)
+
+    def test_value_twice_in_a_unit(self):
+        p = Puzzle(hard(0))
+        idx = p.vals.index(0)
+        row = idx // 9
+        taken = next(p.vals[row * 9 + col] for col in range(9) if p.vals[row * 9 + col])
+        with self.assertRaises(Contradiction):
+            p.place(idx, taken)
+        with self.assertRaises(Contradiction):
+            Puzzle([1, 1] + [0] * 79)
+
+    def test_solve_view(self):
+        response = self.client.post('/solve/', {'grid': hard(0)}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertSolution(hard(0), sum(response.json()['solved_grid'], []))
+        for grid in ([1, 2, 3], [1, 1] + [0] * 79):
+            response = self.client.post('/solve/', {'grid': grid}, content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'error': 'Invalid puzzle'})
+        response = self.client.post('/solve/', {'grid': [0] * 81}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'Puzzle can not be solved'})
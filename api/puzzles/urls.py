@@ -1,10 +1,14 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import solve_puzzle
+from .views import generate_puzzle, hint_puzzle, rate_puzzle, solve_puzzle, solve_puzzle_batch
 
 router = DefaultRouter()
 
 urlpatterns = [
     path('', include(router.urls)),
     path('solve/', solve_puzzle, name='solve_puzzle'),
-]
\ No newline at end of file
+    path('solve/batch/', solve_puzzle_batch, name='solve_puzzle_batch'),
+    path('generate/', generate_puzzle, name='generate_puzzle'),
+    path('rate/', rate_puzzle, name='rate_puzzle'),
+    path('hint/', hint_puzzle, name='hint_puzzle'),
+]
@@ -1,3 +1,4 @@
 from .puzzle import Puzzle
+from .batch import solve_batch
 from .solver import *
 from .examples import *
@@ -0,0 +1,137 @@
+"""Vectorized solving of many puzzles at once.
+
+The candidates of N puzzles are held as an (N, 81) tensor of 9-bit masks. Unit eliminations, naked singles, and
+hidden singles are applied to the whole batch with NumPy array operations, and only the puzzles that stall after
+that fall back to solving one Puzzle at a time.
+"""
+
+import numpy as np
+from . import geometry
+from .bits import ALL, BIT, POPCOUNT, VALUE
+from .pool import get_puzzle_pool
+from .solver import Contradiction, SolveBudgetExceeded
+
+# The cell indices of every row, column, and box, and the 20 peers of every cell.
+UNITS = np.array(geometry.UNITS)
+PEERS = np.array(geometry.PEERS)
+
+BIT_TABLE = np.array(BIT, dtype=np.uint16)
+POPCOUNT_TABLE = np.frombuffer(POPCOUNT, dtype=np.uint8)
+VALUE_TABLE = np.frombuffer(VALUE, dtype=np.uint8)
+
+
+def solve_batch(grids, engine="dlx", chunk_size=4096, timeout=None, max_steps=None, max_depth=None):
+    """Solves a batch of puzzles. Singles are found for the whole batch at once, then every puzzle that is left unsolved is solved on its own with Puzzle.solve(), each with its own budget.
+
+    Args:
+        grids (numpy.ndarray): The puzzles to solve, shaped (N, 81) or (N, 9, 9), with 0 for empty cells.
+        engine (str): The engine Puzzle.solve() uses for puzzles that stall. Defaults to "dlx".
+        chunk_size (int): The most puzzles held in the candidate tensor at a time. Defaults to 4096.
+        timeout (float): The most seconds the solve of one puzzle may take. Defaults to None.
+        max_steps (int): The most steps the solve of one puzzle may take. Defaults to None.
+        max_depth (int): The deepest the Nishio method may branch in one puzzle. Defaults to None.
+
+    Raises:
+        Exception: Thrown if grids is not shaped like a batch of puzzles or holds values outside of 0-9.
+
+    Returns:
+        tuple[numpy.ndarray]: The solved grids shaped (N, 81), a boolean array that is False for every puzzle that could not be solved (its row of solved grids is all 0), and the reason the budget of every puzzle ran out ("" if it did not).
+    """
+
+    grids = np.asarray(grids)
+    if grids.ndim == 3:
+        grids = grids.reshape(len(grids), -1)
+    if grids.ndim != 2 or grids.shape[1] != 81:
+        raise Exception("Grids must be shaped (N, 81) or (N, 9, 9).")
+    if grids.size and (grids.min() < 0 or grids.max() > 9):
+        raise Exception("Grid values must be between 0 and 9.")
+
+    solved = np.zeros((len(grids), 81), dtype=np.uint8)
+    ok = np.zeros(len(grids), dtype=bool)
+    exceeded = np.full(len(grids), "", dtype=object)
+    for start in range(0, len(grids), chunk_size):
+        end = start + chunk_size
+        solved[start:end], ok[start:end], exceeded[start:end] = _solve_chunk(
+            grids[start:end].astype(np.uint8), engine, (timeout, max_steps, max_depth)
+        )
+    return solved, ok, exceeded
+
+
+def _solve_chunk(vals, engine, limits=(None, None, None)):
+    """Solves one chunk of a batch.
+
+    Args:
+        vals (numpy.ndarray): The puzzles of the chunk shaped (n, 81).
+        engine (str): The engine Puzzle.solve() uses for puzzles that stall.
+        limits (tuple): The timeout, max_steps, and max_depth of every Puzzle.solve(). Defaults to no limits.
+
+    Returns:
+        tuple[numpy.ndarray]: The solved grids, whether each puzzle was solved, and the reason its budget ran out.
+    """
+
+    # Fewer than 17 clues can not have a unique solution, the same rule Puzzle.solve() applies.
+    failed = np.count_nonzero(vals, axis=1) < 17
+    failed |= _propagate(vals, ~failed)
+
+    ok = ~failed & (vals != 0).all(axis=1)
+    exceeded = np.full(len(vals), "", dtype=object)
+    timeout, max_steps, max_depth = limits
+    pool = get_puzzle_pool()
+    for num in np.flatnonzero(~failed & ~ok):
+        with pool.puzzle(vals[num].tolist()) as p:
+            try:
+                p.solve(engine=engine, timeout=timeout, max_steps=max_steps, max_depth=max_depth)
+            except Contradiction:
+                continue
+            except SolveBudgetExceeded as e:
+                exceeded[num] = e.reason
+                continue
+            if not p.unsolved:
+                vals[num] = np.frombuffer(p.vals, dtype=np.uint8)
+                ok[num] = True
+    vals[~ok] = 0
+    return vals, ok, exceeded
+
+
+def _propagate(vals, active):
+    """Places naked and hidden singles in every active puzzle until none of them change. vals is updated in place.
+
+    Args:
+        vals (numpy.ndarray): The values of the puzzles shaped (n, 81).
+        active (numpy.ndarray): Which puzzles to work on.
+
+    Returns:
+        numpy.ndarray: A boolean array that is True for every puzzle that turned out to have no solution.
+    """
+
+    failed = np.zeros(len(vals), dtype=bool)
+    live = np.flatnonzero(active)
+    while len(live):
+        cur = vals[live]
+        bits = BIT_TABLE[cur]
+        # Remove the values placed in the row, column, and box of every cell from its candidates.
+        used = np.bitwise_or.reduce(bits[:, PEERS], axis=2)
+        empty = cur == 0
+        cand = np.where(empty, ALL & ~used, bits)
+
+        # A value placed twice in a unit or an empty cell without candidates is a contradiction.
+        bad = ((bits & used) != 0).any(axis=1) | (empty & (cand == 0)).any(axis=1)
+
+        # Naked singles.
+        new = np.where(empty & (POPCOUNT_TABLE[cand] == 1), VALUE_TABLE[cand], 0)
+
+        # Hidden singles, and values that have nowhere to go in a unit.
+        ucand = cand[:, UNITS]
+        uempty = empty[:, UNITS]
+        for val in range(1, 10):
+            has = (ucand & BIT[val]) != 0
+            count = has.sum(axis=2)
+            bad |= (count == 0).any(axis=1)
+            num, unit, slot = np.nonzero(has & uempty & (count == 1)[:, :, None])
+            new[num, UNITS[unit, slot]] = val
+
+        failed[live[bad]] = True
+        changed = ~bad & (new != 0).any(axis=1)
+        vals[live[changed]] = np.where(new[changed] != 0, new[changed], cur[changed])
+        live = live[changed]
+    return failed
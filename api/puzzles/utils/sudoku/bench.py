@@ -0,0 +1,300 @@
+"""Benchmarks for the solver.
+
+Runs Puzzle.solve() with every engine over the example tiers and over puzzle files, and reports puzzles per second,
+latency percentiles, peak RSS, and the memory allocated per solve. Every tier runs in a fresh process so its peak RSS
+is its own. Results can be written as JSON and compared against the results of an earlier run:
+
+    python -m puzzles.utils.sudoku.bench --json before.json
+    python -m puzzles.utils.sudoku.bench --json after.json --compare before.json
+    python -m puzzles.utils.sudoku.bench --tier none --file corpus.txt --limit 100000 --engine dlx
+
+A puzzle file has one puzzle per line, as 81 digits with 0 or . for empty cells. Commas, spaces, and a "Label:" prefix
+are ignored, so example_puzzles.txt can be read as is. Lines that do not hold 81 cells are skipped.
+"""
+
+import argparse
+import json
+import multiprocessing
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from array import array
+from . import examples
+from .grader import TIERS
+from .puzzle import Puzzle
+from .solver import ENGINES
+
+
+def tier_puzzles(tier):
+    """Returns every example puzzle of a tier.
+
+    Args:
+        tier (str): The name of the tier, one of TIERS.
+
+    Returns:
+        list[list[int]]: The values of every cell of each puzzle.
+    """
+
+    get = getattr(examples, tier)
+    puzzles = []
+    while True:
+        try:
+            puzzles.append(list(get(len(puzzles))))
+        except KeyError:
+            return puzzles
+
+
+def read_puzzles(path, limit=None):
+    """Reads the puzzles of a puzzle file one line at a time, so files with millions of lines are not held in memory.
+
+    Args:
+        path (str): The path of the file.
+        limit (int): The most puzzles to read, all of them if None. Defaults to None.
+
+    Yields:
+        list[int]: The values of every cell of each puzzle.
+    """
+
+    count = 0
+    with open(path) as f:
+        for line in f:
+            if limit is not None and count >= limit:
+                return
+            line = line.split(":", 1)[-1]
+            vals = [int(ch) if ch.isdigit() else 0 for ch in line if ch.isdigit() or ch == "."]
+            if len(vals) == 81:
+                count += 1
+                yield vals
+
+
+def percentile(sorted_vals, q):
+    """Returns the q-th percentile of sorted values by the nearest rank method.
+
+    Args:
+        sorted_vals (list[float]): The values in ascending order.
+        q (float): The percentile, from 0 to 100.
+
+    Returns:
+        float: The percentile (0 if there are no values).
+    """
+
+    if not sorted_vals:
+        return 0.0
+    rank = max(1, -(-len(sorted_vals) * q // 100))
+    return sorted_vals[int(rank) - 1]
+
+
+def run_tier(name, source, engine, repeat=1, limit=None, alloc_sample=100, timeout=None):
+    """Solves every puzzle of a tier or file and measures it.
+
+    Args:
+        name (str): The name of the tier or the path of the file.
+        source (str): "tier" for an example tier or "file" for a puzzle file.
+        engine (str): The solver engine to use.
+        repeat (int): How many times every puzzle is solved. Defaults to 1.
+        limit (int): The most puzzles to read from a file. Defaults to None.
+        alloc_sample (int): How many solves are traced with tracemalloc after the timed run. Defaults to 100.
+        timeout (float): The most seconds a single solve may take. Defaults to None.
+
+    Returns:
+        dict: The measurements.
+    """
+
+    def puzzles():
+        if source == "tier":
+            yield from tier_puzzles(name)
+        else:
+            yield from read_puzzles(name, limit)
+
+    # Time every solve. The latencies go in an array so millions of them stay small.
+    latencies = array("d")
+    solved = failed = 0
+    start = time.perf_counter()
+    for vals in puzzles():
+        for _ in range(repeat):
+            t = time.perf_counter()
+            try:
+                p = Puzzle(vals)
+                p.solve(engine=engine, timeout=timeout)
+            except Exception:
+                failed += 1
+            else:
+                if p.unsolved:
+                    failed += 1
+                else:
+                    solved += 1
+            latencies.append(time.perf_counter() - t)
+    seconds = time.perf_counter() - start
+
+    # Trace a sample of the solves separately, tracemalloc slows them down too much to time them at the same time.
+    allocs = []
+    tracemalloc.start()
+    for vals in puzzles():
+        if len(allocs) >= alloc_sample:
+            break
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        try:
+            Puzzle(vals).solve(engine=engine, timeout=timeout)
+        except Exception:
+            pass
+        allocs.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+
+    ordered = sorted(latencies)
+    count = len(ordered)
+    return {
+        "tier": name,
+        "engine": engine,
+        "puzzles": count,
+        "solved": solved,
+        "failed": failed,
+        "seconds": round(seconds, 6),
+        "puzzles_per_sec": round(count / seconds, 2) if seconds else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 4),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 4),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 4),
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "alloc_peak_bytes_mean": round(sum(allocs) / len(allocs)) if allocs else 0,
+        "alloc_peak_bytes_max": max(allocs, default=0),
+    }
+
+
+def run(tiers, files, engines, repeat=1, limit=None, alloc_sample=100, timeout=None, isolate=True):
+    """Runs the benchmark over tiers and files with every engine.
+
+    Args:
+        tiers (list[str]): The example tiers to run.
+        files (list[str]): The puzzle files to run.
+        engines (list[str]): The solver engines to run.
+        repeat (int): How many times every example puzzle is solved (puzzles from files are solved once). Defaults to 1.
+        limit (int): The most puzzles to read from each file. Defaults to None.
+        alloc_sample (int): How many solves of each tier are traced with tracemalloc. Defaults to 100.
+        timeout (float): The most seconds a single solve may take. Defaults to None.
+        isolate (bool): Whether every tier runs in a fresh process. Defaults to True.
+
+    Returns:
+        dict: The environment the benchmark ran in and the measurements of every tier and engine.
+    """
+
+    jobs = [(tier, "tier", engine, repeat) for tier in tiers for engine in engines]
+    jobs += [(path, "file", engine, 1) for path in files for engine in engines]
+
+    results = []
+    ctx = multiprocessing.get_context("spawn")
+    for name, source, engine, times in jobs:
+        args = (name, source, engine, times, limit, alloc_sample, timeout)
+        if isolate:
+            with ctx.Pool(1) as pool:
+                result = pool.apply(run_tier, args)
+        else:
+            result = run_tier(*args)
+        results.append(result)
+        print(format_result(result), file=sys.stderr)
+
+    return {"meta": environment(), "results": results}
+
+
+def environment():
+    """Describes where the benchmark ran, so results from different commits and machines can be told apart.
+
+    Returns:
+        dict: The commit, Python version, platform, and time of the run.
+    """
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def format_result(result):
+    """Formats the measurements of one tier and engine as a line of text.
+
+    Args:
+        result (dict): The measurements.
+
+    Returns:
+        str: The line.
+    """
+
+    return (
+        f"{result['tier']:<12} {result['engine']:<6} {result['puzzles']:>8} puzzles "
+        f"{result['puzzles_per_sec']:>10.1f}/s  p50 {result['p50_ms']:>8.3f}ms  p95 {result['p95_ms']:>8.3f}ms  "
+        f"p99 {result['p99_ms']:>8.3f}ms  rss {result['peak_rss_kb'] / 1024:>6.1f}MB  "
+        f"alloc {result['alloc_peak_bytes_mean'] / 1024:>7.1f}KB  failed {result['failed']}"
+    )
+
+
+def compare(base, new):
+    """Compares the results of two runs tier by tier.
+
+    Args:
+        base (dict): The results of the earlier run.
+        new (dict): The results of the later run.
+
+    Returns:
+        list[str]: A line for every tier and engine in both runs with the change in throughput and latency.
+    """
+
+    before = {(r["tier"], r["engine"]): r for r in base["results"]}
+    lines = []
+    for r in new["results"]:
+        old = before.get((r["tier"], r["engine"]))
+        if old is None:
+            continue
+        speedup = r["puzzles_per_sec"] / old["puzzles_per_sec"] if old["puzzles_per_sec"] else float("inf")
+        lines.append(
+            f"{r['tier']:<12} {r['engine']:<6} {speedup:>6.2f}x puzzles/s  "
+            f"p50 {old['p50_ms']:.3f} -> {r['p50_ms']:.3f}ms  p99 {old['p99_ms']:.3f} -> {r['p99_ms']:.3f}ms  "
+            f"alloc {old['alloc_peak_bytes_mean']} -> {r['alloc_peak_bytes_mean']}B"
+        )
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Sudoku solver.")
+    parser.add_argument("--tier", nargs="*", default=list(TIERS), help="example tiers to run (none to skip them)")
+    parser.add_argument("--file", nargs="*", default=[], help="puzzle files to run")
+    parser.add_argument("--engine", nargs="*", default=list(ENGINES), choices=ENGINES, help="solver engines to run")
+    parser.add_argument("--repeat", type=int, default=50, help="how many times every example puzzle is solved")
+    parser.add_argument("--limit", type=int, default=None, help="the most puzzles to read from each file")
+    parser.add_argument("--alloc-sample", type=int, default=100, help="how many solves are traced per tier")
+    parser.add_argument("--timeout", type=float, default=None, help="the most seconds a single solve may take")
+    parser.add_argument("--inline", action="store_true", help="run every tier in this process")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="compare against the results in this file")
+    args = parser.parse_args(argv)
+
+    tiers = [tier for tier in args.tier if tier != "none"]
+    for tier in tiers:
+        if tier not in TIERS:
+            parser.error(f"unknown tier {tier}")
+
+    report = run(
+        tiers, args.file, args.engine, args.repeat, args.limit, args.alloc_sample, args.timeout, not args.inline
+    )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            base = json.load(f)
+        print(f"compared with {base['meta'].get('commit')}:")
+        for line in compare(base, report):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Lookup tables for the candidate masks used by the puzzle core.
+
+Bit ``d - 1`` of a mask is set when ``d`` is still a candidate for a cell, so a
+cell with every note is ``ALL`` (``0x1FF`` for a 9x9 puzzle) and a solved cell
+holds a single bit. The module tables are for 9x9 puzzles, tables() builds them
+for the other sizes.
+"""
+
+import itertools
+
+
+class _LazyTable(dict):
+    """A table that builds the entry for a mask on its first lookup, for masks too wide to build every entry of.
+
+    The table holds at most maxsize entries. Once it is full, the oldest quarter of the entries is dropped, so masks
+    that are still in use are built again on their next lookup. Lookups of entries that are in the table stay plain
+    dict lookups, which is why entries are not reordered on every hit as a strict LRU would do.
+
+    Attributes
+    ----------
+    maxsize : int
+        The most entries the table holds.
+    """
+
+    def __init__(self, build, maxsize=1 << 16):
+        super().__init__()
+        self._build = build
+        self.maxsize = maxsize
+
+    def __missing__(self, mask):
+        if len(self) >= self.maxsize:
+            for old in list(itertools.islice(self, max(1, self.maxsize // 4))):
+                del self[old]
+        entry = self[mask] = self._build(mask)
+        return entry
+
+
+def tables(size):
+    """Builds the candidate mask tables for puzzles with size values. The tables of masks up to 9 bits are built in
+    full, wider ones only hold a bounded number of the masks that were looked up, so a 25x25 puzzle does not build
+    2**25 entries.
+
+    Args:
+        size (int): The number of values, which is also the number of bits in a mask.
+
+    Returns:
+        tuple: ALL, BIT, POPCOUNT, DIGITS, and VALUE for the size.
+    """
+
+    all_ = (1 << size) - 1
+    bit = tuple(0 if d == 0 else 1 << (d - 1) for d in range(size + 1))
+
+    def digits(m):
+        return tuple(d for d in range(1, size + 1) if m & bit[d])
+
+    def value(m):
+        return m.bit_length() if m and not m & (m - 1) else 0
+
+    if size <= 9:
+        popcount = bytes(m.bit_count() for m in range(all_ + 1))
+        return all_, bit, popcount, tuple(digits(m) for m in range(all_ + 1)), bytes(value(m) for m in range(all_ + 1))
+    return all_, bit, _LazyTable(int.bit_count), _LazyTable(digits), _LazyTable(value)
+
+
+# ALL is the mask with every candidate, BIT[d] is the mask for the digit d (BIT[0] is the empty mask), POPCOUNT[m] is
+# the number of candidates in the mask m, DIGITS[m] is the sorted tuple of candidates in the mask m, and VALUE[m] is the
+# digit of a single candidate mask and 0 for any other mask.
+ALL, BIT, POPCOUNT, DIGITS, VALUE = tables(9)
+
+
+def to_mask(vals):
+    """Builds a candidate mask from an iterable of digits.
+
+    Args:
+        vals (Iterable[int]): The digits to include in the mask.
+
+    Returns:
+        int: The candidate mask.
+    """
+
+    mask = 0
+    for val in vals:
+        if val:
+            mask |= 1 << (val - 1)
+    return mask
@@ -0,0 +1,181 @@
+"""Canonical forms of puzzles under the symmetries of Sudoku.
+
+Relabeling the digits, transposing the grid, reordering the bands or stacks, and reordering the rows inside a band or
+the columns inside a stack all turn a puzzle into an equivalent one whose solution is transformed the same way.
+canonicalize() picks one representative for every such family of puzzles, so a solution found for any member can be
+mapped onto every other member.
+
+The representative is the transformed grid with the smallest clue pattern (blank cells first, read row by row), with
+ties broken by the smallest digits once they are relabeled in the order they are first read. The pattern search
+extends the best row orders one row at a time and keeps the column orders that produce the smallest row so far.
+"""
+
+from itertools import permutations
+import numpy as np
+
+# Every order of the columns that keeps the columns of a stack together (6 stack orders * 6^3 orders in the stacks).
+# The same orders apply to rows and bands.
+ORDERS = np.array(
+    [
+        [stack * 3 + inner[s][k] for s, stack in enumerate(stacks) for k in range(3)]
+        for stacks in permutations(range(3))
+        for inner in ((a, b, c) for a in permutations(range(3)) for b in permutations(range(3)) for c in permutations(range(3)))
+    ]
+)
+
+# The most tied transforms kept while the pattern is searched and then compared digit by digit. Only clue patterns with
+# a lot of symmetry (such as nearly empty or nearly full grids) tie more often than this, and they get a form that is
+# consistent but not guaranteed to be canonical.
+MAX_TIES = 4096
+
+# Weights that turn a row of the clue pattern into an int where a blank cell earlier in the row means a smaller int.
+WEIGHTS = 1 << np.arange(8, -1, -1)
+
+
+class Transform:
+    """
+    A symmetry of Sudoku that maps a puzzle onto its canonical form.
+
+    ...
+
+    Attributes
+    ----------
+    transpose : bool
+        whether the grid is transposed first
+    rows : tuple[int]
+        the row of the (transposed) grid that ends up in each row
+    cols : tuple[int]
+        the column of the (transposed) grid that ends up in each column
+    relabel : tuple[int]
+        the new label of every digit (relabel[0] is always 0)
+    """
+
+    def __init__(self, transpose, rows, cols, relabel):
+        """Constructs the transform.
+
+        Args:
+            transpose (bool): Whether the grid is transposed first.
+            rows (tuple[int]): The row of the (transposed) grid that ends up in each row.
+            cols (tuple[int]): The column of the (transposed) grid that ends up in each column.
+            relabel (tuple[int]): The new label of every digit.
+        """
+
+        self.transpose = transpose
+        self.rows = rows
+        self.cols = cols
+        self.relabel = relabel
+
+    def apply(self, vals):
+        """Maps a grid onto the canonical side of the transform.
+
+        Args:
+            vals (list[int]): The values of every cell in the grid.
+
+        Returns:
+            list[int]: The values of every cell in the transformed grid.
+        """
+
+        if self.transpose:
+            vals = [vals[c * 9 + r] for r in range(9) for c in range(9)]
+        relabel = self.relabel
+        return [relabel[vals[r * 9 + c]] for r in self.rows for c in self.cols]
+
+    def invert(self, vals):
+        """Maps a grid from the canonical side of the transform back onto the original side.
+
+        Args:
+            vals (list[int]): The values of every cell in the transformed grid.
+
+        Returns:
+            list[int]: The values of every cell in the original grid.
+        """
+
+        unlabel = [0] * 10
+        for val, label in enumerate(self.relabel):
+            unlabel[label] = val
+        out = [0] * 81
+        for i, r in enumerate(self.rows):
+            for j, c in enumerate(self.cols):
+                out[r * 9 + c] = unlabel[vals[i * 9 + j]]
+        if self.transpose:
+            out = [out[c * 9 + r] for r in range(9) for c in range(9)]
+        return out
+
+
+def _first_ties(states):
+    """Keeps the first tied states of the pattern search, up to MAX_TIES column orders between them.
+
+    Args:
+        states (list[tuple]): The orientation, row order prefix, and tied column orders of every state.
+
+    Returns:
+        list[tuple]: The states that are kept, the last one with its column orders cut short if needed.
+    """
+
+    kept, left = [], MAX_TIES
+    for t, prefix, orders in states:
+        if left <= 0:
+            break
+        kept.append((t, prefix, orders[:left]))
+        left -= len(orders)
+    return kept
+
+
+def canonicalize(vals):
+    """Finds the canonical form of a puzzle and the transform that maps the puzzle onto it.
+
+    Args:
+        vals (list[int]): The values of every cell in the puzzle (0 if empty).
+
+    Returns:
+        tuple[str, Transform]: The canonical form as a string of 81 digits and the transform.
+    """
+
+    grids = np.array(vals, dtype=np.uint8).reshape(9, 9)
+    grids = np.stack((grids, grids.T))
+
+    # rowvals[t, r, k] is row r of orientation t, read in column order k, as an int of its clue pattern.
+    rowvals = (grids[:, :, ORDERS] != 0) @ WEIGHTS
+
+    # Extend the row orders one row at a time, keeping the column orders that give the smallest pattern.
+    best = rowvals.min()
+    states = _first_ties([
+        (t, (r,), np.flatnonzero(rowvals[t, r] == best)) for t in range(2) for r in range(9) if rowvals[t, r].min() == best
+    ])
+    for k in range(1, 9):
+        best, extended = None, []
+        for t, prefix, orders in states:
+            if k % 3 == 0:
+                bands = {r // 3 for r in prefix}
+                nexts = [r for r in range(9) if r // 3 not in bands]
+            else:
+                band = prefix[-1] // 3
+                nexts = [r for r in range(band * 3, band * 3 + 3) if r not in prefix]
+            for r in nexts:
+                row = rowvals[t, r, orders]
+                low = row.min()
+                if best is None or low < best:
+                    best, extended = low, []
+                if low == best:
+                    extended.append((t, prefix + (r,), orders[row == low]))
+        states = _first_ties(extended)
+
+    # Among the transforms with the smallest pattern, pick the one with the smallest relabeled digits.
+    ts, rows, cols = [], [], []
+    for t, prefix, orders in states:
+        ts.extend([t] * len(orders))
+        rows.extend([prefix] * len(orders))
+        cols.extend(ORDERS[orders])
+    ts, rows, cols = np.array(ts), np.array(rows), np.array(cols)
+    seqs = grids[ts[:, None, None], rows[:, :, None], cols[:, None, :]].reshape(len(ts), 81)
+
+    # Number the digits of every candidate in the order they are first read (digits that are not in the puzzle get
+    # the labels left over, so the transform also maps solutions).
+    first = np.where(seqs[:, None, :] == np.arange(1, 10)[None, :, None], np.arange(81), 81).min(axis=2)
+    relabels = np.zeros((len(ts), 10), dtype=np.uint8)
+    relabels[:, 1:] = np.argsort(np.argsort(first, axis=1, kind="stable"), axis=1) + 1
+    keys = np.take_along_axis(relabels, seqs.astype(np.intp), axis=1)
+    num = np.lexsort(keys.T[::-1])[0]
+
+    key = "".join(map(str, keys[num].tolist()))
+    return key, Transform(bool(ts[num]), tuple(rows[num].tolist()), tuple(cols[num].tolist()), tuple(relabels[num].tolist()))
@@ -0,0 +1,216 @@
+"""Dancing Links (Knuth's Algorithm X) exact cover search for Sudoku.
+
+Every unsolved cell and value pair that is still a candidate becomes a row of the exact cover matrix, and every
+constraint that is not satisfied yet (a cell needs a value, a row, column, and box each need every value) becomes a
+column. The links live in flat lists indexed by node number, so covering and uncovering a column only swaps ints.
+"""
+
+from .geometry import for_size, size_of
+
+
+class DancingLinks:
+    """
+    An exact cover matrix for the unsolved part of a puzzle.
+
+    ...
+
+    Attributes
+    ----------
+    vals : list[int]
+        the values of the puzzle the matrix was built from
+    geo : Geometry
+        the tables for the size of the puzzle
+    L, R, U, D : list[int]
+        the left, right, up, and down links of every node (node 0 is the root, then one header per column)
+    C : list[int]
+        the column header of every node
+    S : list[int]
+        the number of rows left in every column
+    rows : list[tuple[int]]
+        the cell index and value for the row every node belongs to
+    budget : SolveBudget
+        the budget the running search spends a step of at every node (None for no limit)
+    stats : SolveStats
+        the stats the running search reports every node to (None for no stats)
+    """
+
+    def __init__(self, masks, vals):
+        """Builds the exact cover matrix from the candidate masks and values of a puzzle.
+
+        Args:
+            masks (array[int]): The candidate mask of every cell.
+            vals (array[int]): The value of every cell (0 if unsolved).
+        """
+
+        self.vals = list(vals)
+        self.geo = geo = for_size(size_of(len(self.vals)))
+        self.budget = None
+        self.stats = None
+
+        # Number the constraints that are not satisfied by the values already placed.
+        placed = set()
+        for idx, val in enumerate(vals):
+            if val:
+                placed.update(self._constraints(idx, val))
+        cols = [con for con in range(4 * geo.ncells) if con not in placed]
+        header = {con: num + 1 for num, con in enumerate(cols)}
+
+        ncols = len(cols)
+        self.L = [ncols] + list(range(ncols))
+        self.R = list(range(1, ncols + 1)) + [0]
+        self.U = list(range(ncols + 1))
+        self.D = list(range(ncols + 1))
+        self.C = list(range(ncols + 1))
+        self.S = [0] * (ncols + 1)
+        self.rows = [None] * (ncols + 1)
+
+        L, R, U, D, C, S, rows = self.L, self.R, self.U, self.D, self.C, self.S, self.rows
+        for idx, mask in enumerate(masks):
+            if vals[idx]:
+                continue
+            for val in geo.digits[mask]:
+                first = len(C)
+                for con in self._constraints(idx, val):
+                    col = header[con]
+                    node = len(C)
+                    C.append(col)
+                    rows.append((idx, val))
+                    # Link the node at the bottom of its column.
+                    U.append(U[col])
+                    D.append(col)
+                    D[U[col]] = node
+                    U[col] = node
+                    S[col] += 1
+                    # Link the node at the end of its row.
+                    L.append(node - 1 if node > first else node)
+                    R.append(first)
+                    if node > first:
+                        R[node - 1] = node
+                        L[first] = node
+
+    def _constraints(self, idx, val):
+        """Returns the four constraints satisfied by placing val in the cell at index idx.
+
+        Args:
+            idx (int): The index of the cell.
+            val (int): The value placed in the cell.
+
+        Returns:
+            tuple[int]: The cell, row, column, and box constraint numbers.
+        """
+
+        geo = self.geo
+        n, cells, d = geo.size, geo.ncells, val - 1
+        return (idx, cells + geo.row[idx] * n + d, 2 * cells + geo.col[idx] * n + d, 3 * cells + geo.box[idx] * n + d)
+
+    def _cover(self, col):
+        """Removes a column and every row that has a node in it from the matrix.
+
+        Args:
+            col (int): The column header to cover.
+        """
+
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        R[L[col]] = R[col]
+        L[R[col]] = L[col]
+        i = D[col]
+        while i != col:
+            j = R[i]
+            while j != i:
+                D[U[j]] = D[j]
+                U[D[j]] = U[j]
+                S[C[j]] -= 1
+                j = R[j]
+            i = D[i]
+
+    def _uncover(self, col):
+        """Puts back a column removed by _cover(), in the reverse order it was removed.
+
+        Args:
+            col (int): The column header to uncover.
+        """
+
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        i = U[col]
+        while i != col:
+            j = L[i]
+            while j != i:
+                S[C[j]] += 1
+                D[U[j]] = j
+                U[D[j]] = j
+                j = L[j]
+            i = U[i]
+        R[L[col]] = col
+        L[R[col]] = col
+
+    def solutions(self, limit=None, budget=None, stats=None):
+        """Yields the solutions of the puzzle as flat lists of values, stopping after limit solutions.
+
+        Args:
+            limit (int): The most solutions to yield, all of them if None. Defaults to None.
+            budget (SolveBudget): The budget to spend a step of at every node of the search. Defaults to None.
+            stats (SolveStats): The stats to report every node of the search to. Defaults to None.
+
+        Yields:
+            list[int]: The values of every cell in a solution.
+        """
+
+        found = 0
+        self.budget = budget
+        self.stats = stats
+        for chosen in self._search([]):
+            sol = self.vals[:]
+            for idx, val in chosen:
+                sol[idx] = val
+            yield sol
+            found += 1
+            if limit is not None and found >= limit:
+                return
+
+    def _search(self, chosen):
+        """Recursively chooses the column with the fewest rows and tries each of its rows.
+
+        Args:
+            chosen (list[tuple[int]]): The rows chosen so far.
+
+        Yields:
+            list[tuple[int]]: The chosen rows whenever every column is covered.
+        """
+
+        R, D, C, S = self.R, self.D, self.C, self.S
+        if R[0] == 0:
+            yield chosen
+            return
+        if self.budget is not None:
+            self.budget.step()
+        if self.stats is not None:
+            self.stats.search(self.vals, chosen)
+
+        # Choose the column with the fewest rows left to keep the search tree narrow.
+        col, size = 0, self.geo.size + 1
+        j = R[0]
+        while j != 0:
+            if S[j] < size:
+                col, size = j, S[j]
+                if size <= 1:
+                    break
+            j = R[j]
+        if size == 0:
+            return
+
+        self._cover(col)
+        i = D[col]
+        while i != col:
+            chosen.append(self.rows[i])
+            j = R[i]
+            while j != i:
+                self._cover(C[j])
+                j = R[j]
+            yield from self._search(chosen)
+            j = self.L[i]
+            while j != i:
+                self._uncover(C[j])
+                j = self.L[j]
+            chosen.pop()
+            i = D[i]
+        self._uncover(col)
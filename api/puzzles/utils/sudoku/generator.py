@@ -0,0 +1,152 @@
+"""Generates puzzles with a unique solution for every difficulty tier.
+
+A solution grid is built by filling the three boxes on the diagonal (which do not share a row or column) with shuffled
+digits, completing the grid with Dancing Links, and shuffling its rows, columns, and bands. Clues are then dug out of
+it in random order, in pairs that are symmetric about the center, keeping every removal that leaves a unique solution
+no harder than the tier asked for (as rated by grader.py). Pairs alone rarely leave a puzzle that needs more than
+singles, so if the puzzle is still easier than the tier single clues are dug out of it as well. A grid that ends up
+easier than the tier is thrown away and another one is tried.
+"""
+
+import random
+from .canonical import ORDERS, Transform
+from .geometry import UNITS
+from .grader import TIERS, RatingStats
+from .pool import get_puzzle_pool
+
+# The most steps spent grading a puzzle while digging, puzzles that need more are too hard for any tier.
+GRADE_MAX_STEPS = 20000
+
+
+def grade(vals):
+    """Rates a puzzle and checks whether its solution is unique. Puzzles are not memoized while digging since every one
+    of them is only graded once.
+
+    Args:
+        vals (list[int]): The values of every cell in the puzzle (0 if empty).
+
+    Returns:
+        tuple: The index of the tier in TIERS and whether the solution is unique, or None if the puzzle has fewer than
+        17 clues, no solution, or takes too long to grade.
+    """
+
+    try:
+        with get_puzzle_pool().puzzle(vals) as p:
+            stats = p.solve(max_steps=GRADE_MAX_STEPS, stats=RatingStats())
+            if p.unsolved:
+                return None
+            # A puzzle solved without guessing only had one choice at every step, so only guessed ones need counting.
+            # The count starts over from the grid, loaded back into the same puzzle.
+            if stats.branches:
+                p.load(vals)
+                unique = p.count_solutions(2) == 1
+            else:
+                unique = True
+    except Exception:
+        return None
+    return stats.rating()["tier"], unique
+
+
+def random_solution(rng=None):
+    """Builds a random solution grid.
+
+    Args:
+        rng (random.Random): The source of randomness. Defaults to None for a fresh one.
+
+    Returns:
+        list[int]: The values of every cell in the grid.
+    """
+
+    rng = rng or random.Random()
+    vals = [0] * 81
+    for unum in (18, 22, 26):
+        digits = list(range(1, 10))
+        rng.shuffle(digits)
+        for idx, val in zip(UNITS[unum], digits):
+            vals[idx] = val
+    with get_puzzle_pool().puzzle(vals) as p:
+        vals = next(p.iter_solutions(1))
+    vals = [val for row in vals for val in row]
+    # The completion of the diagonal boxes is always the same, so shuffle the lines to reach the rest of the grids.
+    rows = tuple(ORDERS[rng.randrange(len(ORDERS))].tolist())
+    cols = tuple(ORDERS[rng.randrange(len(ORDERS))].tolist())
+    return Transform(rng.random() < 0.5, rows, cols, tuple(range(10))).apply(vals)
+
+
+def dig(solution, tier, rng=None):
+    """Removes clues from a solution grid while the puzzle keeps a unique solution no harder than tier.
+
+    Args:
+        solution (list[int]): The values of every cell in the solution.
+        tier (int): The index of the hardest tier in TIERS the puzzle may reach.
+        rng (random.Random): The source of randomness. Defaults to None for a fresh one.
+
+    Returns:
+        tuple: The values of every cell in the puzzle (0 if empty) and the index of its tier in TIERS.
+    """
+
+    rng = rng or random.Random()
+    vals = list(solution)
+    order = list(range(41))
+    rng.shuffle(order)
+    reached = _dig_groups(vals, solution, [(idx, 80 - idx) for idx in order], tier, 0)
+    if reached < tier:
+        order = list(range(81))
+        rng.shuffle(order)
+        reached = _dig_groups(vals, solution, [(idx,) for idx in order if vals[idx]], tier, reached)
+    return vals, reached
+
+
+def _dig_groups(vals, solution, groups, tier, reached):
+    """Removes every group of clues, in order, whose removal leaves a unique solution no harder than tier. vals is
+    updated in place.
+
+    Args:
+        vals (list[int]): The values of every cell in the puzzle (0 if empty).
+        solution (list[int]): The values of every cell in the solution.
+        groups (list[tuple[int]]): The cell indices of every group of clues.
+        tier (int): The index of the hardest tier in TIERS the puzzle may reach.
+        reached (int): The index of the tier of the puzzle before digging.
+
+    Returns:
+        int: The index of the tier of the puzzle after digging.
+    """
+
+    for group in groups:
+        for i in group:
+            vals[i] = 0
+        graded = grade(vals)
+        if graded is None or not graded[1] or graded[0] > tier:
+            for i in group:
+                vals[i] = solution[i]
+        else:
+            reached = graded[0]
+    return reached
+
+
+def generate(difficulty, attempts=100, rng=None):
+    """Generates a puzzle with a unique solution in a difficulty tier.
+
+    Args:
+        difficulty (str): The name of the tier, one of TIERS.
+        attempts (int): How many solution grids are dug before giving up. Defaults to 100.
+        rng (random.Random): The source of randomness. Defaults to None for a fresh one.
+
+    Raises:
+        Exception: Thrown if the tier is unknown.
+
+    Returns:
+        tuple: The values of every cell in the puzzle (0 if empty) and in its solution, or None if no attempt reached
+        the tier.
+    """
+
+    if difficulty not in TIERS:
+        raise Exception(f"Unknown difficulty {difficulty}.")
+    tier = TIERS.index(difficulty)
+    rng = rng or random.Random()
+    for _ in range(attempts):
+        solution = random_solution(rng)
+        vals, reached = dig(solution, tier, rng)
+        if reached == tier:
+            return vals, solution
+    return None
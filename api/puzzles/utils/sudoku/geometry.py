@@ -0,0 +1,167 @@
+"""Lookup tables for the geometry of a puzzle, built once per size.
+
+A puzzle of size N has N x N cells and boxes of sqrt(N) x sqrt(N) cells, so the sizes are 4, 9, 16, and 25. Cells are
+numbered row by row and units are numbered rows 0 to N - 1, then columns, then boxes (rows 0-8, columns 9-17, and boxes
+18-26 for a 9x9 puzzle). Every table is a tuple, so they can be shared by every puzzle without being copied. The module
+tables are for 9x9 puzzles, for_size() builds the tables for the other sizes.
+"""
+
+from functools import lru_cache
+from math import isqrt
+from .bits import tables
+
+# The sizes a puzzle can have.
+SIZES = (4, 9, 16, 25)
+
+
+class Geometry:
+    """
+    The lookup tables for puzzles of one size.
+
+    ...
+
+    Attributes
+    ----------
+    size : int
+        the number of values, and of cells in every unit
+    base : int
+        the number of rows and columns of a box
+    ncells : int
+        the number of cells in the puzzle
+    nunits : int
+        the number of units in the puzzle
+    stride : int
+        the stride of the units in the value counts of a puzzle, which are indexed by unit * stride + value
+    typecode : str
+        the array typecode that fits a candidate mask
+    row, col, box : tuple[int]
+        the row, column, and box of every cell
+    positions : tuple[tuple[int]]
+        the row and column of every cell
+    units : tuple[tuple[int]]
+        the cells of every unit, in the order they are read (box cells row by row)
+    cell_units : tuple[tuple[int]]
+        the row, column, and box unit numbers of every cell
+    unit_masks : tuple[int]
+        the units of every cell as a bitmask
+    peers : tuple[tuple[int]]
+        the other cells that share a row, column, or box with every cell
+    box_row_slots, box_col_slots : tuple[int]
+        masks over the cells of a box (slot base * row + col) that cover one row or one column of the box
+    box_rows, box_cols : tuple[tuple[int]]
+        the unit numbers of the rows and columns that cross every box
+    box_row_rest, box_col_rest : tuple[tuple[tuple[int]]]
+        the cells of the rows and columns that cross every box outside of the box, in the order of box_rows and box_cols
+    all, bit, popcount, digits, value : int, tuple, bytes, tuple, bytes
+        the candidate mask tables, see bits.tables()
+    """
+
+    def __init__(self, size):
+        """Builds the tables for a size.
+
+        Args:
+            size (int): The size of the puzzle.
+
+        Raises:
+            Exception: Thrown if the size is not one of SIZES.
+        """
+
+        if size not in SIZES:
+            raise Exception(f"A puzzle can not have a size of {size}.")
+        n = self.size = size
+        b = self.base = isqrt(size)
+        cells = self.ncells = n * n
+        self.nunits = 3 * n
+        self.stride = n + 1
+        self.typecode = "H" if n <= 16 else "L"
+
+        self.row = tuple(idx // n for idx in range(cells))
+        self.col = tuple(idx % n for idx in range(cells))
+        self.box = tuple((idx // (n * b)) * b + (idx % n) // b for idx in range(cells))
+        self.positions = tuple((self.row[idx], self.col[idx]) for idx in range(cells))
+
+        self.units = (
+            tuple(tuple(r * n + c for c in range(n)) for r in range(n))
+            + tuple(tuple(r * n + c for r in range(n)) for c in range(n))
+            + tuple(tuple(idx for idx in range(cells) if self.box[idx] == bx) for bx in range(n))
+        )
+        self.cell_units = tuple((self.row[idx], n + self.col[idx], 2 * n + self.box[idx]) for idx in range(cells))
+        self.unit_masks = tuple(sum(1 << unum for unum in self.cell_units[idx]) for idx in range(cells))
+        self.peers = tuple(
+            tuple(sorted(set().union(*(self.units[unum] for unum in self.cell_units[idx])) - {idx}))
+            for idx in range(cells)
+        )
+
+        self.box_row_slots = tuple(((1 << b) - 1) << (b * r) for r in range(b))
+        self.box_col_slots = tuple(sum(1 << (b * r) for r in range(b)) << c for c in range(b))
+        self.box_rows = tuple(tuple((bx // b) * b + r for r in range(b)) for bx in range(n))
+        self.box_cols = tuple(tuple(n + (bx % b) * b + c for c in range(b)) for bx in range(n))
+        self.box_row_rest = tuple(
+            tuple(tuple(idx for idx in self.units[unum] if self.box[idx] != bx) for unum in self.box_rows[bx])
+            for bx in range(n)
+        )
+        self.box_col_rest = tuple(
+            tuple(tuple(idx for idx in self.units[unum] if self.box[idx] != bx) for unum in self.box_cols[bx])
+            for bx in range(n)
+        )
+
+        self.all, self.bit, self.popcount, self.digits, self.value = tables(n)
+
+
+@lru_cache(maxsize=None)
+def for_size(size):
+    """Returns the tables for a size, building them on first use.
+
+    Args:
+        size (int): The size of the puzzle.
+
+    Raises:
+        Exception: Thrown if the size is not one of SIZES.
+
+    Returns:
+        Geometry: The tables.
+    """
+
+    return Geometry(size)
+
+
+def size_of(ncells):
+    """Returns the size of a puzzle with ncells cells.
+
+    Args:
+        ncells (int): The number of cells.
+
+    Raises:
+        Exception: Thrown if no size has that many cells.
+
+    Returns:
+        int: The size.
+    """
+
+    size = isqrt(ncells)
+    if size * size != ncells or size not in SIZES:
+        raise Exception(f"A puzzle can not have {ncells} values.")
+    return size
+
+
+NINE = for_size(9)
+
+# The row, column, box, and position of every cell.
+ROW, COL, BOX, POSITIONS = NINE.row, NINE.col, NINE.box, NINE.positions
+
+# The cells of every unit, in the order they are read (box cells row by row).
+UNITS = NINE.units
+
+# The row, column, and box unit numbers of every cell, and the same units as a bitmask.
+CELL_UNITS, UNIT_MASKS = NINE.cell_units, NINE.unit_masks
+
+# The 20 other cells that share a row, column, or box with every cell.
+PEERS = NINE.peers
+
+# Masks over the nine cells of a box (slot 3 * row + col) that cover one row or one column of the box.
+BOX_ROW_SLOTS, BOX_COL_SLOTS = NINE.box_row_slots, NINE.box_col_slots
+
+# The unit numbers of the rows and columns that cross every box, and the cells of those rows and columns outside of the
+# box, in the order of BOX_ROW_SLOTS and BOX_COL_SLOTS.
+BOX_ROWS, BOX_COLS = NINE.box_rows, NINE.box_cols
+BOX_ROW_REST, BOX_COL_REST = NINE.box_row_rest, NINE.box_col_rest
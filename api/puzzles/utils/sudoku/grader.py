@@ -0,0 +1,221 @@
+"""Rates how hard a puzzle is for a person by the techniques the "human" engine actually needs to solve it.
+
+The rating is the rating of the hardest technique that made progress, so a puzzle solved with naked singles alone
+rates 1.0 however many of them it takes. A puzzle that needs the Nishio method rates NISHIO_RATING and more for every
+doubling of the guesses it placed and for every level they had to be nested. Ratings are memoized by the grid, and
+rate_many() rates a corpus on every core.
+"""
+
+import os
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from math import log2
+from .pool import get_puzzle_pool
+from .solver import SolveStats
+
+TIERS = ("easy", "medium", "hard", "expert", "evil", "impossible")
+
+# The rating of every technique, in the order std_solve() tries them.
+TECHNIQUE_RATINGS = {
+    "naked_1": 1.0,
+    "hidden_1": 1.5,
+    "inline": 2.5,
+    "naked_2": 3.0,
+    "hidden_2": 3.4,
+    "naked_3": 3.8,
+    "hidden_3": 4.2,
+    "naked_4": 4.6,
+    "hidden_4": 5.0,
+}
+
+# The rating of one guess by the Nishio method, and what every doubling of the guesses and every level of nesting adds.
+NISHIO_RATING = 6.0
+BRANCH_RATING = 0.5
+DEPTH_RATING = 1.0
+
+# The lowest rating of every tier in TIERS. Hard puzzles need intersections, and expert ones need naked or hidden
+# subsets but no guessing (generator.py can hardly dig up puzzles that need triples without also needing a guess).
+TIER_RATINGS = (0.0, 1.5, 2.5, 3.0, 6.0, 7.0)
+
+# How many ratings every process keeps.
+CACHE_SIZE = 65536
+
+
+class RatingStats(SolveStats):
+    """
+    Stats that only keep which techniques made progress and the Nishio counters, so rating a puzzle costs little more
+    than solving it.
+
+    ...
+
+    Attributes
+    ----------
+    used : set[str]
+        the names of the techniques that changed the puzzle
+    """
+
+    def __init__(self):
+        """Constructs empty stats."""
+
+        super().__init__("human")
+        self.used = set()
+
+    def measure(self, p, rnd, technique, args, units):
+        """Runs a technique and records whether it changed the puzzle.
+
+        Args:
+            p (Puzzle_Backend): The puzzle being solved.
+            rnd (int): The round of std_solve() the technique runs in.
+            technique (Callable): The technique.
+            args (tuple): The arguments of the technique after the puzzle.
+            units (list[int]): The units the technique looks at.
+
+        Returns:
+            int: What the technique returned.
+        """
+
+        found = technique(p, *args, units=units)
+        if found:
+            self.used.add(self.name(technique, args))
+        return found
+
+    def rating(self):
+        """Rates the solve.
+
+        Returns:
+            dict: The rating, the index of its tier in TIERS, the hardest technique needed ("nishio" if it guessed), and
+            the Nishio branches and depth.
+        """
+
+        hardest = max(self.used, key=TECHNIQUE_RATINGS.__getitem__, default=None)
+        rating = TECHNIQUE_RATINGS[hardest] if hardest else 0.0
+        if self.branches:
+            hardest = "nishio"
+            rating = NISHIO_RATING + BRANCH_RATING * log2(self.branches) + DEPTH_RATING * (self.max_depth - 1)
+        rating = round(rating, 2)
+        return {
+            "rating": rating,
+            "tier": tier_of(rating),
+            "hardest": hardest,
+            "branches": self.branches,
+            "max_depth": self.max_depth,
+        }
+
+
+def tier_of(rating):
+    """Finds the tier of a rating.
+
+    Args:
+        rating (float): The rating.
+
+    Returns:
+        int: The index of the tier in TIERS.
+    """
+
+    return bisect_right(TIER_RATINGS, rating) - 1
+
+
+def rate(vals, timeout=None, max_steps=None, max_depth=None):
+    """Rates a puzzle. Ratings are memoized, so rating the same grid again is a lookup.
+
+    Args:
+        vals (list[int]): The values of every cell in the puzzle (0 if empty).
+        timeout (float): The most seconds the solve may take. Defaults to None.
+        max_steps (int): The most steps the solve may take. Defaults to None.
+        max_depth (int): The deepest the Nishio method may branch. Defaults to None.
+
+    Raises:
+        Exception: Thrown if there are less than 17 clues or the puzzle can not be solved.
+        SolveBudgetExceeded: Thrown if a limit is reached.
+
+    Returns:
+        dict: The rating, the tier, the hardest technique needed, and the Nishio branches and depth.
+    """
+
+    rated = _rate(bytes(vals), timeout, max_steps, max_depth)
+    return dict(rated, tier=TIERS[rated["tier"]])
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _rate(key, timeout, max_steps, max_depth):
+    """Rates the puzzle with the values in key, see rate()."""
+
+    with get_puzzle_pool().puzzle(list(key)) as p:
+        stats = p.solve(timeout=timeout, max_steps=max_steps, max_depth=max_depth, stats=RatingStats())
+        if p.unsolved:
+            raise Exception("Puzzle can not be solved.")
+    return stats.rating()
+
+
+def rate_many(grids, workers=None, chunk_size=256, max_steps=None):
+    """Rates many puzzles in worker processes on every core, yielding the ratings in the order of the grids. Only a few
+    chunks per worker are in flight at a time, so a corpus of any size is rated in bounded memory.
+
+    Args:
+        grids (Iterable[list[int]]): The values of every cell in each puzzle (0 if empty).
+        workers (int): The number of worker processes, one per core if None and none (rate inline) if 0. Defaults to None.
+        chunk_size (int): How many puzzles a worker rates per task. Defaults to 256.
+        max_steps (int): The most steps rating a single puzzle may take. Defaults to None.
+
+    Yields:
+        dict: The rating of every puzzle as returned by rate(), or None if the puzzle could not be rated.
+    """
+
+    chunks = _chunks(grids, chunk_size)
+    if workers == 0:
+        for chunk in chunks:
+            yield from _rate_chunk(chunk, max_steps)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(_rate_chunk, chunk, max_steps))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def _chunks(grids, chunk_size):
+    """Groups the grids into chunks, each grid packed into 81 bytes so chunks are cheap to send to a worker.
+
+    Args:
+        grids (Iterable[list[int]]): The values of every cell in each puzzle.
+        chunk_size (int): How many grids go in a chunk.
+
+    Yields:
+        list[bytes]: The packed grids of each chunk.
+    """
+
+    chunk = []
+    for vals in grids:
+        chunk.append(bytes(vals))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _rate_chunk(chunk, max_steps=None):
+    """Rates a chunk of packed grids in a worker process.
+
+    Args:
+        chunk (list[bytes]): The packed grids.
+        max_steps (int): The most steps rating a single puzzle may take. Defaults to None.
+
+    Returns:
+        list[dict]: The rating of every puzzle, or None if the puzzle could not be rated.
+    """
+
+    ratings = []
+    for key in chunk:
+        try:
+            ratings.append(rate(key, max_steps=max_steps))
+        except Exception:
+            ratings.append(None)
+    return ratings
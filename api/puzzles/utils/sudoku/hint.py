@@ -0,0 +1,111 @@
+"""Hints that solve a puzzle one logical step at a time.
+
+Between two hints the solver keeps nothing. Instead the state it reached (the values, the notes of every cell, and the
+units every technique still has to look at) is packed into STATE_BYTES bytes that the caller hands back with the next
+hint, so the next hint picks up from the notes it left off with instead of solving the puzzle from its clues again.
+"""
+
+from .bits import BIT
+from .geometry import POSITIONS
+from .pool import get_puzzle_pool
+from .solver import TECHNIQUES, Contradiction, next_step
+
+# Every cell packs into 4 bits for its value and 9 bits for its notes, and every technique into 27 bits for its units.
+STATE_BYTES = (81 * (4 + 9) + len(TECHNIQUES) * 27 + 7) // 8
+
+
+def pack_state(p, pending):
+    """Packs the state of a puzzle between two hints into bytes.
+
+    Args:
+        p (Puzzle_Backend): The puzzle.
+        pending (list[int]): The bitmask of the units every technique still has to look at.
+
+    Returns:
+        bytes: The packed state.
+    """
+
+    n = 0
+    for val in p.vals:
+        n = n << 4 | val
+    for mask in p.masks:
+        n = n << 9 | mask
+    for units in pending:
+        n = n << 27 | units
+    return n.to_bytes(STATE_BYTES, "big")
+
+
+def unpack_state(raw):
+    """Unpacks a state packed by pack_state().
+
+    Args:
+        raw (bytes): The packed state.
+
+    Raises:
+        Exception: Thrown if the state does not have STATE_BYTES bytes.
+
+    Returns:
+        tuple[list[int]]: The values of every cell, the notes of every cell as a mask, and the bitmask of the units every
+        technique still has to look at.
+    """
+
+    if len(raw) != STATE_BYTES:
+        raise Exception("Invalid hint state.")
+    n = int.from_bytes(raw, "big")
+    pending = []
+    for _ in TECHNIQUES:
+        pending.append(n & 0x7FFFFFF)
+        n >>= 27
+    masks = []
+    for _ in range(81):
+        masks.append(n & 0x1FF)
+        n >>= 9
+    vals = []
+    for _ in range(81):
+        vals.append(n & 0xF)
+        n >>= 4
+    return vals[::-1], masks[::-1], pending[::-1]
+
+
+def next_hint(vals, state=None):
+    """Finds the next logical step for a puzzle.
+
+    The state of the last hint is only picked up if every value it had is still in the grid, values placed since then
+    only mark their own rows, columns, and boxes for the techniques to look at again. Otherwise the puzzle is read from
+    the grid as if there were no state.
+
+    Args:
+        vals (list[int]): The values of every cell in the puzzle (0 if empty).
+        state (bytes): The state returned with the last hint for the puzzle. Defaults to None.
+
+    Raises:
+        Exception: Thrown if the puzzle or the state is invalid.
+        Contradiction: Thrown if a value in the grid breaks the rules or was already ruled out by an earlier hint.
+
+    Returns:
+        tuple: The step as recorded by SolveTrace (None if the puzzle is solved or needs guessing) and the state to
+        pass to the next hint.
+    """
+
+    vals = [int(val) for val in vals]
+    old_vals = None
+    if state is not None:
+        old_vals, masks, pending = unpack_state(state)
+        if len(vals) != 81 or any(old and old != new for old, new in zip(old_vals, vals)):
+            old_vals = None
+
+    # A puzzle resuming from the state of the last hint is loaded with the grid of that hint, so it comes out of the
+    # pool without anything left from its last solve, and then gets the notes of the state restored over it.
+    with get_puzzle_pool().puzzle(vals if old_vals is None else old_vals) as p:
+        if old_vals is None:
+            pending = [0] * len(TECHNIQUES)
+        else:
+            p.restore(old_vals, masks)
+            for idx, (old, new) in enumerate(zip(old_vals, vals)):
+                if new and not old:
+                    if not p.masks[idx] & BIT[new]:
+                        raise Contradiction(f"Cell {POSITIONS[idx]}")
+                    p.place(idx, new)
+
+        step = next_step(p, pending)
+        return step, pack_state(p, [units | p.dirty for units in pending])
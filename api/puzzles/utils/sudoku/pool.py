@@ -0,0 +1,116 @@
+"""Puzzles kept for reuse, so a process that solves one grid after another does not build a new puzzle for each.
+
+Puzzle.load() overwrites every buffer of a puzzle in place and drops the trail, budget, stats, and trace of its last
+solve, so a reused puzzle holds nothing from the grid it solved before. The buffers (and the trail, which keeps the
+room it grew to) are only allocated once per pooled puzzle, which leaves next to no garbage per solve.
+"""
+
+from contextlib import contextmanager
+from .geometry import SIZES, size_of
+from .puzzle import Puzzle
+
+
+class PuzzlePool:
+    """
+    A pool of idle puzzles for every size. Taking and returning a puzzle is a single list operation, which is atomic,
+    so threads can share a pool.
+
+    ...
+
+    Attributes
+    ----------
+    maxsize : int
+        the most idle puzzles kept for every size, puzzles returned past that are dropped
+    """
+
+    def __init__(self, maxsize=4):
+        """Constructs an empty pool.
+
+        Args:
+            maxsize (int): The most idle puzzles kept for every size. Defaults to 4.
+        """
+
+        self.maxsize = maxsize
+        self._idle = {size: [] for size in SIZES}
+
+    def acquire(self, vals):
+        """Takes an idle puzzle, or builds one if there is none, and loads a grid into it.
+
+        Args:
+            vals (list[int]): The values of every cell in the puzzle (0 if empty).
+
+        Raises:
+            Exception: Thrown if the grid is not a valid puzzle.
+            Contradiction: Thrown if a value in the grid breaks the rules.
+
+        Returns:
+            Puzzle: The puzzle, to hand back with release().
+        """
+
+        size = size_of(len(vals))
+        idle = self._idle[size]
+        try:
+            p = idle.pop()
+        except IndexError:
+            p = Puzzle(size=size)
+        try:
+            p.load(vals)
+        except BaseException:
+            self.release(p)
+            raise
+        return p
+
+    def release(self, p):
+        """Hands a puzzle back to the pool.
+
+        Args:
+            p (Puzzle): A puzzle from acquire(), which may not be used after this.
+        """
+
+        # Drop what the last solve left on the puzzle now, so the pool does not keep it alive until the next load.
+        p.trace = None
+        idle = self._idle[p.size]
+        if len(idle) < self.maxsize:
+            idle.append(p)
+
+    @contextmanager
+    def puzzle(self, vals):
+        """Lends a puzzle loaded with a grid for the body of a with statement.
+
+        Args:
+            vals (list[int]): The values of every cell in the puzzle (0 if empty).
+
+        Yields:
+            Puzzle: The puzzle, which goes back to the pool when the with statement ends.
+        """
+
+        p = self.acquire(vals)
+        try:
+            yield p
+        finally:
+            self.release(p)
+
+    def count(self, size=9):
+        """Returns how many puzzles of a size are idle.
+
+        Args:
+            size (int): The size of the puzzles. Defaults to 9.
+
+        Returns:
+            int: The number of idle puzzles.
+        """
+
+        return len(self._idle[size])
+
+
+_pool = PuzzlePool()
+
+
+def get_puzzle_pool():
+    """Returns the pool shared by the whole process.
+
+    Returns:
+        PuzzlePool: The pool.
+    """
+
+    return _pool
@@ -1,12 +1,50 @@
 import numpy as np
-from collections import defaultdict
-from math import ceil
-from .solver import is_valid, std_solve, nishio
+from array import array
+from functools import lru_cache
+from time import perf_counter
+from .bits import to_mask
+from .geometry import for_size, size_of
+from .solver import (
+    ENGINES,
+    Contradiction,
+    SolveBudget,
+    SolveBudgetExceeded,
+    SolveStats,
+    SolveTrace,
+    count_solutions,
+    dlx_solve,
+    is_valid,
+    iter_solutions,
+    nishio,
+    std_solve,
+)
+
+# A 9x9 puzzle with fewer clues than this can not have a unique solution.
+MIN_CLUES = 17
+
+
+@lru_cache(maxsize=None)
+def _blank(size):
+    """Builds the buffers of an empty puzzle of a size, copied into the buffers of a puzzle on clear().
+
+    Args:
+        size (int): The size of the puzzle.
+
+    Returns:
+        tuple[array]: The candidate masks, the values, and the value counts of an empty puzzle.
+    """
+
+    geo = for_size(size)
+    return (
+        array(geo.typecode, [geo.all] * geo.ncells),
+        array("B", bytes(geo.ncells)),
+        array("B", bytes(geo.nunits * geo.stride)),
+    )
 
 
 class Cell:
     """
-    A class to hold the information for each cell in a Sudoku puzzle.
+    A view onto a single cell of a Sudoku puzzle. The value and notes live in the flat buffers of the owning puzzle.
 
     ...
 
@@ -15,41 +53,53 @@ class Cell:
     val : int
         the value of the cell if the cell is solved (0 if unsolved)
     notes : Set[int]
-        the possible values for the cell
+        the possible values for the cell (built from the candidate mask on access)
+    mask : int
+        the candidate mask for the cell (bit d - 1 is set when d is a possible value)
+    idx : int
+        the index of the cell in the flat buffers of the puzzle (0-80)
     pos : str
         the row and column in the puzzle the cell is located at
     box : int
         the number for the box in which the cell is located (0-8)
     """
 
-    def __init__(self, val=0, pos=None, box=None):
-        """Constructs a cell which contains the fundamental elements of the sudoku puzzle such as the value and notes.
+    __slots__ = ("_p", "idx", "pos", "box")
+
+    def __init__(self, p, idx, pos=None, box=None):
+        """Constructs a view onto the cell at index idx of the puzzle p.
 
         Args:
-            val (int): The value of the cell if the cell is solved (0 if unsolved). Defaults to 0.
-            notes (Set[int]): The possible values for the cell.
+            p (Puzzle): The puzzle that owns the cell.
+            idx (int): The index of the cell in the flat buffers of the puzzle (0-80).
             pos (tuple): The row and column in the puzzle the cell is located at. Defaults to None.
             box (int): The number for the box in which the cell is located (0-8). Defaults to None.
         """
 
-        if not isinstance(val, int):
-            val = int(val)
-        self._val = val
-        if val == 0:
-            self.notes = set(range(1, 10))
-        else:
-            self.notes = set((val,))
+        self._p = p
+        self.idx = idx
         self.pos = pos
         self.box = box
 
     @property
     def val(self):
-        return self._val
+        return self._p.vals[self.idx]
 
     @val.setter
     def val(self, new_val):
-        self._val = new_val
-        self.notes = set((new_val,))
+        self._p.place(self.idx, int(new_val))
+
+    @property
+    def notes(self):
+        return set(self._p.geo.digits[self._p.masks[self.idx]])
+
+    @notes.setter
+    def notes(self, new_notes):
+        self._p._set_mask(self.idx, to_mask(new_notes))
+
+    @property
+    def mask(self):
+        return self._p.masks[self.idx]
 
     def __str__(self):
         """Returns the value of the cell as a string.
@@ -87,36 +137,82 @@ class Puzzle:
 
     Attributes
     ----------
+    size : int
+        the number of values in the puzzle, 9 for a 9x9 puzzle (see geometry.SIZES for the others)
+    geo : Geometry
+        the lookup tables for the size of the puzzle
     unsolved : int
         number of cells unsolved in the puzzle.
+    empty : int
+        number of cells left without any notes (a contradiction as soon as it is not 0)
+    counts : array[int]
+        how many times every value is placed in every unit, indexed by unit * geo.stride + value
+    masks : array[int]
+        flat buffer with the candidate mask of every cell in the puzzle
+    vals : array[int]
+        flat buffer with the value of every cell in the puzzle (0 if unsolved)
     cells : list[Cell]
-        list of all the cells in the puzzle
+        list of all the cells in the puzzle (built on first access)
     rows : list[list[Cell]]
-        list of all the rows of cells in the puzzle
+        list of all the rows of cells in the puzzle (built on first access)
     cols : list[list[Cell]]
-        list of all the columns of cells in the puzzle
+        list of all the columns of cells in the puzzle (built on first access)
     boxs : list[list[Cell]]
-        list of all the boxes of cells in the puzzle
+        list of all the boxes of cells in the puzzle (built on first access)
+    units : tuple[tuple[int]]
+        the cell indices of every row (0-8), column (9-17), and box (18-26) in the puzzle (numbered the same way for the other sizes)
+    cell_units : tuple[tuple[int]]
+        the row, column, and box unit numbers for every cell in the puzzle
     np : numpy.ndarray
         a 2D numpy array with the values of the cells in the puzzle
-    checked : defaultdict(lambda: defaultdict(lambda: []))
-        a dictionary containing all of the previously checked clues to prevent double checking
+    trail : list[int]
+        a journal of every change made to the puzzle so that it can be rolled back with undo()
+    dirty : int
+        a bitmask of the units (rows 0-8, columns 9-17, boxes 18-26) with a cell that changed since the solver last looked at them
+    unit_masks : tuple[int]
+        the bitmask of the row, column, and box of every cell, the bits it sets in dirty
+    peers : tuple[tuple[int]]
+        the other cells that share a row, column, or box with every cell
+    budget : SolveBudget
+        the limits of the running solve (None when there are no limits)
+    stats : SolveStats
+        the counters of the running solve (None when they are not recorded)
+    trace : SolveTrace
+        the steps of the last solve, left in place after it returns (None when they are not recorded)
+    debug : bool
+        when True, every placement re-checks the whole puzzle with validate_full()
     """
 
-    def __init__(self, vals=None):
+    debug = False
+
+    def __init__(self, vals=None, size=None):
         """Contructs the backend of the puzzle which contains all the puzzle information and interacts with the solver.
 
         Args:
             vals (list[int]): The values to initialize each cell of the puzzle with. Defaults to None.
+            size (int): The size of the puzzle. Defaults to None, which reads it from the number of values or makes a 9x9 puzzle without values.
         """
 
-        self.unsolved = 81
-        self.cells = []
-        self.rows = [[] for _ in range(9)]
-        self.cols = [[] for _ in range(9)]
-        self.boxs = [[] for _ in range(9)]
-        self.np = None
-        self.checked = defaultdict(lambda: defaultdict(lambda: []))
+        if size is None:
+            size = size_of(len(vals)) if vals else 9
+        geo = self.geo = for_size(size)
+        self.size = size
+        self.units = geo.units
+        self.cell_units = geo.cell_units
+        self.unit_masks = geo.unit_masks
+        self.peers = geo.peers
+        blank_masks, blank_vals, blank_counts = _blank(size)
+        self.unsolved = geo.ncells
+        self.empty = 0
+        self.masks = array(geo.typecode, blank_masks)
+        self.vals = array("B", blank_vals)
+        self.counts = array("B", blank_counts)
+        self._views = None
+        self.trail = []
+        self.dirty = 0
+        self.budget = None
+        self.stats = None
+        self.trace = None
         self._init(vals)
 
     def __setitem__(self, pos, new_val):
@@ -167,54 +263,110 @@ class Puzzle:
             str: String that displays the puzzle in terms of its cell's values
         """
 
+        base = self.geo.base
+        line = "-" * (8 * base * (base + 1) + 1) + "\n"
+        blank = ("|" + "\t" * (base + 1)) * base + "|\n"
         pstr = ""
         for r, row in enumerate(self.rows):
             # Print horizontal seperators between boxes.
-            if (r % 3) == 0:
-                pstr += "-------------------------------------------------------------------------------------------------\n"
-                pstr += "|\t\t\t\t|\t\t\t\t|\t\t\t\t|\n"
+            if (r % base) == 0:
+                pstr += line
+                pstr += blank
 
             # Print row with vertical seperators between boxes.
-            for i in range(3):
-                pstr += f"|\t{row[i * 3]}\t{row[i * 3 + 1]}\t{row[i * 3 + 2]}\t"
+            for i in range(base):
+                pstr += "|\t" + "\t".join(str(cell) for cell in row[i * base : (i + 1) * base]) + "\t"
             pstr += "|\n"
-            pstr += "|\t\t\t\t|\t\t\t\t|\t\t\t\t|\n"
-        pstr += "-------------------------------------------------------------------------------------------------\n"
+            pstr += blank
+        pstr += line
         return pstr
 
+    @property
+    def np(self):
+        """A 2D numpy array with the values of the cells in the puzzle, built from the value buffer."""
+
+        return np.array(self.vals, dtype=int).reshape((self.size, self.size))
+
+    def _cell_views(self):
+        """Builds the views onto the cells on first use. The solver works on the flat buffers, so a puzzle that is only solved never builds them.
+
+        Returns:
+            tuple[list]: The cells, then the cells of every unit.
+        """
+
+        if self._views is None:
+            geo = self.geo
+            cells = [Cell(self, idx, pos=geo.positions[idx], box=geo.box[idx]) for idx in range(geo.ncells)]
+            self._views = (cells, [[cells[idx] for idx in unit] for unit in geo.units])
+        return self._views
+
+    @property
+    def cells(self):
+        return self._cell_views()[0]
+
+    @property
+    def rows(self):
+        return self._cell_views()[1][: self.size]
+
+    @property
+    def cols(self):
+        return self._cell_views()[1][self.size : 2 * self.size]
+
+    @property
+    def boxs(self):
+        return self._cell_views()[1][2 * self.size :]
+
     def _init(self, vals):
-        """Initializes unsolved, rows, cols, boxs, and np according to the input vals.
+        """Assigns the input vals.
 
         Args:
             vals (list[int]): Values for each cell in the puzzle.
         """
 
         if vals:
-            arr = np.reshape(np.array(vals, dtype=int), (9, 9))
-        else:
-            arr = np.zeros((9, 9), int)
-        self.np = arr
-
-        # Calculates the box number from the puzzle position.
-        def p2b(ppos, bdimo=(3, 3), bdimi=(3, 3)):
-            brow = ceil((ppos[0] + 1) / bdimi[0]) - 1
-            bcol = ceil((ppos[1] + 1) / bdimi[1]) - 1
-            return (brow * bdimo[1]) + bcol
-
-        # Initialize the cells.
-        for r, row in enumerate(arr):
-            for c, val in enumerate(row):
-                cell = Cell(pos=(r, c), box=p2b((r, c)))
-                self.cells.append(cell)
-                self.rows[r].append(cell)
-                self.cols[c].append(cell)
-                self.boxs[cell.box].append(cell)
-
-        # Assign all values after initialization to make sure notes are discarded properly.
-        for r, row in enumerate(arr):
-            for c, val in enumerate(row):
-                if int(val) != 0:
-                    self[r, c] = int(val)
+            self.load(vals)
+
+    def place(self, idx, new_val):
+        """Solves the cell at index idx with new_val and removes new_val from the notes of its row, column, and box.
+
+        Args:
+            idx (int): The index of the cell that is solved.
+            new_val (int): The value of the solved cell.
+
+        Raises:
+            Exception: Thrown if the cell is updated with a value outside of 1 to the size of the puzzle.
+            Contradiction: Thrown if updating the cell with new_val causes the puzzle to become invalid.
+        """
+
+        geo = self.geo
+        if not 0 < new_val <= geo.size:
+            raise Exception(f"Can not assign a value of {new_val}.")
+        old_val = self.vals[idx]
+        if old_val:
+            if old_val == new_val:
+                return
+            raise Contradiction(f"Cell {geo.positions[idx]}")
+
+        # The value may not already be placed in the row, column, or box of the cell.
+        counts, units, stride = self.counts, self.cell_units[idx], geo.stride
+        for unit in units:
+            if counts[unit * stride + new_val]:
+                kind = ("Row", "Col", "Box")[unit // geo.size]
+                raise Contradiction(f"{kind} {unit % geo.size}")
+        for unit in units:
+            counts[unit * stride + new_val] += 1
+
+        # A placement is journaled with the bitwise not of the index, which tells it apart from a mask change.
+        bit = geo.bit[new_val]
+        self.trail += (self.masks[idx], idx, new_val, ~idx)
+        self.vals[idx] = new_val
+        self.masks[idx] = bit
+        self.unsolved -= 1
+        self.dirty |= self.unit_masks[idx]
+        self._discard(self.peers[idx], bit)
+        if self.debug:
+            valid, reason = self.validate_full()
+            assert valid, reason
 
     def _update_cell(self, cell, new_val):
         """Updates all necessary attributes, when a cell is solved, to keep synchronicity.
@@ -225,22 +377,96 @@ class Puzzle:
 
         Raises:
             Exception: Thrown if the cell is updated with the value 0.
-            Exception: Thrown if updating the cell with new_val causes the puzzle to become invalid.
+            Contradiction: Thrown if updating the cell with new_val causes the puzzle to become invalid.
         """
 
-        new_val = int(new_val)
-        if new_val == 0:
-            raise Exception("Can not assign a value of 0.")
-        cell.val = new_val
-        self.np[cell.pos] = new_val
-        self.unsolved -= 1
-        valid, reason = is_valid(self)
-        if not valid:
-            # print(f"\nError: " + reason)
-            # print(self.np, end="\n\n")
-            raise Exception(reason)
-        r, c = cell.pos
-        self.del_notes(vals=new_val, rows=r, cols=c, boxs=cell.box, save=cell.pos)
+        self.place(cell.idx, int(new_val))
+
+    def _set_mask(self, idx, mask):
+        """Replaces the candidate mask of the cell at index idx, counting the cell as empty if no candidates are left.
+
+        Args:
+            idx (int): The index of the cell.
+            mask (int): The new candidate mask.
+
+        Raises:
+            Contradiction: Thrown if the cell is left without any notes.
+        """
+
+        old_mask = self.masks[idx]
+        self.trail += (old_mask, idx)
+        self.masks[idx] = mask
+        self.dirty |= self.unit_masks[idx]
+        if not mask:
+            if old_mask:
+                self.empty += 1
+            raise Contradiction(f"Cell {self.geo.positions[idx]}")
+        if not old_mask:
+            self.empty -= 1
+
+    def _discard(self, idxs, bits, save=()):
+        """Clears the candidate bits from the masks of the cells at idxs, skipping the cells in save.
+
+        Args:
+            idxs (list[int]): The indices of the cells to remove the candidates from.
+            bits (int): The candidate mask to remove.
+            save (tuple[int]): Indices of cells that keep their candidates. Defaults to ().
+
+        Returns:
+            bool: True if any candidate was removed.
+
+        Raises:
+            Contradiction: Thrown if a cell is left without any notes.
+        """
+
+        masks, trail, unit_masks = self.masks, self.trail, self.unit_masks
+        dirty = 0
+        for idx in idxs:
+            mask = masks[idx]
+            if mask & bits and idx not in save:
+                trail += (mask, idx)
+                mask &= ~bits
+                masks[idx] = mask
+                dirty |= unit_masks[idx]
+                if not mask:
+                    self.empty += 1
+                    self.dirty |= dirty
+                    raise Contradiction(f"Cell {self.geo.positions[idx]}")
+        self.dirty |= dirty
+        return dirty != 0
+
+    def mark(self):
+        """Returns a mark for the current state of the puzzle that undo() can roll back to.
+
+        Returns:
+            int: The current length of the trail.
+        """
+
+        return len(self.trail)
+
+    def undo(self, mark):
+        """Rolls the puzzle back to the state it was in when mark() returned mark. Only the changes made since then are touched.
+
+        Args:
+            mark (int): A mark returned by mark().
+        """
+
+        trail, masks, vals, counts = self.trail, self.masks, self.vals, self.counts
+        cell_units, stride = self.cell_units, self.geo.stride
+        while len(trail) > mark:
+            tag = trail.pop()
+            old = trail.pop()
+            if tag >= 0:
+                # A change to the candidate mask of a cell.
+                self.empty += (not old) - (not masks[tag])
+                masks[tag] = old
+            else:
+                # A placement, the mask of the cell is restored by the entry before it.
+                idx = ~tag
+                vals[idx] = 0
+                for unit in cell_units[idx]:
+                    counts[unit * stride + old] -= 1
+                self.unsolved += 1
 
     def del_notes(self, vals=[], rows=[], cols=[], boxs=[], save=[]):
         """Deletes values from the notes of specified rows, columns, and boxes.
@@ -266,16 +492,14 @@ class Puzzle:
                 save = [save]
             elif isinstance(save[0], tuple):
                 save = list(save)
-        for val in vals:
-            for rnum in rows:
-                self.del_notes_row(val, rnum)
-            for cnum in cols:
-                self.del_notes_col(val, cnum)
-            for bnum in boxs:
-                self.del_notes_box(val, bnum)
-            if save:
-                for pos in save:
-                    self[pos[0]][pos[1]].notes.add(val)
+        bits, size = to_mask(vals), self.size
+        save = tuple(r * size + c for r, c in save)
+        for rnum in rows:
+            self._discard(self.units[rnum], bits, save)
+        for cnum in cols:
+            self._discard(self.units[size + cnum], bits, save)
+        for bnum in boxs:
+            self._discard(self.units[2 * size + bnum], bits, save)
 
     def del_notes_row(self, val, rnum):
         """Removes the specified value from all of the notes in a specified row.
@@ -285,8 +509,7 @@ class Puzzle:
             rnum (int): The row to remove the value from.
         """
 
-        for cell in self.rows[rnum]:
-            cell.notes.discard(val)
+        self._discard(self.units[rnum], self.geo.bit[val])
 
     def del_notes_col(self, val, cnum):
         """Removes the specified value from all of the notes in a specified column.
@@ -296,8 +519,7 @@ class Puzzle:
             cnum (int): The column to remove the value from.
         """
 
-        for cell in self.cols[cnum]:
-            cell.notes.discard(val)
+        self._discard(self.units[self.size + cnum], self.geo.bit[val])
 
     def del_notes_box(self, val, bnum):
         """Removes the specified value from all of the notes in a specified box.
@@ -307,8 +529,7 @@ class Puzzle:
             bnum (int): The box to remove the value from.
         """
 
-        for cell in self.boxs[bnum]:
-            cell.notes.discard(val)
+        self._discard(self.units[2 * self.size + bnum], self.geo.bit[val])
 
     def del_notes_cell(self, vals=[], posns=[], save_vals=[]):
         """Deletes values from specified cells. If no values are specified, all notes are deleted.
@@ -319,72 +540,251 @@ class Puzzle:
             save_vals (list): Values that should remain after deleting the specified values, vals. Defaults to [].
         """
 
-        for pos in posns:
-            if not vals:
-                self[pos].notes = set()
-            else:
-                for val in vals:
-                    self[pos].notes.discard(val)
-            for val in save_vals:
-                self[pos].notes.add(val)
+        bits, save_bits = to_mask(vals), to_mask(save_vals)
+        for r, c in posns:
+            idx = r * self.size + c
+            mask = self.masks[idx] & ~bits if bits else 0
+            self._set_mask(idx, mask | save_bits)
 
     def copy(self, p):
         """Copies all of the attributes from a puzzle to self.
 
         Args:
-            p (Puzzle_Backend): The puzzle to copy attributes from.
+            p (Puzzle_Backend): The puzzle to copy attributes from, of the same size.
         """
 
         self.unsolved = p.unsolved
-        self.cells = p.cells
-        self.rows = p.rows
-        self.cols = p.cols
-        self.boxs = p.boxs
-        self.np = p.np
-        self.checked = p.checked
+        self.empty = p.empty
+        self.masks[:] = p.masks
+        self.vals[:] = p.vals
+        self.counts[:] = p.counts
+        self.trail[:] = p.trail
+        self.dirty = p.dirty
 
     def clear(self):
         """Clears the puzzle of all values and resets all notes."""
 
-        for row in self.rows:
-            for cell in row:
-                cell.val = 0
-                cell.notes = set(range(1, 10))
-        self.checked = defaultdict(lambda: defaultdict(lambda: []))
-        self.unsolved = 81
-        self.np = np.zeros((9, 9), int)
+        self.masks[:], self.vals[:], self.counts[:] = _blank(self.size)
+        self.trail.clear()
+        self.unsolved = self.geo.ncells
+        self.empty = 0
+        self.dirty = 0
+
+    def restore(self, vals, masks):
+        """Loads values and notes saved from a puzzle in one pass, without placing the values again. The notes are trusted to already be consistent with the values, and no unit is marked as changed.
+
+        Args:
+            vals (list[int]): The value of every cell (0 if unsolved).
+            masks (list[int]): The candidate mask of every cell.
+        """
+
+        self.vals[:] = array("B", vals)
+        self.masks[:] = array(self.masks.typecode, masks)
+        counts, cell_units, stride = self.counts, self.cell_units, self.geo.stride
+        counts[:] = _blank(self.size)[2]
+        unsolved = self.geo.ncells
+        for idx, val in enumerate(vals):
+            if val:
+                unsolved -= 1
+                for unit in cell_units[idx]:
+                    counts[unit * stride + val] += 1
+        self.unsolved = unsolved
+        self.empty = masks.count(0)
+        self.trail.clear()
+        self.dirty = 0
+
+    def validate_full(self):
+        """Checks the whole puzzle from scratch and compares it with the bookkeeping that is kept up to date on every change. This is meant for debugging and assertions, the solver never needs it.
+
+        Returns:
+            tuple[bool, str]: True if valid, False and the reason if invalid.
+        """
+
+        valid, reason = is_valid(self)
+        if not valid:
+            return valid, reason
+        counts, stride = array("B", _blank(self.size)[2]), self.geo.stride
+        for idx, val in enumerate(self.vals):
+            if val:
+                for unit in self.cell_units[idx]:
+                    counts[unit * stride + val] += 1
+        if counts != self.counts:
+            return False, "Value counts out of sync"
+        if self.vals.count(0) != self.unsolved:
+            return False, "Unsolved count out of sync"
+        if self.masks.count(0) != self.empty:
+            return False, "Empty count out of sync"
+        return True, ""
 
     def load(self, vals):
-        """Loads values into the puzzle from a list.
+        """Loads values into the puzzle from a list in two passes over the cells, one to gather the values of every unit and one to give every unsolved cell the notes none of its units rule out. The notes, counts, and changed units end up the same as placing the values one at a time, but the existing buffers are reused and nothing is journaled. Everything a solve left behind (the trail, budget, stats, and trace) is dropped, so a puzzle can be reused for another grid without any state leaking from the last one.
 
         Args:
-            vals (list[int]): The values for each cell in the puzzle.
+            vals (list[int]): The values for each cell in the puzzle. Defaults to an empty puzzle if empty or None.
+
+        Raises:
+            Exception: Thrown if there is not a value for every cell, or a value is outside of 0 to the size of the puzzle.
+            Contradiction: Thrown if a value is placed twice in a row, column, or box, or a cell is left without notes.
         """
 
-        self.clear()
-        self._init(vals)
+        geo = self.geo
+        self.trail.clear()
+        self.budget = None
+        self.stats = None
+        self.trace = None
+        vals = [int(val) for val in vals] if vals else [0] * geo.ncells
+        if len(vals) != geo.ncells:
+            raise Exception(f"Puzzle must have {geo.ncells} values.")
+        if not 0 <= min(vals) <= max(vals) <= geo.size:
+            raise Exception(f"Can not assign a value of {min(vals) if min(vals) < 0 else max(vals)}.")
+        self.vals[:] = array("B", vals)
+
+        # Gather the values placed in every unit, refusing a value twice in the same unit.
+        counts, cell_units, bit, stride, size = self.counts, self.cell_units, geo.bit, geo.stride, geo.size
+        counts[:] = _blank(size)[2]
+        seen = [0] * geo.nunits
+        unsolved = geo.ncells
+        for idx, val in enumerate(vals):
+            if val:
+                unsolved -= 1
+                for unit in cell_units[idx]:
+                    if seen[unit] & bit[val]:
+                        kind = ("Row", "Col", "Box")[unit // size]
+                        raise Contradiction(f"{kind} {unit % size}")
+                    seen[unit] |= bit[val]
+                    counts[unit * stride + val] += 1
+
+        # Every unsolved cell keeps the values its units do not have, and the units of every cell that lost a note are
+        # marked as changed, as place() would have marked them.
+        masks, unit_masks, all_ = self.masks, self.unit_masks, geo.all
+        dirty = empty = 0
+        for idx, val in enumerate(vals):
+            if val:
+                masks[idx] = bit[val]
+                dirty |= unit_masks[idx]
+            else:
+                row, col, box = cell_units[idx]
+                mask = all_ & ~(seen[row] | seen[col] | seen[box])
+                masks[idx] = mask
+                if mask != all_:
+                    dirty |= unit_masks[idx]
+                    if not mask:
+                        empty += 1
+        self.unsolved = unsolved
+        self.empty = empty
+        self.dirty = dirty
+        if empty:
+            raise Contradiction(f"Cell {geo.positions[masks.index(0)]}")
+        if self.debug:
+            valid, reason = self.validate_full()
+            assert valid, reason
+
+    def solve(self, engine="human", timeout=None, max_steps=None, max_depth=None, stats=False, trace=False, budget=None):
+        """The method that interacts with the solver to solve the puzzle. The "human" engine attempts to use the standard suite of solving algorithms first and then uses the Nishio method as a last resort if solving comes to a halt. The "dlx" engine uses a Dancing Links exact cover search instead.
 
-    def solve(self):
-        """The method that interacts with the solver to solve the puzzle. Attempts to use the standard suite of solving algorithms first and then uses the Nishio method as a last resort if solving comes to a halt.
+        Args:
+            engine (str): The solver engine to use, "human" or "dlx". Defaults to "human".
+            timeout (float): The most seconds the solve may take. Defaults to None.
+            max_steps (int): The most techniques, branches, and search nodes the solve may use. Defaults to None.
+            max_depth (int): The deepest the Nishio method may branch. Defaults to None.
+            stats (bool or SolveStats): Whether to record how long every technique took and what it changed, or the SolveStats to record them in. Defaults to False.
+            trace (bool): Whether to record every step taken in trace, which is kept after the solve. Defaults to False.
+            budget (SolveBudget): The budget to spend instead of one built from timeout, max_steps, and max_depth, so the caller can cancel() the solve from another thread. Defaults to None.
 
         Raises:
-            Exception: Thrown if there are less than 17 clues as this guarantees there is not a unique solution.
+            Exception: Thrown if the engine is unknown.
+            Exception: Thrown if a 9x9 puzzle has less than 17 clues as this guarantees there is not a unique solution.
+            Contradiction: Thrown if the "dlx" engine finds that the puzzle has no solution.
+            SolveBudgetExceeded: Thrown if a limit is reached. The puzzle is left with the values found before any guessing, which are also in the grid of the exception.
+
+        Returns:
+            SolveStats: The counters of the solve if stats is given, otherwise None.
         """
 
-        # If there are fewer than 17 clues, there can not be a unique solution.
-        clue_ct = 0
-        for cell in self.cells:
-            if cell.val != 0:
-                clue_ct += 1
-            if clue_ct >= 17:
-                break
-        if clue_ct < 17:
+        if engine not in ENGINES:
+            raise Exception(f"Unknown solver engine {engine}.")
+
+        # If a 9x9 puzzle has fewer than 17 clues, there can not be a unique solution. The least clues of the other sizes
+        # are not known.
+        if self.size == 9 and 81 - self.unsolved < MIN_CLUES:
             raise Exception("Puzzle does not have a unique solution.")
 
-        # Attempt to solve the puzzle using basic solving algorithms. If solving halts, use the Nishio method.
-        solved = std_solve(self)
-        if not solved:
-            nishio(self)
-            
+        if budget is not None:
+            self.budget = budget
+        elif timeout is not None or max_steps is not None or max_depth is not None:
+            self.budget = SolveBudget(timeout, max_steps, max_depth)
+        if isinstance(stats, SolveStats):
+            self.stats = stats
+        elif stats:
+            self.stats = SolveStats(engine)
+        self.trace = SolveTrace() if trace else None
+        result = self.stats
+        start = perf_counter()
+        mark = steps = None
+        try:
+            if engine == "dlx":
+                if not dlx_solve(self):
+                    raise Contradiction("Puzzle has no solution.")
+            else:
+                # Attempt to solve the puzzle using basic solving algorithms. If solving halts, use the Nishio method.
+                solved = std_solve(self)
+                if not solved:
+                    mark = self.mark()
+                    if self.trace is not None:
+                        steps = len(self.trace.steps)
+                    nishio(self)
+        except SolveBudgetExceeded as e:
+            # Roll back the guesses so only values that follow from the clues are handed back.
+            if mark is not None:
+                self.undo(mark)
+            if steps is not None:
+                del self.trace.steps[steps:]
+            e.grid = self.to_list()
+            raise
+        finally:
+            if result is not None:
+                result.seconds = perf_counter() - start
+            self.budget = None
+            self.stats = None
+        return result
+
+    def iter_solutions(self, limit=None, timeout=None, max_steps=None):
+        """Yields the solutions of the puzzle, stopping after limit of them. The puzzle itself is not changed.
+
+        Args:
+            limit (int): The most solutions to yield, all of them if None. Defaults to None.
+            timeout (float): The most seconds the search may take. Defaults to None.
+            max_steps (int): The most search nodes the search may visit. Defaults to None.
+
+        Raises:
+            SolveBudgetExceeded: Thrown if a limit is reached.
+
+        Yields:
+            list[list[int]]: The rows of values of a solution.
+        """
+
+        budget = None if timeout is None and max_steps is None else SolveBudget(timeout, max_steps)
+        for vals in iter_solutions(self, limit, budget):
+            yield [vals[r : r + self.size] for r in range(0, len(vals), self.size)]
+
+    def count_solutions(self, limit=2, timeout=None, max_steps=None):
+        """Counts the solutions of the puzzle, stopping as soon as limit are found. With the default limit this tells a puzzle with a unique solution (1) apart from one with none (0) or several (2).
+
+        Args:
+            limit (int): The count to stop at. Defaults to 2.
+            timeout (float): The most seconds the search may take. Defaults to None.
+            max_steps (int): The most search nodes the search may visit. Defaults to None.
+
+        Raises:
+            SolveBudgetExceeded: Thrown if a limit is reached.
+
+        Returns:
+            int: The number of solutions, or limit if there are at least that many.
+        """
+
+        budget = None if timeout is None and max_steps is None else SolveBudget(timeout, max_steps)
+        return count_solutions(self, limit, budget)
+
     def to_list(self):
-        return self.np.tolist()
\ No newline at end of file
+        vals = self.vals.tolist()
+        return [vals[r : r + self.size] for r in range(0, len(vals), self.size)]
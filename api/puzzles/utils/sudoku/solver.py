@@ -1,9 +1,306 @@
-from collections import defaultdict
-from copy import deepcopy as dcopy
+from time import perf_counter
+from .bits import to_mask
+from .dlx import DancingLinks
+
+# The engines Puzzle.solve() can use: the human-style techniques with Nishio as a last resort, or Dancing Links.
+ENGINES = ("human", "dlx")
+
+
+class Contradiction(Exception):
+    """Raised when a change to the puzzle leaves a cell without notes or a value twice in a row, column, or box."""
+
+
+class SolveBudgetExceeded(Exception):
+    """Raised when a solve runs out of time, steps, or branch depth. It carries the work done before that.
+
+    Attributes:
+        reason (str): Which budget ran out, "timeout", "steps", or "depth", or "cancelled" if the solve was cancelled.
+        grid (list[list[int]]): The values found before guessing started (0 if unsolved).
+        steps (int): The number of steps taken.
+    """
+
+    def __init__(self, reason, grid=None, steps=0):
+        super().__init__(reason, grid, steps)
+        self.reason = reason
+        self.grid = grid
+        self.steps = steps
+
+    def __str__(self):
+        return f"Solve budget exceeded ({self.reason} after {self.steps} steps)."
+
+
+class SolveBudget:
+    """
+    The time, step, and branch depth limits of one solve. The solver spends a step at every technique and branch, and
+    the Dancing Links search spends one at every node. Another thread can cancel() the solve, which stops at its next
+    step.
+
+    ...
+
+    Attributes
+    ----------
+    deadline : float
+        the perf_counter() time the solve has to finish by (None for no limit)
+    max_steps : int
+        the most steps the solve may take (None for no limit)
+    max_depth : int
+        the deepest the Nishio method may branch (None for no limit)
+    steps : int
+        the number of steps taken so far
+    cancelled : bool
+        whether cancel() was called
+    """
+
+    def __init__(self, timeout=None, max_steps=None, max_depth=None):
+        """Constructs a budget that starts counting now.
+
+        Args:
+            timeout (float): The most seconds the solve may take. Defaults to None.
+            max_steps (int): The most steps the solve may take. Defaults to None.
+            max_depth (int): The deepest the Nishio method may branch. Defaults to None.
+        """
+
+        self.deadline = None if timeout is None else perf_counter() + timeout
+        self.max_steps = max_steps
+        self.max_depth = max_depth
+        self.steps = 0
+        self.cancelled = False
+
+    def cancel(self):
+        """Stops the solve at its next step."""
+
+        self.cancelled = True
+
+    def step(self, depth=0):
+        """Spends one step of the budget.
+
+        Args:
+            depth (int): The current branch depth. Defaults to 0.
+
+        Raises:
+            SolveBudgetExceeded: Thrown if a limit is reached.
+        """
+
+        self.steps += 1
+        if self.cancelled:
+            raise SolveBudgetExceeded("cancelled", steps=self.steps)
+        if self.max_steps is not None and self.steps > self.max_steps:
+            raise SolveBudgetExceeded("steps", steps=self.steps)
+        if self.max_depth is not None and depth > self.max_depth:
+            raise SolveBudgetExceeded("depth", steps=self.steps)
+        if self.deadline is not None and perf_counter() > self.deadline:
+            raise SolveBudgetExceeded("timeout", steps=self.steps)
+
+
+def trail_changes(p, mark):
+    """Reads the changes made to the puzzle since mark from its trail. The notes a cell loses when its value is placed are not counted as removed.
+
+    Args:
+        p (Puzzle_Backend): The puzzle.
+        mark (int): A mark returned by p.mark().
+
+    Returns:
+        tuple[dict, list]: The mask of the notes removed from every cell index, and the index and value of every placement.
+    """
+
+    # The trail only holds old masks, the first change to a cell since mark has the mask it had at mark.
+    trail, masks = p.trail, p.masks
+    before = {}
+    placed = []
+    for i in range(mark, len(trail), 2):
+        old, tag = trail[i], trail[i + 1]
+        if tag < 0:
+            placed.append((~tag, old))
+        elif tag not in before:
+            before[tag] = old
+    for idx, val in placed:
+        before.pop(idx, None)
+    removed = {idx: old & ~masks[idx] for idx, old in before.items() if old & ~masks[idx]}
+    return removed, placed
+
+
+class SolveTrace:
+    """
+    The steps of one solve, recorded only while a SolveTrace is attached to the puzzle. Every step is built from the
+    trail, so the techniques only say what they found.
+
+    ...
+
+    Attributes
+    ----------
+    steps : list[dict]
+        every step in the order it was taken, with the technique, the unit it was found in, its digits and cells, and
+        the notes it removed and values it placed
+    """
+
+    def __init__(self):
+        """Constructs an empty trace."""
+
+        self.steps = []
+
+    def record(self, p, mark, technique, unit=None, digits=(), cells=()):
+        """Records a step that changed the puzzle.
+
+        Args:
+            p (Puzzle_Backend): The puzzle being solved.
+            mark (int): The mark of the trail before the step.
+            technique (str): The name of the technique.
+            unit (int): The number of the unit the step was found in. Defaults to None.
+            digits (Iterable[int]): The digits the step is about. Defaults to ().
+            cells (Iterable[int]): The indices of the cells the step is about. Defaults to ().
+        """
+
+        removed, placed = trail_changes(p, mark)
+        positions, size = p.geo.positions, p.size
+        self.steps.append(
+            {
+                "technique": technique,
+                "unit": None if unit is None else [("row", "col", "box")[unit // size], unit % size],
+                "digits": list(digits),
+                "cells": [list(positions[idx]) for idx in cells],
+                "eliminated": [
+                    {"cell": list(positions[idx]), "digits": list(p.geo.digits[bits])}
+                    for idx, bits in sorted(removed.items())
+                ],
+                "placed": [{"cell": list(positions[idx]), "value": val} for idx, val in placed],
+            }
+        )
+
+    def to_list(self):
+        """Returns the steps as plain values that can be sent as JSON.
+
+        Returns:
+            list[dict]: The steps.
+        """
+
+        return self.steps
+
+
+class SolveStats:
+    """
+    Counters and timers for one solve. std_solve() records every technique it runs, nishio() records every branch,
+    and the Dancing Links search reports every node, only while a SolveStats is attached to the puzzle, so solves
+    without one pay a single None check.
+
+    ...
+
+    Attributes
+    ----------
+    engine : str
+        the engine the solve used
+    seconds : float
+        the wall time of the whole solve
+    techniques : dict
+        the calls, seconds, eliminations, and placements of every technique over the whole solve
+    rounds : list[dict]
+        the same counters for every round of std_solve() (a round ends whenever a technique changes the puzzle), added
+        up over every std_solve() call of the solve
+    branches : int
+        the number of guesses the Nishio method placed
+    max_depth : int
+        the deepest the Nishio method branched
+    """
+
+    def __init__(self, engine="human"):
+        """Constructs empty stats.
+
+        Args:
+            engine (str): The engine the solve uses. Defaults to "human".
+        """
+
+        self.engine = engine
+        self.seconds = 0.0
+        self.techniques = {}
+        self.rounds = []
+        self.branches = 0
+        self.max_depth = 0
+
+    @staticmethod
+    def name(technique, args):
+        """Names a technique the way the counters are keyed, such as "naked_2" or "inline".
+
+        Args:
+            technique (Callable): The technique.
+            args (tuple): The arguments of the technique after the puzzle.
+
+        Returns:
+            str: The name.
+        """
+
+        return technique.__name__[5:].replace("_clues", "") + "".join(f"_{arg}" for arg in args)
+
+    def measure(self, p, rnd, technique, args, units):
+        """Runs a technique and records its counters.
+
+        Args:
+            p (Puzzle_Backend): The puzzle being solved.
+            rnd (int): The round of std_solve() the technique runs in.
+            technique (Callable): The technique.
+            args (tuple): The arguments of the technique after the puzzle.
+            units (list[int]): The units the technique looks at.
+
+        Returns:
+            int: What the technique returned.
+        """
+
+        name = self.name(technique, args)
+        mark, unsolved = len(p.trail), p.unsolved
+        start = perf_counter()
+        try:
+            return technique(p, *args, units=units)
+        finally:
+            seconds = perf_counter() - start
+            placements = unsolved - p.unsolved
+            eliminations = sum(p.geo.popcount[bits] for bits in trail_changes(p, mark)[0].values())
+            while len(self.rounds) <= rnd:
+                self.rounds.append({})
+            for counters in (self.techniques, self.rounds[rnd]):
+                c = counters.setdefault(name, {"calls": 0, "seconds": 0.0, "eliminations": 0, "placements": 0})
+                c["calls"] += 1
+                c["seconds"] += seconds
+                c["eliminations"] += eliminations
+                c["placements"] += placements
+
+    def branch(self, depth):
+        """Records a guess placed by the Nishio method.
+
+        Args:
+            depth (int): How many branches deep the guess is.
+        """
+
+        self.branches += 1
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    def search(self, vals, chosen):
+        """Called at every node of the Dancing Links search, which these stats do not record.
+
+        Args:
+            vals (list[int]): The values of every cell of the puzzle when the search started (0 if unsolved).
+            chosen (list[tuple[int]]): The cell index and value of every row chosen so far.
+        """
+
+    def to_dict(self):
+        """Returns the stats as plain values that can be sent as JSON.
+
+        Returns:
+            dict: The stats.
+        """
+
+        def rounded(counters):
+            return {name: dict(c, seconds=round(c["seconds"], 6)) for name, c in counters.items()}
+
+        return {
+            "engine": self.engine,
+            "seconds": round(self.seconds, 6),
+            "techniques": rounded(self.techniques),
+            "rounds": [rounded(counters) for counters in self.rounds],
+            "nishio": {"branches": self.branches, "max_depth": self.max_depth},
+        }
 
 
 def is_valid(p):
-    """Checks if the current state of the puzzle is valid (i.e. no duplicate values in any row, column, or box).
+    """Checks if the current state of the puzzle is valid (i.e. no duplicate values in any row, column, or box). This walks the whole puzzle, so the solver relies on the bookkeeping in the puzzle instead and this is only used by Puzzle.validate_full().
 
     Args:
         p (Puzzle_Backend): The puzzle that will be checked.
@@ -12,307 +309,480 @@ def is_valid(p):
         bool: True if valid, False if invalid.
     """
 
-    # Count the occurrence of values in every row, column, and box.
-    rcounts = [[0 for _ in range(10)] for _ in range(9)]
-    ccounts = [[0 for _ in range(10)] for _ in range(9)]
-    bcounts = [[0 for _ in range(10)] for _ in range(9)]
-    for cell in p.cells:
-        (r, c), b = cell.pos, cell.box
-        if len(cell.notes) == 0:
-            return (False, f"Cell {cell.pos}")
-        rcounts[r][cell.val] += 1
-        ccounts[c][cell.val] += 1
-        bcounts[b][cell.val] += 1
-
-    # Check every row, column, and box for duplicate values.
-    for rct, cct, bct in zip(rcounts, ccounts, bcounts):
-        for rnum, cnum, bnum in zip(rct[1:], cct[1:], bct[1:]):
-            if rnum > 1:
-                return (False, f"Row {rnum}")
-            if cnum > 1:
-                return (False, f"Col {cnum}")
-            if bnum > 1:
-                return (False, f"Box {bnum}")
+    # Collect the values placed in every row, column, and box, stopping at the first empty cell or duplicate value.
+    masks, vals, geo = p.masks, p.vals, p.geo
+    seen = [0] * geo.nunits
+    for idx in range(geo.ncells):
+        if not masks[idx]:
+            return (False, f"Cell {geo.positions[idx]}")
+        val = vals[idx]
+        if val:
+            bit = geo.bit[val]
+            for unit in geo.cell_units[idx]:
+                if seen[unit] & bit:
+                    kind = ("Row", "Col", "Box")[unit // geo.size]
+                    return (False, f"{kind} {unit % geo.size}")
+                seen[unit] |= bit
 
     # Return True if the puzzle is valid.
     return True, ""
 
 
+def _unit_list(mask):
+    """Returns the unit numbers set in a bitmask of units.
+
+    Args:
+        mask (int): The bitmask of units.
+
+    Returns:
+        list[int]: The unit numbers.
+    """
+
+    return [unum for unum in range(mask.bit_length()) if mask >> unum & 1]
+
+
 def std_solve(p):
-    """This is the "standard solve". It looks for increasingly difficult clues and solves the puzzle in a similiar manner to a human.
+    """This is the "standard solve". It looks for increasingly difficult clues and solves the puzzle in a similiar manner to a human. Every technique only looks at the rows, columns, and boxes that changed since it last ran, and solving stops once none of them are left.
 
     Args:
         p (Puzzle): The puzzle to be solved.
 
+    Raises:
+        Contradiction: Thrown if a cell of the puzzle has no notes left.
+
     Returns:
         bool: True if the puzzle is solved, False if the puzzle is not solved
     """
 
-    if not is_valid(p):
-        print("Not a valid puzzle.")
-
-    # fmt:off
-    ct = 0
-    while ct < 10:
-        diffs = ""
-        header = f"______________________________________________________________________"
-        # Look for increasingly more difficult clues to find.
-        diffs += find_naked_clues(p, 1)
-        diffs += find_hidden_clues(p, 1)
-        diffs += find_inline(p)
-        diffs += find_naked_clues(p, 2)
-        diffs += find_hidden_clues(p, 2)
-        diffs += find_naked_clues(p, 3)
-        diffs += find_hidden_clues(p, 3)
-        diffs += find_naked_clues(p, 4)
-        diffs += find_hidden_clues(p, 4)
-        footer = f"cells unsolved: {p.unsolved}\n______________________________________________________________________\n"
-        if not diffs:
-            ct += 1
-            continue
-        else:
-            diffs = header + diffs + footer
-            # print(diffs)
+    if p.empty:
+        raise Contradiction(f"Cell {p.geo.positions[p.masks.index(0)]}")
+
+    # Look for increasingly more difficult clues to find, spending a step of the budget on each technique.
+    techniques = TECHNIQUES
+
+    # Every technique keeps the units that changed since it last ran. The cheapest technique with a changed unit runs
+    # next, and as soon as one changes the puzzle the cheap techniques get another go before the subsets are searched.
+    pending = [0] * len(techniques)
+    level = rnd = 0
+    while True:
+        dirty = p.dirty
+        if dirty:
+            p.dirty = 0
+            pending = [units | dirty for units in pending]
 
         # Check if the puzzle is solved.
         if not p.unsolved:
             return True
-        ct += 1
-    # fmt:on
-    return False
+
+        while level < len(techniques) and not pending[level]:
+            level += 1
+        if level == len(techniques):
+            # No technique has anything left to look at.
+            return False
+
+        technique, *args = techniques[level]
+        units = _unit_list(pending[level])
+        pending[level] = 0
+        if p.budget is not None:
+            p.budget.step()
+        if p.stats is None:
+            technique(p, *args, units=units)
+        else:
+            p.stats.measure(p, rnd, technique, args, units)
+        if p.dirty:
+            level = 0
+            rnd += 1
+
+
+class _StepFound(Exception):
+    """Raised by _FirstStep to stop a technique as soon as it has taken a step."""
+
+
+class _FirstStep(SolveTrace):
+    """A trace that stops the running technique once it records its first step."""
+
+    def record(self, p, mark, technique, unit=None, digits=(), cells=()):
+        super().record(p, mark, technique, unit, digits, cells)
+        raise _StepFound
 
 
-def nishio(p, n=2):
-    """Implementation of the Nishio method for solving a Sudoku puzzle. Essentially guess and check. If a naked clue is found with n values, branch.
+def next_step(p, pending):
+    """Takes the single next step std_solve() would take, so a puzzle can be solved one hint at a time. The technique
+    that finds the step is stopped right after it, and keeps its units pending in case it had more to find.
 
     Args:
         p (Puzzle_Backend): The puzzle to be solved.
-        n (int): Branch number. Defaults to 2.
+        pending (list[int]): The bitmask of the units every technique of TECHNIQUES still has to look at, updated in
+            place. The units that changed in the step are left in p.dirty.
+
+    Returns:
+        dict: The step as recorded by SolveTrace, or None if the puzzle is solved or no technique can take a step.
+    """
+
+    trace, p.trace = p.trace, _FirstStep()
+    try:
+        while True:
+            dirty = p.dirty
+            if dirty:
+                p.dirty = 0
+                pending[:] = [units | dirty for units in pending]
+            if not p.unsolved:
+                return None
+            for level, units in enumerate(pending):
+                if units:
+                    break
+            else:
+                return None
+            technique, *args = TECHNIQUES[level]
+            try:
+                technique(p, *args, units=_unit_list(units))
+            except _StepFound:
+                return p.trace.steps[0]
+            pending[level] = 0
+    finally:
+        p.trace = trace
+
+
+def nishio(p, depth=1):
+    """Implementation of the Nishio method for solving a Sudoku puzzle. Essentially guess and check. The cell with the fewest candidates is guessed, one value after another, and solving goes on from each guess, branching again if it stalls. A value whose guess leads to a contradiction is ruled out, so once every other value is ruled out the last one follows without a guess.
+
+    Args:
+        p (Puzzle_Backend): The puzzle to be solved.
+        depth (int): How many branches deep this call is. Defaults to 1.
+
+    Raises:
+        Contradiction: Thrown if every value of the guessed cell leads to a contradiction.
     """
 
     # Check if all of the cells have been solved.
     if not p.unsolved:
         return
-    for cell in p.cells:
-        if not p.unsolved:
+
+    # Branch on the cell with the fewest candidates, which is a naked double in all but the sparsest puzzles.
+    masks, popcount, digits = p.masks, p.geo.popcount, p.geo.digits
+    idx, fewest = -1, p.size + 1
+    for i, mask in enumerate(masks):
+        count = popcount[mask]
+        if 1 < count < fewest:
+            idx, fewest = i, count
+            if count == 2:
+                break
+    if idx < 0:
+        raise Contradiction("Puzzle has no solution.")
+
+    vals = digits[masks[idx]]
+    mark, dirty = p.mark(), p.dirty
+    steps = None if p.trace is None else len(p.trace.steps)
+    for num, val in enumerate(vals):
+        last = num == len(vals) - 1
+        if p.budget is not None:
+            p.budget.step(depth)
+        if p.stats is not None:
+            p.stats.branch(depth)
+        try:
+            p.place(idx, val)
+            if steps is not None:
+                if last and num:
+                    # What is left of the failed guesses is that they led to contradictions.
+                    p.trace.record(p, mark, "nishio", digits=vals[:num], cells=(idx,))
+                else:
+                    p.trace.record(p, mark, "guess", digits=(val,), cells=(idx,))
+            if not std_solve(p):
+                nishio(p, depth=depth + 1)
             return
-        # If there is a naked double in the puzzle, test each value. Call nishio again if solving stalls.
-        solved = False
-        if len(cell.notes) == n:
-            vals = list(cell.notes)
-            puzzle_snapshot = dcopy(p)
-            try:
-                # print(
-                #     "######################## NISHIO - BRANCH 1 ###########################"
-                # )
-                p[cell.pos] = vals[0]
-                solved = std_solve(p)
-                if solved:
-                    return
+        except Contradiction:
+            if last:
+                raise
+            p.undo(mark)
+            p.dirty = dirty
+            if steps is not None:
+                # The steps of the failed guess are dropped.
+                del p.trace.steps[steps:]
+
+
+def dlx_solve(p):
+    """Solves the puzzle with a Dancing Links exact cover search. It only prunes by choosing the constraint with the fewest rows, which is fast on 9x9 puzzles but can blow up on sparse 16x16 and 25x25 ones that the human-style techniques solve.
+
+    Args:
+        p (Puzzle_Backend): The puzzle to be solved.
+
+    Returns:
+        bool: True if the puzzle is solved, False if the puzzle has no solution.
+    """
+
+    for sol in DancingLinks(p.masks, p.vals).solutions(limit=1, budget=p.budget, stats=p.stats):
+        mark = p.mark()
+        for idx, val in enumerate(sol):
+            if not p.vals[idx]:
+                p.place(idx, val)
+        if p.trace is not None:
+            p.trace.record(p, mark, "dlx")
+        return True
+    return False
+
+
+def iter_solutions(p, limit=None, budget=None):
+    """Yields the solutions of the puzzle without changing it. The Dancing Links search stops as soon as limit solutions are found, so proving a puzzle has a unique solution (limit=2) costs about as much as solving it.
+
+    Args:
+        p (Puzzle_Backend): The puzzle to search.
+        limit (int): The most solutions to yield, all of them if None. Defaults to None.
+        budget (SolveBudget): The budget to spend a step of at every node, the one of the running solve if None. Defaults to None.
+
+    Raises:
+        SolveBudgetExceeded: Thrown if a limit of the budget is reached.
+
+    Yields:
+        list[int]: The values of every cell in a solution.
+    """
+
+    yield from DancingLinks(p.masks, p.vals).solutions(limit=limit, budget=p.budget if budget is None else budget)
+
+
+def count_solutions(p, limit=2, budget=None):
+    """Counts the solutions of the puzzle, stopping at limit.
+
+    Args:
+        p (Puzzle_Backend): The puzzle to search.
+        limit (int): The count to stop at. Defaults to 2.
+        budget (SolveBudget): The budget to spend a step of at every node, the one of the running solve if None. Defaults to None.
+
+    Raises:
+        SolveBudgetExceeded: Thrown if a limit of the budget is reached.
+
+    Returns:
+        int: The number of solutions, or limit if there are at least that many.
+    """
+
+    return sum(1 for _ in iter_solutions(p, limit, budget))
+
+
+def _subsets(items, n, popcount):
+    """Finds every combination of n items whose masks have at most n bits set between them. A combination is only extended while its masks stay within n bits, so the search skips most of the combinations.
+
+    Args:
+        items (list[tuple[int]]): The key and mask of every item, each mask with at least two bits set.
+        n (int): The number of items to combine.
+        popcount (Sequence[int]): The POPCOUNT table for the width of the masks.
+
+    Returns:
+        list[tuple[list[int], int]]: The keys of every combination and their masks or'ed together.
+    """
+
+    found = []
+    if n == 2:
+        # Two items only fit in two bits if they have the same two bits.
+        seen = {}
+        for key, mask in items:
+            if popcount[mask] == 2:
+                if mask in seen:
+                    found.append(((seen[mask], key), mask))
                 else:
-                    nishio(p)
-            except:
-                # print(
-                #     "######################## NISHIO - BRANCH 2 ##########################"
-                # )
-                p.copy(puzzle_snapshot)
-                p[cell.pos] = vals[1]
-                solved = std_solve(p)
-                if solved:
-                    return
+                    seen[mask] = key
+        return found
+
+    count = len(items)
+    stack = [(0, (), 0)]
+    while stack:
+        start, chosen, union = stack.pop()
+        left = n - len(chosen) - 1
+        for i in range(start, count - left):
+            key, mask = items[i]
+            both = union | mask
+            if popcount[both] <= n:
+                if left:
+                    stack.append((i + 1, chosen + (key,), both))
                 else:
-                    nishio(p)
+                    found.append((chosen + (key,), both))
+    return found
 
 
-def find_naked_clues(p, n):
-    """Eliminates values from the notes of the other cells in a given row, column, or box if exactly n amount of cells in a row, column or box contain exactly n amount of notes and those notes are equal.
+def find_naked_clues(p, n, units=None):
+    """Eliminates values from the notes of the other cells in a given row, column, or box if exactly n amount of cells in a row, column or box only contain notes from the same n values.
 
     Args:
         p (Puzzle_Backend): Puzzle in which clues will be looked for.
         n (int): Amount of cells and clues to look for.
+        units (list[int]): The unit numbers to look in. Defaults to None, which looks in all of them.
+
+    Raises:
+        Contradiction: Thrown if n cells of a unit only contain notes from fewer than n values.
 
     Returns:
-        str: A string containing the description of the changes that were made to the puzzle.
+        int: The number of clues that changed the puzzle.
     """
 
     assert n > 0 and n < 9
+    masks, vals, trace, geo = p.masks, p.vals, p.trace, p.geo
+    popcount, digits = geo.popcount, geo.digits
+    if units is None:
+        units = range(geo.nunits)
+    found = 0
     if n == 1:
-        diffs = ""
-        for cell in p.cells:
-            if (len(cell.notes) == 1) and (cell.val == 0):
-                [note] = cell.notes
-                p[cell.pos] = note
-                diffs += f"Update Cell: {cell.pos}, {note}\n"
-        return "" if not diffs else "\nNAKED n=1\n" + diffs + "\n"
-
-    diffs = ""
-    # Row
-    for rnum, row in enumerate(p.rows):
-        checks = defaultdict(lambda: [])
-        for cell in row:
-            notes = tuple(sorted(cell.notes))
-            if len(notes) == n:
-                checks[notes].append(cell.pos)
-                posns = tuple(checks[notes])
-                if (posns not in p.checked[n]) and (len(posns) == n):
-                    p.checked[n][posns].extend(notes)
-                    p.del_notes(vals=notes, rows=rnum, save=posns)
-                    diffs += f"del notes: row {rnum}, vals {notes}, save {posns}\n"
-    # Col
-    for cnum, col in enumerate(p.cols):
-        checks = defaultdict(lambda: [])
-        for cell in col:
-            notes = tuple(sorted(cell.notes))
-            if len(notes) == n:
-                checks[notes].append(cell.pos)
-                posns = tuple(checks[notes])
-                if (posns not in p.checked[n]) and (len(posns) == n):
-                    p.checked[n][posns].extend(notes)
-                    p.del_notes(vals=notes, cols=cnum, save=posns)
-                    diffs += f"del notes: col {cnum}, vals {notes}, save {posns}\n"
-    # Box
-    for bnum, box in enumerate(p.boxs):
-        checks = defaultdict(lambda: [])
-        for cell in box:
-            notes = tuple(sorted(cell.notes))
-            if len(notes) == n:
-                checks[notes].append(cell.pos)
-                posns = tuple(checks[notes])
-                if (posns not in p.checked[n]) and (len(posns) == n):
-                    p.checked[n][posns].extend(notes)
-                    p.del_notes(vals=notes, boxs=bnum, save=posns)
-                    diffs += f"del notes: box {bnum}, vals {notes}, save {posns}\n"
-    return "" if not diffs else f"\nNAKED n={n}\n" + diffs + "\n"
-
-
-def find_hidden_clues(p, n):
-    """If exactly n amount of cells in a row, column, or box contain more than n amount of notes but share the same n amount of notes, eliminate all but the shared notes in those cells. Also, eliminate the shared notes from the notes in other cells in the given row, column, or box.
+        value = geo.value
+        for unum in units:
+            for idx in geo.units[unum]:
+                mask = masks[idx]
+                if (popcount[mask] == 1) and (vals[idx] == 0):
+                    mark = len(p.trail)
+                    p.place(idx, value[mask])
+                    found += 1
+                    if trace is not None:
+                        trace.record(p, mark, "naked_1", digits=digits[mask], cells=(idx,))
+        return found
+
+    # Combine the unsolved cells of every row, column, and box that have at most n notes.
+    for unum in units:
+        unit = geo.units[unum]
+        cells = []
+        open_cells = 0
+        for idx in unit:
+            if not vals[idx]:
+                open_cells += 1
+                if 1 < popcount[masks[idx]] <= n:
+                    cells.append((idx, masks[idx]))
+        if len(cells) < n or open_cells <= n:
+            continue
+        for posns, mask in _subsets(cells, n, popcount):
+            if popcount[mask] < n:
+                raise Contradiction(f"Cells {[geo.positions[i] for i in posns]}")
+            mark = len(p.trail)
+            if p._discard(unit, mask, posns):
+                found += 1
+                if trace is not None:
+                    trace.record(p, mark, f"naked_{n}", unum, digits[mask], posns)
+    return found
+
+
+def find_hidden_clues(p, n, units=None):
+    """If n values in a row, column, or box can only go in the same n cells, eliminate all but those values from the notes of those cells.
 
     Args:
         p (Puzzle_Backend): Puzzle in which clues will be looked for.
         n (int): Amount of cells and clues to look for.
+        units (list[int]): The unit numbers to look in. Defaults to None, which looks in all of them.
+
+    Raises:
+        Contradiction: Thrown if a cell is the only place for two values, or n values of a unit only fit in fewer than n cells.
 
     Returns:
-        str: A string containing the description of the changes that were made to the puzzle.
+        int: The number of clues that changed the puzzle.
     """
 
     assert n > 0 and n < 9
+    masks, vals, trace, geo = p.masks, p.vals, p.trace, p.geo
+    popcount, digits = geo.popcount, geo.digits
+    if units is None:
+        units = range(geo.nunits)
+    found = 0
     if n == 1:
-        diffs = ""
-        for cell in p.cells:
-            if cell.val == 0:
-                rnotes, cnotes, bnotes = [], [], []
-                (rnum, cnum), bnum = cell.pos, cell.box
-                [rnotes.extend(list(rcell.notes)) for rcell in p.rows[rnum]]
-                [cnotes.extend(list(ccell.notes)) for ccell in p.cols[cnum]]
-                [bnotes.extend(list(bcell.notes)) for bcell in p.boxs[bnum]]
-                for val in cell.notes:
-                    if bnotes.count(val) == 1:
-                        p[cell.pos] = val
-                        diffs += f"Update Cell: {cell.pos}, {val}\n"
-                    elif rnotes.count(val) == 1:
-                        p[cell.pos] = val
-                        diffs += f"Update Cell: {cell.pos}, {val}\n"
-                    elif cnotes.count(val) == 1:
-                        p[cell.pos] = val
-                        diffs += f"Update Cell: {cell.pos}, {val}\n"
-        return "" if not diffs else "\nHIDDEN n=1\n" + diffs + "\n"
-
-    diffs1, diffs2 = "", ""
-    rcounts = [defaultdict(lambda: []) for _ in range(9)]
-    ccounts = [defaultdict(lambda: []) for _ in range(9)]
-    bcounts = [defaultdict(lambda: []) for _ in range(9)]
-    for cell in p.cells:
-        (r, c), b = cell.pos, cell.box
-        notes = sorted(cell.notes)
-        for val in notes:
-            rcounts[r][val].append(cell.pos)
-            ccounts[c][val].append(cell.pos)
-            bcounts[b][val].append(cell.pos)
-
-    posns = defaultdict(lambda: [])
-    for rnum, counts in enumerate(rcounts):
-        for key, value in counts.items():
-            value = tuple(value)
-            if len(value) == n:
-                posns[value].append(key)
-                if value in posns and len(posns[value]) == n:
-                    if not (value in p.checked[n]):
-                        p.checked[n][value].append(key)
-                        p.del_notes(vals=posns[value], rows=[rnum], save=value)
-                        diffs1 += f"del notes: row {rnum}, vals {posns[value]}, save {value}\n"
-                        p.del_notes_cell(posns=value, save_vals=posns[value])
-                        diffs2 += f"del notes: cells {value}, save {posns[value]}\n"
-    posns = defaultdict(lambda: [])
-    for cnum, counts in enumerate(ccounts):
-        for key, value in counts.items():
-            value = tuple(value)
-            if len(value) == n:
-                posns[value].append(key)
-                if value in posns and len(posns[value]) == n:
-                    if not (value in p.checked[n]):
-                        p.checked[n][value].append(key)
-                        p.del_notes(vals=posns[value], cols=[cnum], save=value)
-                        diffs1 += f"del notes: col {cnum}, vals {posns[value]}, save {value}\n"
-                        p.del_notes_cell(posns=value, save_vals=posns[value])
-                        diffs2 += f"del notes: cells {value}, save {posns[value]}\n"
-    posns = defaultdict(lambda: [])
-    for bnum, counts in enumerate(bcounts):
-        for key, value in counts.items():
-            value = tuple(value)
-            if len(value) == n:
-                posns[value].append(key)
-                if value in posns and len(posns[value]) == n:
-                    if not (value in p.checked[n]):
-                        p.checked[n][value].append(key)
-                        p.del_notes(vals=posns[value], boxs=[bnum], save=value)
-                        diffs1 += f"del notes: box {bnum}, vals {posns[value]}, save {value}\n"
-                        p.del_notes_cell(posns=value, save_vals=posns[value])
-                        diffs2 += f"del notes: cells {value}, save {posns[value]}\n"
-    return "" if not (diffs1 + diffs2) else f"\nHIDDEN n={n}\n" + diffs1 + diffs2 + "\n"
-
-
-def find_inline(p):
+        value = geo.value
+        for unum in units:
+            unit = geo.units[unum]
+            # Find the values that appear in the notes of exactly one cell of the unit.
+            once = more = 0
+            for idx in unit:
+                mask = masks[idx]
+                more |= once & mask
+                once |= mask
+            once &= ~more
+            if not once:
+                continue
+            for idx in unit:
+                hidden = masks[idx] & once
+                if hidden and vals[idx] == 0:
+                    if popcount[hidden] > 1:
+                        raise Contradiction(f"Cell {geo.positions[idx]}")
+                    mark = len(p.trail)
+                    p.place(idx, value[hidden])
+                    found += 1
+                    if trace is not None:
+                        trace.record(p, mark, "hidden_1", unum, digits[hidden], (idx,))
+        return found
+
+    # Build a mask of the unsolved slots of the unit every value can go in, then combine the values that fit in at most
+    # n slots.
+    for unum in units:
+        unit = geo.units[unum]
+        where = [0] * geo.stride
+        open_slots = 0
+        for slot, idx in enumerate(unit):
+            if not vals[idx]:
+                open_slots += 1
+                for val in digits[masks[idx]]:
+                    where[val] |= 1 << slot
+        if open_slots <= n:
+            continue
+        values = [(val, slots) for val, slots in enumerate(where) if 1 < popcount[slots] <= n]
+        if len(values) < n:
+            continue
+        for group, slots in _subsets(values, n, popcount):
+            posns = [unit[slot - 1] for slot in digits[slots]]
+            if popcount[slots] < n:
+                raise Contradiction(f"Cells {[geo.positions[i] for i in posns]}")
+            mark = len(p.trail)
+            if p._discard(posns, geo.all & ~to_mask(group)):
+                found += 1
+                if trace is not None:
+                    trace.record(p, mark, f"hidden_{n}", unum, group, posns)
+    return found
+
+
+def find_inline(p, units=None):
     """Finds cells that share a note that are in the same box and row or box and column. Then the function eliminates that value from the rest of the respective row or column.
 
     Args:
         p (Puzzle_Backend): Puzzle in which clues will be looked for.
+        units (list[int]): The unit numbers to look in, only boxes (18-26 in a 9x9 puzzle) are used. Defaults to None, which looks in every box.
 
     Returns:
-        str: A string containing the description of the changes that were made to the puzzle.
+        int: The number of clues that changed the puzzle.
     """
 
-    diffs = ""
-    for box in p.boxs:
-        counts = defaultdict(lambda: [])
-        for cell in box:
-            notes = tuple(sorted(cell.notes))
-            for val in notes:
-                counts[val].append(cell.pos)
-        for key, value in counts.items():
-            if len(value) == 2:
-                v00, v10 = value[0][0], value[1][0]
-                v01, v11 = value[0][1], value[1][1]
-                inlinehash1 = (tuple(value), v00, v10, "inline")
-                inlinehash2 = (tuple(value), v01, v11, "inline")
-                if v00 == v10 and inlinehash1 not in p.checked:
-                    p.del_notes(vals=[key], rows=[v00], save=value)
-                    diffs += f"del notes: row {v00}, val {[key]}, save {value}\n"
-                    p.checked[inlinehash1] = True
-                elif v01 == v11 and inlinehash2 not in p.checked:
-                    p.del_notes(vals=[key], cols=[v01], save=value)
-                    diffs += f"del notes: col {v01}, val {[key]}, save {value}\n"
-                    p.checked[inlinehash2] = True
-            if len(value) == 3:
-                v00, v10, v20 = value[0][0], value[1][0], value[2][0]
-                v01, v11, v21 = value[0][1], value[1][1], value[2][1]
-                inlinehash1 = (tuple(value), v00, v10, v20, "inline")
-                inlinehash2 = (tuple(value), v01, v11, v21, "inline")
-                if v00 == v10 == v20 and inlinehash1 not in p.checked:
-                    p.del_notes(vals=[key], rows=[v00], save=value)
-                    diffs += f"del notes: row {v00}, val {[key]}, save {value}\n"
-                    p.checked[inlinehash1] = True
-                elif v01 == v11 == v21 and inlinehash2 not in p.checked:
-                    diffs += f"del notes: col {v01}, val {[key]}, save {value}\n"
-                    p.checked[inlinehash2] = True
-    return "" if not diffs else "\nINLINE\n" + diffs + "\n"
+    masks, trace, geo = p.masks, p.trace, p.geo
+    popcount, digits, size, base = geo.popcount, geo.digits, geo.size, geo.base
+    first = 2 * size
+    bnums = range(size) if units is None else [unum - first for unum in units if unum >= first]
+    found = 0
+    for bnum in bnums:
+        box = geo.units[first + bnum]
+        where = [0] * geo.stride
+        for slot, idx in enumerate(box):
+            for val in digits[masks[idx]]:
+                where[val] |= 1 << slot
+        for val in range(1, size + 1):
+            slots = where[val]
+            if not 1 < popcount[slots] <= base:
+                continue
+            # Only the cells of the row or column outside of the box lose the value.
+            for r, rslots in enumerate(geo.box_row_slots):
+                if slots & rslots == slots:
+                    rest = geo.box_row_rest[bnum][r]
+                    break
+            else:
+                for c, cslots in enumerate(geo.box_col_slots):
+                    if slots & cslots == slots:
+                        rest = geo.box_col_rest[bnum][c]
+                        break
+                else:
+                    continue
+            mark = len(p.trail)
+            if p._discard(rest, geo.bit[val]):
+                found += 1
+                if trace is not None:
+                    trace.record(p, mark, "inline", first + bnum, (val,), [box[slot - 1] for slot in digits[slots]])
+    return found
+
+
+# The techniques std_solve() looks for clues with and their arguments, from the cheapest to the most expensive.
+TECHNIQUES = (
+    (find_naked_clues, 1),
+    (find_hidden_clues, 1),
+    (find_inline,),
+    (find_naked_clues, 2),
+    (find_hidden_clues, 2),
+    (find_naked_clues, 3),
+    (find_hidden_clues, 3),
+    (find_naked_clues, 4),
+    (find_hidden_clues, 4),
+)
@@ -0,0 +1,93 @@
+"""Compact formats for grids sent to and from the API.
+
+A string grid is 81 characters read row by row, with 1-9 for values and 0 or . for empty cells. A packed grid is
+PACKED_BYTES bytes with a cell in every 4 bits, high bits first, and the last 4 bits unused. Both are parsed with
+bytes.translate() straight into the bytes the solver keeps values in, without a Python loop over the cells.
+"""
+
+STRING_CELLS = 81
+PACKED_BYTES = 41
+
+# Every byte of a string grid maps to the value of its cell, anything that is not a cell maps to 255.
+_FROM_STRING = bytearray([255] * 256)
+_FROM_STRING[ord("0")] = _FROM_STRING[ord(".")] = 0
+for _val in range(1, 10):
+    _FROM_STRING[ord(str(_val))] = _val
+_FROM_STRING = bytes(_FROM_STRING)
+
+# Every value maps to its character, empty cells to ".".
+_TO_STRING = bytes.maketrans(bytes(range(10)), b".123456789")
+
+# The high and low 4 bits of every byte of a packed grid.
+_HIGH = bytes(b >> 4 for b in range(256))
+_LOW = bytes(b & 0xF for b in range(256))
+
+
+def parse_string(text):
+    """Parses a string grid.
+
+    Args:
+        text (str): The 81 characters of the grid. Whitespace around them is ignored.
+
+    Raises:
+        ValueError: Thrown if the grid is not 81 cells of 0-9 or . characters.
+
+    Returns:
+        bytes: The value of every cell (0 if empty).
+    """
+
+    vals = text.strip().encode("ascii").translate(_FROM_STRING)
+    if len(vals) != STRING_CELLS or 255 in vals:
+        raise ValueError("A grid must be 81 characters of 1-9 and 0 or . for empty cells.")
+    return vals
+
+
+def format_string(vals):
+    """Formats a grid as a string grid.
+
+    Args:
+        vals (Iterable[int]): The value of every cell (0 if empty).
+
+    Returns:
+        str: The 81 characters of the grid.
+    """
+
+    return bytes(vals).translate(_TO_STRING).decode("ascii")
+
+
+def unpack(data):
+    """Parses a packed grid.
+
+    Args:
+        data (bytes): The PACKED_BYTES bytes of the grid.
+
+    Raises:
+        ValueError: Thrown if the grid is not PACKED_BYTES bytes of values from 0 to 9.
+
+    Returns:
+        bytes: The value of every cell (0 if empty).
+    """
+
+    if len(data) != PACKED_BYTES:
+        raise ValueError(f"A packed grid must be {PACKED_BYTES} bytes.")
+    vals = bytearray(2 * PACKED_BYTES)
+    vals[0::2] = data.translate(_HIGH)
+    vals[1::2] = data.translate(_LOW)
+    del vals[STRING_CELLS:]
+    if max(vals) > 9:
+        raise ValueError("A packed grid may only hold values from 0 to 9.")
+    return bytes(vals)
+
+
+def pack(vals):
+    """Formats a grid as a packed grid.
+
+    Args:
+        vals (Iterable[int]): The value of every cell (0 if empty).
+
+    Returns:
+        bytes: The PACKED_BYTES bytes of the grid.
+    """
+
+    cells = bytes(vals) + b"\0"
+    return bytes(high << 4 | low for high, low in zip(cells[0::2], cells[1::2]))
@@ -0,0 +1,346 @@
+"""Entry points for solver worker processes. They only take and return plain values so they can cross a process
+boundary, and they do not depend on Django."""
+
+import gc
+import mmap
+import os
+from math import isqrt
+from time import perf_counter
+from .examples import easy
+from .generator import generate
+from .grader import rate
+from .pool import get_puzzle_pool
+from .solver import SolveBudget, SolveBudgetExceeded, SolveStats
+from .wire import format_string, parse_string
+
+
+def warm_up():
+    """Solves an example puzzle so the first real solve in a new worker process does not pay for imports and tables.
+    Everything built up to then lives as long as the process, so it is frozen out of the garbage collector, which then
+    only walks the objects of the solves themselves."""
+
+    with get_puzzle_pool().puzzle(easy(0)) as p:
+        p.solve()
+    gc.freeze()
+
+
+def lower_priority(increment=10):
+    """Lowers the scheduling priority of the worker process, so the work it does in the background only gets the CPU
+    time the solves of requests leave over. Does nothing where the OS has no nice value.
+
+    Args:
+        increment (int): How much nicer the process gets. Defaults to 10.
+    """
+
+    if hasattr(os, "nice"):
+        os.nice(increment)
+
+
+def solve_grid(vals, engine="human", timeout=None, max_steps=None, max_depth=None):
+    """Solves a puzzle given as a flat list of values.
+
+    Args:
+        vals (list[int]): The values of every cell in the puzzle (0 if empty).
+        engine (str): The solver engine to use. Defaults to "human".
+        timeout (float): The most seconds the solve may take. Defaults to None.
+        max_steps (int): The most steps the solve may take. Defaults to None.
+        max_depth (int): The deepest the Nishio method may branch. Defaults to None.
+
+    Returns:
+        list[int]: The values of every cell once solving stops.
+    """
+
+    with get_puzzle_pool().puzzle(vals) as p:
+        p.solve(engine=engine, timeout=timeout, max_steps=max_steps, max_depth=max_depth)
+        return p.vals.tolist()
+
+
+def profile_grid(vals, engine="human", timeout=None, max_steps=None, max_depth=None, stats=True, trace=False):
+    """Solves a puzzle given as a flat list of values and records what every technique cost, every step taken, or both.
+
+    Args:
+        vals (list[int]): The values of every cell in the puzzle (0 if empty).
+        engine (str): The solver engine to use. Defaults to "human".
+        timeout (float): The most seconds the solve may take. Defaults to None.
+        max_steps (int): The most steps the solve may take. Defaults to None.
+        max_depth (int): The deepest the Nishio method may branch. Defaults to None.
+        stats (bool): Whether to record the stats of the solve. Defaults to True.
+        trace (bool): Whether to record the steps of the solve. Defaults to False.
+
+    Returns:
+        tuple: The values of every cell once solving stops, the stats of the solve as a dict (None if not recorded), and
+        the steps of the solve as a list (None if not recorded).
+    """
+
+    with get_puzzle_pool().puzzle(vals) as p:
+        result = p.solve(
+            engine=engine, timeout=timeout, max_steps=max_steps, max_depth=max_depth, stats=stats, trace=trace
+        )
+        return (
+            p.vals.tolist(),
+            None if result is None else result.to_dict(),
+            None if p.trace is None else p.trace.to_list(),
+        )
+
+
+def count_grid(vals, limit=2, timeout=None, max_steps=None):
+    """Counts the solutions of a puzzle given as a flat list of values, stopping at limit.
+
+    Args:
+        vals (list[int]): The values of every cell in the puzzle (0 if empty).
+        limit (int): The count to stop at. Defaults to 2.
+        timeout (float): The most seconds the count may take. Defaults to None.
+        max_steps (int): The most search nodes the count may visit. Defaults to None.
+
+    Returns:
+        int: The number of solutions, or limit if there are at least that many.
+    """
+
+    with get_puzzle_pool().puzzle(vals) as p:
+        return p.count_solutions(limit, timeout, max_steps)
+
+
+class EventBudget(SolveBudget):
+    """
+    A budget that is also cancelled by setting an event, which may belong to another process. Asking a managed event
+    whether it is set goes through its manager process, so it is only polled once every poll seconds.
+
+    ...
+
+    Attributes
+    ----------
+    event : threading.Event
+        the event that cancels the solve once set (or the proxy of one from a multiprocessing manager)
+    poll : float
+        the least seconds between two checks of the event
+    """
+
+    def __init__(self, event, timeout=None, max_steps=None, max_depth=None, poll=0.05):
+        """Constructs a budget that starts counting now.
+
+        Args:
+            event (threading.Event): The event that cancels the solve once set.
+            timeout (float): The most seconds the solve may take. Defaults to None.
+            max_steps (int): The most steps the solve may take. Defaults to None.
+            max_depth (int): The deepest the Nishio method may branch. Defaults to None.
+            poll (float): The least seconds between two checks of the event. Defaults to 0.05.
+        """
+
+        super().__init__(timeout, max_steps, max_depth)
+        self.event = event
+        self.poll = poll
+        self._next_poll = 0.0
+
+    def step(self, depth=0):
+        now = perf_counter()
+        if now >= self._next_poll:
+            self._next_poll = now + self.poll
+            if self.event.is_set():
+                self.cancel()
+        super().step(depth)
+
+
+class ProgressStats(SolveStats):
+    """
+    Stats that report how far a solve got instead of counting what every technique did. Before a technique runs (or at
+    a node of the Dancing Links search), and at most once every interval seconds, the technique, the depth of the last
+    Nishio guess (or of the search), and the grid are reported.
+
+    ...
+
+    Attributes
+    ----------
+    report : Callable
+        called with every progress event, from the thread that solves
+    interval : float
+        the least seconds between two events
+    depth : int
+        how deep the last guess of the Nishio method was (0 before the first guess)
+    """
+
+    def __init__(self, report, interval=0.1, engine="human"):
+        """Constructs the stats.
+
+        Args:
+            report (Callable): Called with every progress event.
+            interval (float): The least seconds between two events. Defaults to 0.1.
+            engine (str): The engine the solve uses. Defaults to "human".
+        """
+
+        super().__init__(engine)
+        self.report = report
+        self.interval = interval
+        self.depth = 0
+        self._next = 0.0
+
+    def measure(self, p, rnd, technique, args, units):
+        now = perf_counter()
+        if now >= self._next:
+            self._next = now + self.interval
+            self.report({
+                "type": "progress",
+                "technique": self.name(technique, args),
+                "depth": self.depth,
+                "unsolved": p.unsolved,
+                "grid": p.to_list(),
+            })
+        return technique(p, *args, units=units)
+
+    def branch(self, depth):
+        super().branch(depth)
+        self.depth = depth
+
+    def search(self, vals, chosen):
+        now = perf_counter()
+        if now >= self._next:
+            self._next = now + self.interval
+            grid = vals[:]
+            for idx, val in chosen:
+                grid[idx] = val
+            size = isqrt(len(grid))
+            self.report({
+                "type": "progress",
+                "technique": "dlx",
+                "depth": len(chosen),
+                "unsolved": grid.count(0),
+                "grid": [grid[r : r + size] for r in range(0, len(grid), size)],
+            })
+
+
+def stream_grid(vals, engine, timeout, max_steps, max_depth, cancel, events, interval=0.1):
+    """Solves a puzzle given as a flat list of values while reporting its progress, for a solve that is streamed to a
+    client. The event and queue are the only way the solve talks to the process that asked for it, so they come from a
+    multiprocessing manager when the solve runs in a worker process.
+
+    Args:
+        vals (list[int]): The values of every cell in the puzzle (0 if empty).
+        engine (str): The solver engine to use.
+        timeout (float): The most seconds the solve may take.
+        max_steps (int): The most steps the solve may take.
+        max_depth (int): The deepest the Nishio method may branch.
+        cancel (threading.Event): The event that stops the solve once set.
+        events (queue.Queue): The queue every progress event is put on, see ProgressStats.
+        interval (float): The least seconds between two progress events. Defaults to 0.1.
+
+    Raises:
+        SolveBudgetExceeded: Thrown if a limit is reached or the solve is cancelled.
+
+    Returns:
+        list[int]: The values of every cell once solving stops.
+    """
+
+    budget = EventBudget(cancel, timeout, max_steps, max_depth)
+    progress = ProgressStats(events.put, interval, engine)
+    with get_puzzle_pool().puzzle(vals) as p:
+        p.solve(engine=engine, stats=progress, budget=budget)
+        return p.vals.tolist()
+
+
+def generate_grid(difficulty, attempts=1):
+    """Generates a puzzle with a unique solution in a difficulty tier.
+
+    Args:
+        difficulty (str): The name of the tier.
+        attempts (int): How many solution grids are dug before giving up. Defaults to 1.
+
+    Returns:
+        tuple: The values of every cell in the puzzle (0 if empty) and in its solution, or None if no attempt reached
+        the tier.
+    """
+
+    return generate(difficulty, attempts)
+
+
+def rate_grid(vals, timeout=None, max_steps=None, max_depth=None):
+    """Rates how hard a puzzle given as a flat list of values is.
+
+    Args:
+        vals (list[int]): The values of every cell in the puzzle (0 if empty).
+        timeout (float): The most seconds the solve may take. Defaults to None.
+        max_steps (int): The most steps the solve may take. Defaults to None.
+        max_depth (int): The deepest the Nishio method may branch. Defaults to None.
+
+    Returns:
+        dict: The rating, the tier, the hardest technique needed, and the Nishio branches and depth.
+    """
+
+    return rate(vals, timeout, max_steps, max_depth)
+
+
+# The memory map of the corpus file this worker last read, so every chunk of a file reuses the same map. It is keyed on
+# the path, modification time and size of the file, and closed once a chunk of another or a changed file comes in.
+_corpus_map = None
+
+
+def _map_corpus(path):
+    """Returns a memory map of a corpus file, reusing the one of the last chunk if the file has not changed since.
+
+    Args:
+        path (str): The path of the corpus file.
+
+    Returns:
+        mmap.mmap: The memory map of the file.
+    """
+
+    global _corpus_map
+
+    st = os.stat(path)
+    key = (path, st.st_mtime_ns, st.st_size)
+    if _corpus_map is not None and _corpus_map[0] == key:
+        return _corpus_map[1]
+    if _corpus_map is not None:
+        _corpus_map[1].close()
+        _corpus_map = None
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    _corpus_map = (key, mm)
+    return mm
+
+
+def solve_lines(path, start, end, engine="human", timeout=None):
+    """Solves the puzzles on the lines of a corpus file between two byte offsets, reading them from a memory map of the
+    file so only the offsets cross the process boundary.
+
+    Every line that is not blank gets a tab separated result line: the puzzle, the status ("solved", "unsolved",
+    "invalid", "failed", or the reason a budget ran out), the solution (empty if not solved), and the milliseconds the
+    solve took.
+
+    Args:
+        path (str): The path of the corpus file, with one 81 character grid per line.
+        start (int): The offset of the first line.
+        end (int): The offset just past the newline of the last line.
+        engine (str): The solver engine to use. Defaults to "human".
+        timeout (float): The most seconds a single solve may take. Defaults to None.
+
+    Returns:
+        bytes: The result lines.
+    """
+
+    mm = _map_corpus(path)
+
+    # Every grid of the chunk is loaded into a puzzle from the pool of the worker, so the chunk reuses the same one.
+    pool = get_puzzle_pool()
+    out = []
+    for line in mm[start:end].splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        text = line.decode("ascii", "replace")
+        solution = ""
+        t = perf_counter()
+        try:
+            with pool.puzzle(parse_string(text)) as p:
+                p.solve(engine=engine, timeout=timeout)
+                if p.unsolved:
+                    status = "unsolved"
+                else:
+                    status = "solved"
+                    solution = format_string(p.vals)
+        except ValueError:
+            status = "invalid"
+        except SolveBudgetExceeded as e:
+            status = e.reason
+        except Exception:
+            status = "failed"
+        out.append(f"{text}\t{status}\t{solution}\t{(perf_counter() - t) * 1000:.3f}\n")
+    return "".join(out).encode()
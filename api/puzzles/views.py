@@ -1,29 +1,518 @@
-from rest_framework.decorators import api_view
+import json
+import re
+from itertools import chain
+from math import isqrt
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
+from django.core import signing
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework.decorators import api_view, parser_classes
 from rest_framework.response import Response
-from .utils.sudoku import Puzzle
+from rest_framework.settings import api_settings
+from .admission import Overloaded, estimate_cost, get_admission_control
+from .cache import get_solution_cache
+from .generated import get_generated_pool
+from .parsers import GridStringParser, PackedGridParser
+from .services import get_solver_service
+from .utils.sudoku import Contradiction, SolveBudgetExceeded
+from .utils.sudoku.hint import next_hint
+from .utils.sudoku.pool import get_puzzle_pool
+from .utils.sudoku.puzzle import MIN_CLUES
+from .utils.sudoku.wire import STRING_CELLS, format_string, pack, parse_string, unpack
+from .utils.sudoku.grader import TIERS
+
+
+def _flatten_grid(grid):
+    """Flattens a grid given as rows of values (or as one flat list) into a list of values. Empty cells ('' or None) become 0. A 9x9 grid can also be an 81 character string, or the 41 bytes of a packed grid, while 16x16 and 25x25 grids are only read as rows of values.
+
+    Args:
+        grid (list | str | bytes): The grid from the request.
+
+    Returns:
+        list[int]: The values of every cell in the grid.
+    """
+
+    if isinstance(grid, bytes):
+        return list(unpack(grid))
+    if isinstance(grid, str):
+        return list(parse_string(grid))
+    new_grid = []
+    for row in grid:
+        els = row if isinstance(row, list) else [row]
+        for el in els:
+            val = el if el else 0
+            new_grid.append(int(val))
+    return new_grid
+
+
+def _nest_grid(vals):
+    """Splits the values of a grid into rows.
+
+    Args:
+        vals (list[int]): The values of every cell in the grid.
+
+    Returns:
+        list[list[int]]: The rows of the grid.
+    """
+
+    size = isqrt(len(vals))
+    return [vals[r : r + size] for r in range(0, len(vals), size)]
+
+
+def _format_grid(vals, fmt):
+    """Formats the values of a grid for a response.
+
+    Args:
+        vals (list[int]): The values of every cell in the grid.
+        fmt (str): "string" (or "packed") for an 81 character string, anything else for rows of values. Grids that are not 9x9 are always rows of values.
+
+    Returns:
+        list[list[int]] | str: The grid.
+    """
+
+    if fmt in ('string', 'packed') and len(vals) == STRING_CELLS:
+        return format_string(vals)
+    return _nest_grid(vals)
+
+
+def _engine(size):
+    """Returns the solver engine for a puzzle. SUDOKU_SOLVER_ENGINE only applies to 9x9 puzzles, larger ones always use
+    the "human" engine since a Dancing Links search alone can blow up on a sparse 25x25 grid that the techniques solve.
+
+    Args:
+        size (int): The size of the puzzle.
+
+    Returns:
+        str: The engine.
+    """
+
+    return getattr(settings, 'SUDOKU_SOLVER_ENGINE', 'human') if size == 9 else 'human'
+
 
 @api_view(['POST'])
+@parser_classes(api_settings.DEFAULT_PARSER_CLASSES + [GridStringParser, PackedGridParser])
 def solve_puzzle(request):
     grid = request.data.get('grid', None)
     if grid is not None:
-        new_grid = []
-        for row in grid:
-            for el in row:
-                val = el if el else 0
-                new_grid.append(val)
-                
-        try:
-            p = Puzzle(new_grid)
+        pool = get_puzzle_pool()
+        try:
+            new_grid = _flatten_grid(grid)
+            p = pool.acquire(new_grid)
         except:
             return Response({'error': 'Invalid puzzle'}, status=400)    
-        
+
+        # The grid is loaded once, for the checks and the cost estimate below, and the puzzle goes back to the pool
+        # before the solve, which loads the grid where it runs.
+        try:
+            size, unsolved = p.size, p.unsolved
+
+            # A 9x9 puzzle with too few clues has no unique solution, which is cheap to tell before anything else is
+            # spent.
+            if size == 9 and len(new_grid) - unsolved < MIN_CLUES:
+                return Response({'error': 'Puzzle can not be solved'}, status=400)
+
+            # Puzzles solved before, or a symmetry away from one solved before, are answered from the cache, unless the
+            # request asks for the stats or the steps of a solve. Only 9x9 puzzles have a canonical form to cache them
+            # by, and full grids have nothing to look up. The grid itself is looked up first, and its canonical form
+            # (which costs more than solving a puzzle singles solve) only on a miss for a puzzle singles do not solve.
+            want_stats = bool(request.data.get('stats'))
+            explain = bool(request.data.get('explain'))
+            want_unique = bool(request.data.get('unique'))
+            cache = get_solution_cache()
+            solved = found = cost = None
+            try:
+                if cache.enabled and size == 9 and unsolved:
+                    cached, found = cache.lookup(new_grid, symmetric=False)
+                    if cached is None:
+                        cost = estimate_cost(p)
+                        if cost:
+                            cached, found = cache.lookup(new_grid)
+                    if cached is not None and not want_stats and not explain:
+                        if not want_unique:
+                            return _solved(request, cached)
+                        solved, found = cached, None
+                if cost is None:
+                    cost = estimate_cost(p)
+            except Contradiction:
+                return Response({'error': 'Puzzle can not be solved'}, status=400)
+        finally:
+            pool.release(p)
+
+        # The solve runs in a worker process so hard puzzles do not hold this thread. It first has to be admitted, in
+        # the fast lane if single candidates are estimated to solve it, and so does counting the solutions.
+        service = get_solver_service()
+        args = (
+            new_grid,
+            _engine(size),
+            getattr(settings, 'SUDOKU_SOLVE_TIMEOUT', None),
+            getattr(settings, 'SUDOKU_SOLVE_MAX_STEPS', None),
+            getattr(settings, 'SUDOKU_SOLVE_MAX_DEPTH', None),
+        )
+        stats = steps = unique = None
         try:
-            p.solve()
+            with get_admission_control().admit(request.META.get('REMOTE_ADDR'), cost):
+                if solved is None:
+                    if want_stats or explain:
+                        solved, stats, steps = service.profile(*args, stats=want_stats, trace=explain)
+                    else:
+                        solved = service.solve(*args)
+                # Only an answer is worth counting, see below. The count gets a budget of its own.
+                if want_unique and solved and 0 not in solved:
+                    unique = service.count_solutions(new_grid, 2, args[2], args[3]) == 1
+        except Overloaded as e:
+            return _overloaded(e)
+        except BrokenProcessPool:
+            return Response({'error': 'Solver unavailable'}, status=503)
+        except SolveBudgetExceeded as e:
+            return _budget_exceeded(e)
         except:
             return Response({'error': 'Puzzle can not be solved'}, status=400)
         
-        solved_grid = p.to_list()
-        if solved_grid:
-            return Response({'solved': 1, 'solved_grid': solved_grid})
+        # A solve that stopped with empty cells left is not an answer, and is never cached.
+        if not solved or 0 in solved:
+            return Response({'error': 'Puzzle can not be solved'}, status=400)
+        if found is not None:
+            cache.store(found, solved)
+        return _solved(request, solved, stats, steps, unique)
             
     return Response({'error': 'Invalid data'}, status=400)
+
+
+def _solved(request, solved, stats=None, steps=None, unique=None):
+    """Builds the response for a solved puzzle. The grid is formatted as the "format" of the request asks, and a
+    "packed" request with nothing else to answer gets the packed solution as the whole body.
+
+    Args:
+        request (Request): The /solve/ request.
+        solved (list[int]): The values of every cell in the solution.
+        stats (dict): The stats of the solve, included in the response if given. Defaults to None.
+        steps (list[dict]): The steps of the solve, included in the response if given. Defaults to None.
+        unique (bool): Whether the solution is the only one, included in the response if given. Defaults to None.
+
+    Returns:
+        Response: The response.
+    """
+
+    fmt = request.data.get('format')
+    if fmt == 'packed' and len(solved) == STRING_CELLS and stats is None and steps is None and unique is None:
+        return HttpResponse(pack(solved), content_type='application/octet-stream')
+    data = {'solved': 1, 'solved_grid': _format_grid(solved, fmt)}
+    if stats is not None:
+        data['stats'] = stats
+    if steps is not None:
+        data['steps'] = steps
+    if unique is not None:
+        data['unique'] = unique
+    return Response(data)
+
+
+def _budget_exceeded(e):
+    """Builds the response for a solve that ran out of budget. It holds the values found before guessing started, unless
+    it was counting solutions that ran out. Running out of time is reported as 503 with a Retry-After header since a
+    less busy server may finish the solve, while running out of steps or depth is reported as 422 since the puzzle will
+    not get any easier.
+
+    Args:
+        e (SolveBudgetExceeded): The exception raised by the solver.
+
+    Returns:
+        Response: The response.
+    """
+
+    data = {'error': 'Solve budget exceeded', 'reason': e.reason, 'steps': e.steps}
+    if e.grid is not None:
+        data['partial_grid'] = e.grid
+        data['unsolved'] = sum(row.count(0) for row in e.grid)
+    if e.reason == 'timeout':
+        return Response(data, status=503, headers={'Retry-After': str(getattr(settings, 'SUDOKU_SOLVE_RETRY_AFTER', 5))})
+    return Response(data, status=422)
+
+
+def _overloaded(e):
+    """Builds the response for a solve that was not admitted, a 429 with a Retry-After header.
+
+    Args:
+        e (Overloaded): The exception raised by the admission control.
+
+    Returns:
+        Response: The response.
+    """
+
+    return Response(
+        {'error': 'Too many requests', 'reason': e.reason}, status=429, headers={'Retry-After': str(e.retry_after)}
+    )
+
+
+# A bare 81 character grid on an NDJSON line. One that starts with 1-9 is also valid JSON (a big int), so it has to be
+# told apart before the line is parsed.
+_STRING_LINE = re.compile(rb'[0-9.]{81}')
+
+
+def _read_ndjson(request):
+    """Reads one grid per line from a streamed NDJSON body. A line may be a grid, an object with a "grid" key, or a bare
+    81 character grid.
+
+    Args:
+        request (HttpRequest): The request with the NDJSON body.
+
+    Yields:
+        list | str: The grid of each line, or None if the line is not valid JSON.
+    """
+
+    for line in request:
+        line = line.strip()
+        if not line:
+            continue
+        if _STRING_LINE.fullmatch(line):
+            yield line.decode('ascii')
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError:
+            yield line.decode('ascii', 'replace') if len(line) == 81 else None
+            continue
+        yield data.get('grid') if isinstance(data, dict) else data
+
+
+def _solve_grids(grids, engine, chunk_size, fmt=None, limits=(), client=None):
+    """Solves the grids chunk by chunk and yields one NDJSON line per grid, in order, as soon as its chunk is solved.
+    The first chunk raises when it is not admitted or the solver is unavailable, so the request can still be turned
+    away before anything is streamed, while later chunks report it on the line of every grid.
+
+    Args:
+        grids (Iterable[list]): The grids to solve (None for a grid that could not be read).
+        engine (str): The engine used for puzzles that stall in the batch solver.
+        chunk_size (int): How many grids are solved together.
+        fmt (str): The format of the solved grids, see _format_grid(). Defaults to None.
+        limits (tuple): The timeout, max_steps, and max_depth of the solve of every grid. Defaults to no limits.
+        client (str): Who asked for the batch. Defaults to None.
+
+    Raises:
+        Overloaded: Thrown if the first chunk is not admitted.
+        BrokenProcessPool: Thrown if the solver is unavailable for the first chunk.
+
+    Yields:
+        bytes: The result line for each grid.
+    """
+
+    chunk, first = [], True
+    for index, grid in enumerate(grids):
+        chunk.append((index, grid))
+        if len(chunk) >= chunk_size:
+            yield from _solve_chunk(chunk, engine, fmt, limits, client, shed=not first)
+            chunk, first = [], False
+    if chunk:
+        yield from _solve_chunk(chunk, engine, fmt, limits, client, shed=not first)
+
+
+def _solve_chunk(chunk, engine, fmt=None, limits=(), client=None, shed=True):
+    """Solves one chunk of grids with the batch solver, reporting errors (such as a grid that ran out of budget) for
+    each grid on its own. The chunk holds a solver worker for as long as all of its grids take, so it is admitted to
+    the slow lane of the admission control.
+
+    Args:
+        chunk (list[tuple]): The index and grid of every grid in the chunk.
+        engine (str): The engine used for puzzles that stall in the batch solver.
+        fmt (str): The format of the solved grids, see _format_grid(). Defaults to None.
+        limits (tuple): The timeout, max_steps, and max_depth of the solve of every grid. Defaults to no limits.
+        client (str): Who asked for the batch. Defaults to None.
+        shed (bool): Whether a chunk that is not admitted, or finds the solver unavailable, is reported on the line of
+            every grid instead of raising. Defaults to True.
+
+    Raises:
+        Overloaded: Thrown if the chunk is not admitted and shed is not set.
+        BrokenProcessPool: Thrown if the solver is unavailable and shed is not set.
+
+    Yields:
+        bytes: The result line for each grid.
+    """
+
+    results, vals = {}, []
+    for index, grid in chunk:
+        try:
+            new_grid = _flatten_grid(grid)
+            if len(new_grid) != 81 or not all(0 <= val <= 9 for val in new_grid):
+                raise ValueError
+        except (TypeError, ValueError):
+            results[index] = {'index': index, 'error': 'Invalid puzzle' if grid is not None else 'Invalid data'}
+            continue
+        results[index] = None
+        vals.append(new_grid)
+
+    if vals:
+        admission = get_admission_control()
+        try:
+            with admission.admit(client, admission.fast_cost + 1):
+                solved, ok, exceeded = get_solver_service().solve_batch(vals, engine, *limits)
+        except Overloaded as e:
+            if not shed:
+                raise
+            error = {'error': 'Too many requests', 'reason': e.reason, 'retry_after': e.retry_after}
+        except BrokenProcessPool:
+            if not shed:
+                raise
+            error = {'error': 'Solver unavailable'}
+        else:
+            error = None
+        pending = None if error else iter(zip(solved.tolist(), ok, exceeded))
+        for index, result in results.items():
+            if result is None and error:
+                results[index] = {'index': index, **error}
+            elif result is None:
+                solved_grid, solved_ok, reason = next(pending)
+                if solved_ok:
+                    results[index] = {'index': index, 'solved': 1, 'solved_grid': _format_grid(solved_grid, fmt)}
+                elif reason:
+                    results[index] = {'index': index, 'error': 'Solve budget exceeded', 'reason': reason}
+                else:
+                    results[index] = {'index': index, 'error': 'Puzzle can not be solved'}
+
+    for index, _ in chunk:
+        yield json.dumps(results[index]).encode() + b'\n'
+
+
+@csrf_exempt
+@require_POST
+def solve_puzzle_batch(request):
+    """Solves many puzzles in one request and streams one NDJSON result line per puzzle. The body is either JSON with a "grids" list or NDJSON with one grid per line, which is read as it arrives so memory stays bounded. Solved grids are 81 character strings if the "format" of the JSON body or the query string is "string"."""
+
+    engine = getattr(settings, 'SUDOKU_SOLVER_ENGINE', 'human')
+    chunk_size = getattr(settings, 'SUDOKU_BATCH_CHUNK_SIZE', 64)
+    # Every grid gets the budget of a /solve/ request.
+    limits = (
+        getattr(settings, 'SUDOKU_SOLVE_TIMEOUT', None),
+        getattr(settings, 'SUDOKU_SOLVE_MAX_STEPS', None),
+        getattr(settings, 'SUDOKU_SOLVE_MAX_DEPTH', None),
+    )
+    fmt = request.GET.get('format')
+    if request.content_type in ('application/x-ndjson', 'application/jsonl'):
+        grids = _read_ndjson(request)
+    else:
+        try:
+            data = json.loads(request.body)
+            grids = data.get('grids')
+            fmt = data.get('format', fmt)
+        except (ValueError, AttributeError):
+            grids = None
+        if not isinstance(grids, list):
+            return StreamingHttpResponse(
+                [json.dumps({'error': 'Invalid data'}).encode() + b'\n'], status=400, content_type='application/x-ndjson'
+            )
+
+    # The first chunk is solved before the response starts, so a batch that is not admitted gets a 429 (or a 503 if
+    # the solver is unavailable) like /solve/ instead of a stream of errors.
+    lines = _solve_grids(grids, engine, chunk_size, fmt, limits, request.META.get('REMOTE_ADDR'))
+    try:
+        first = [next(lines)]
+    except StopIteration:
+        first = []
+    except Overloaded as e:
+        return StreamingHttpResponse(
+            [json.dumps({'error': 'Too many requests', 'reason': e.reason}).encode() + b'\n'],
+            status=429,
+            content_type='application/x-ndjson',
+            headers={'Retry-After': str(e.retry_after)},
+        )
+    except BrokenProcessPool:
+        return StreamingHttpResponse(
+            [json.dumps({'error': 'Solver unavailable'}).encode() + b'\n'], status=503, content_type='application/x-ndjson'
+        )
+    return StreamingHttpResponse(chain(first, lines), content_type='application/x-ndjson')
+
+
+@api_view(['POST'])
+def rate_puzzle(request):
+    """Rates how hard a puzzle is by the hardest technique the solver needs for it and how much it has to guess."""
+
+    grid = request.data.get('grid', None)
+    if grid is None:
+        return Response({'error': 'Invalid data'}, status=400)
+    pool = get_puzzle_pool()
+    try:
+        new_grid = _flatten_grid(grid)
+        p = pool.acquire(new_grid)
+    except:
+        return Response({'error': 'Invalid puzzle'}, status=400)
+    try:
+        cost = estimate_cost(p)
+    except Contradiction:
+        return Response({'error': 'Puzzle can not be solved'}, status=400)
+    finally:
+        pool.release(p)
+
+    # Rating a puzzle solves it, so it is admitted like a /solve/ request, to the lane its estimate picks.
+    try:
+        with get_admission_control().admit(request.META.get('REMOTE_ADDR'), cost):
+            rating = get_solver_service().rate(
+                new_grid,
+                getattr(settings, 'SUDOKU_SOLVE_TIMEOUT', None),
+                getattr(settings, 'SUDOKU_SOLVE_MAX_STEPS', None),
+                getattr(settings, 'SUDOKU_SOLVE_MAX_DEPTH', None),
+            )
+    except Overloaded as e:
+        return _overloaded(e)
+    except BrokenProcessPool:
+        return Response({'error': 'Solver unavailable'}, status=503)
+    except SolveBudgetExceeded as e:
+        return _budget_exceeded(e)
+    except:
+        return Response({'error': 'Puzzle can not be solved'}, status=400)
+    return Response(rating)
+
+
+# Hint states are signed so a client can not hand back notes the solver never ruled out.
+_hint_signer = signing.Signer(salt='puzzles.hint')
+
+
+@api_view(['POST'])
+def hint_puzzle(request):
+    """Returns the next logical step for a puzzle and a token with the state the solver reached. Sending the token
+    back with the next grid picks up from that state instead of solving the grid from its clues again. The step is
+    a single technique, so it runs in the request thread."""
+
+    grid = request.data.get('grid', None)
+    if grid is None:
+        return Response({'error': 'Invalid data'}, status=400)
+    state = None
+    token = request.data.get('token')
+    if token:
+        try:
+            value = _hint_signer.unsign(token)
+            state = urlsafe_b64decode(value + '=' * (-len(value) % 4))
+        except (signing.BadSignature, ValueError):
+            return Response({'error': 'Invalid token'}, status=400)
+
+    try:
+        new_grid = _flatten_grid(grid)
+        step, state = next_hint(new_grid, state)
+    except Contradiction:
+        return Response({'error': 'Puzzle has a mistake'}, status=400)
+    except:
+        return Response({'error': 'Invalid puzzle'}, status=400)
+
+    data = {'hint': step, 'token': _hint_signer.sign(urlsafe_b64encode(state).decode().rstrip('='))}
+    if step is None:
+        data['solved'] = int(0 not in new_grid)
+    return Response(data)
+
+@api_view(['GET'])
+def generate_puzzle(request):
+    """Hands out a puzzle with a unique solution from the pool of generated puzzles of a tier. Puzzles are never
+    generated in the request, so a tier that has run out answers 503 with a Retry-After header until it is filled."""
+
+    difficulty = request.query_params.get('difficulty', 'medium')
+    if difficulty not in TIERS:
+        return Response({'error': 'Invalid difficulty', 'difficulties': list(TIERS)}, status=400)
+
+    puzzle = get_generated_pool().take(difficulty)
+    if puzzle is None:
+        return Response(
+            {'error': 'No puzzle ready'},
+            status=503,
+            headers={'Retry-After': str(getattr(settings, 'SUDOKU_GENERATED_RETRY_AFTER', 5))},
+        )
+    vals, solved = puzzle
+    return Response({'difficulty': difficulty, 'grid': _nest_grid(vals), 'solved_grid': _nest_grid(solved)})